@@ -0,0 +1,241 @@
+"""
+Usage analytics module for the Google Form Filler.
+Keeps incremental rollups of usage records by day, form and user:
+requested/successful counts, failure reasons and per-stage latency
+histograms. The rollups live next to the usage table in the tracker
+database and are updated in the same transaction as each usage record.
+
+Rebuild the rollups from the recorded usage with:
+    python analytics.py replay
+adding the entries of a legacy JSON usage log that are not in it yet with:
+    python analytics.py replay --json usage_log.json
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+from collections import Counter
+from datetime import datetime
+from config import TRACKER_DB_PATH
+from metrics import Histogram
+
+ANALYTICS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollup_counts (
+    dimension TEXT NOT NULL,
+    key TEXT NOT NULL,
+    day TEXT NOT NULL,
+    requested INTEGER NOT NULL,
+    successful INTEGER NOT NULL,
+    PRIMARY KEY (dimension, key, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_failures (
+    dimension TEXT NOT NULL,
+    key TEXT NOT NULL,
+    day TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (dimension, key, day, reason)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_latency (
+    dimension TEXT NOT NULL,
+    key TEXT NOT NULL,
+    day TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (dimension, key, day, stage, bucket)
+) WITHOUT ROWID;
+"""
+
+# Every record is rolled up once per dimension; "all" gives the per-day totals
+ALL = ("all", "*")
+
+
+def record_usage_rollups(conn, record):
+    """
+    Add one usage record to the rollups (caller holds a transaction).
+    record: timestamp, user_key, form_url, requested, successful and
+    optionally failure_reason and stages ({stage: seconds}).
+    """
+    day = datetime.fromtimestamp(record["timestamp"]).strftime("%Y-%m-%d")
+    dimensions = [ALL, ("form", record["form_url"]), ("user", record["user_key"])]
+    conn.executemany(
+        "INSERT INTO rollup_counts (dimension, key, day, requested, successful) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(dimension, key, day) DO UPDATE SET "
+        "requested = requested + excluded.requested, successful = successful + excluded.successful",
+        [(dim, key, day, record["requested"], record["successful"]) for dim, key in dimensions]
+    )
+    if record.get("failure_reason"):
+        conn.executemany(
+            "INSERT INTO rollup_failures (dimension, key, day, reason, count) VALUES (?, ?, ?, ?, 1) "
+            "ON CONFLICT(dimension, key, day, reason) DO UPDATE SET count = count + 1",
+            [(dim, key, day, record["failure_reason"]) for dim, key in dimensions]
+        )
+    stages = record.get("stages") or {}
+    if stages:
+        histogram = Histogram()
+        conn.executemany(
+            "INSERT INTO rollup_latency (dimension, key, day, stage, bucket, count) VALUES (?, ?, ?, ?, ?, 1) "
+            "ON CONFLICT(dimension, key, day, stage, bucket) DO UPDATE SET count = count + 1",
+            [(dim, key, day, stage, histogram.bucket(seconds))
+             for stage, seconds in stages.items() for dim, key in dimensions]
+        )
+
+
+def get_summary(conn, day, dimension="all", key="*"):
+    """Read the rollups of one day for one dimension key"""
+    row = conn.execute(
+        "SELECT requested, successful FROM rollup_counts WHERE dimension = ? AND key = ? AND day = ?",
+        (dimension, key, day)
+    ).fetchone()
+    requested, successful = row or (0, 0)
+
+    failures = dict(conn.execute(
+        "SELECT reason, count FROM rollup_failures WHERE dimension = ? AND key = ? AND day = ? ORDER BY count DESC",
+        (dimension, key, day)
+    ).fetchall())
+
+    histograms = {}
+    for stage, bucket, count in conn.execute(
+        "SELECT stage, bucket, count FROM rollup_latency WHERE dimension = ? AND key = ? AND day = ?",
+        (dimension, key, day)
+    ):
+        histograms.setdefault(stage, Histogram()).counts[bucket] = count
+    latency = {
+        stage: {"count": h.total, "p50": h.percentile(50), "p95": h.percentile(95)}
+        for stage, h in sorted(histograms.items())
+    }
+
+    return {
+        "day": day,
+        "requested": requested,
+        "successful": successful,
+        "success_rate": successful / requested if requested else None,
+        "failures": failures,
+        "latency": latency
+    }
+
+
+def get_form_summaries(conn, day, limit=5):
+    """Per-form counts for one day, busiest forms first"""
+    rows = conn.execute(
+        "SELECT key, requested, successful FROM rollup_counts WHERE dimension = 'form' AND day = ? "
+        "ORDER BY requested DESC LIMIT ?",
+        (day, limit)
+    ).fetchall()
+    return [{"form_url": key, "requested": requested, "successful": successful}
+            for key, requested, successful in rows]
+
+
+def _usage_table_records(conn):
+    """Stream the tracker's usage table in insertion order"""
+    cursor = conn.execute(
+        "SELECT timestamp, user_key, form_url, requested, successful, failure_reason, stages FROM usage ORDER BY id"
+    )
+    while True:
+        rows = cursor.fetchmany(1000)
+        if not rows:
+            return
+        for timestamp, user_key, form_url, requested, successful, failure_reason, stages in rows:
+            yield {
+                "timestamp": timestamp,
+                "user_key": user_key,
+                "form_url": form_url,
+                "requested": requested,
+                "successful": successful,
+                "failure_reason": failure_reason,
+                "stages": json.loads(stages) if stages else None
+            }
+
+
+def _json_log_records(path):
+    """Stream a legacy usage_log.json in either of its historical formats"""
+    from user_tracker import iter_json_items, _parse_timestamp
+
+    for entry in iter_json_items(path):
+        if "user_id_hash" in entry:
+            user_key, form_url = entry["user_id_hash"], entry.get("form_url_hash", "")
+            requested, successful = entry.get("responses_requested", 0), entry.get("responses_successful", 0)
+        else:
+            user_key = f"{entry.get('ip', '')}_{entry.get('user_agent', '')[:20]}"
+            form_url = entry.get("form_url", "")
+            requested, successful = entry.get("requested", 0), entry.get("successful", 0)
+        yield {
+            "timestamp": _parse_timestamp(entry["timestamp"]),
+            "user_key": user_key,
+            "form_url": form_url,
+            "requested": requested,
+            "successful": successful
+        }
+
+
+def _record_key(record):
+    return (record["timestamp"], record["user_key"], record["form_url"], record["requested"], record["successful"])
+
+
+def _replay_records(reader, json_path=None):
+    """
+    The usage table, followed by the entries of a JSON usage log that are not
+    in it (the tracker migrates the log into the table on first use, so most
+    entries usually are)
+    """
+    seen = Counter()
+    for record in _usage_table_records(reader):
+        if json_path:
+            seen[_record_key(record)] += 1
+        yield record
+    if not json_path:
+        return
+    for record in _json_log_records(json_path):
+        key = _record_key(record)
+        if seen[key]:
+            seen[key] -= 1
+            continue
+        yield record
+
+
+def replay(db_path=TRACKER_DB_PATH, json_path=None):
+    """
+    Rebuild every rollup from the usage table, plus the entries of a JSON
+    usage log missing from it, in one transaction. Returns the number of
+    records replayed.
+    """
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    reader = sqlite3.connect(db_path, timeout=30)
+    try:
+        conn.executescript(ANALYTICS_SCHEMA)
+        replayed = 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for table in ("rollup_counts", "rollup_failures", "rollup_latency"):
+                conn.execute(f"DELETE FROM {table}")
+            for record in _replay_records(reader, json_path):
+                record_usage_rollups(conn, record)
+                replayed += 1
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return replayed
+    finally:
+        reader.close()
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Google Form Filler usage analytics.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    replay_parser = subparsers.add_parser("replay", help="Rebuild the rollups from the recorded usage")
+    replay_parser.add_argument("--db", default=TRACKER_DB_PATH, help="Tracker database")
+    replay_parser.add_argument("--json", help="Also replay the entries of a legacy JSON usage log missing from the usage table")
+    args = parser.parse_args(argv)
+
+    if args.command == "replay":
+        count = replay(args.db, args.json)
+        print(f"Replayed {count} usage records into the rollups in {args.db}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,501 @@
+"""
+Answer plan module for the Google Form Filler.
+Compiles a parsed form structure and one set of answers into a plan: a
+JSON-serializable list of actions with the exact XPaths to try and the
+values to set. Every decision about a question (option resolution, scale
+mapping, which selectors and fallbacks to use) is taken at compile time,
+so plans can be produced in bulk ahead of time, stored, inspected and
+replayed by the thin executor below. Dry runs replay the same plan, stop
+before Submit and read every field back.
+
+    plan = compile_plan(form_structure, answers)
+    fill_form_from_plan(driver, form_url, plan)
+    report = dry_run_plan(driver, form_url, plan)
+
+Plans can also be compiled and inspected from the command line:
+
+    python answer_plan.py compile structure.json answers.jsonl -o plans.jsonl
+    python answer_plan.py show plans.jsonl
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException, NoSuchElementException
+
+from proto1 import (
+    question_locators, xpath_literal, scale_value, load_form, submit_form,
+    wait_for_questions, go_to_next_section, split_sections
+)
+from option_index import GRID_TYPES, resolve_answers
+from job_journal import schema_hash
+from metrics import Span, span
+from profiling import capture_page_metrics
+from log_config import get_logger
+
+logger = get_logger(__name__)
+
+PLAN_VERSION = 1
+
+# Seconds to wait for each target of an action, and to let the page register an action
+TARGET_TIMEOUT = {"type": 5, "click": 3, "check": 3, "steps": 5}
+ACTION_SETTLE_TIME = 0.5
+
+# Answer formats understood for date and time questions, whose inputs take ISO values
+DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%d.%m.%Y", "%B %d, %Y", "%b %d, %Y", "%d %B %Y", "%d %b %Y")
+TIME_FORMATS = ("%H:%M", "%H:%M:%S", "%I:%M %p", "%I:%M%p", "%I %p")
+
+SET_VALUE_JS = ("arguments[0].value = arguments[1];"
+                "arguments[0].dispatchEvent(new Event('input', { bubbles: true }));"
+                "arguments[0].dispatchEvent(new Event('change', { bubbles: true }));")
+
+
+def _click_action(q_identifier, q_type, targets, fallback_pick, xpath_base):
+    return {
+        "question": q_identifier,
+        "type": q_type,
+        "op": "click",
+        "targets": targets,
+        "fallback": {"xpath": f"{xpath_base}//div[@role='radio']", "pick": fallback_pick}
+    }
+
+
+def _steps_action(q_identifier, q_type, steps, fallback=None):
+    action = {"question": q_identifier, "type": q_type, "op": "steps", "steps": steps}
+    if fallback:
+        action["fallback"] = fallback
+    return action
+
+
+def _iso_value(answer, formats, output_format):
+    """An answer in output_format, or unchanged if it matches none of the formats"""
+    text = str(answer).strip()
+    for fmt in formats:
+        try:
+            return datetime.strptime(text, fmt).strftime(output_format)
+        except ValueError:
+            continue
+    return text
+
+
+def compile_action(question, answer, locators):
+    """The action for one answered question, or None if its type cannot be planned"""
+    q_identifier, q_type = question["identifier"], question["type"]
+    xpath_base = locators["xpath_base"]
+
+    if q_type == "text":
+        return {
+            "question": q_identifier,
+            "type": q_type,
+            "op": "type",
+            "targets": [locators["text_xpath"], locators["text_fallback_xpath"]],
+            "value": str(answer)
+        }
+
+    if q_type == "linear_scale":
+        value = scale_value(answer, question.get("options"))
+        targets = []
+        if value > 0:
+            targets = [f"({xpath_base}//div[@role='radio'][@data-value='{value}'])[1]",
+                       f"({xpath_base}//div[@role='radio'])[{value}]"]
+        action = _click_action(q_identifier, q_type, targets, "middle", xpath_base)
+        action["value"] = value
+        return action
+
+    if q_type == "multiple_choice":
+        options = question.get("options") or []
+        targets = []
+        if not options or answer in options:
+            literal = xpath_literal(str(answer))
+            targets.append(f"({xpath_base}//div[@role='radio'][@data-value={literal}]"
+                           f" | {xpath_base}//div[@role='radio'][.//span[normalize-space()={literal}]])[1]")
+        # Scales misclassified as multiple choice can still be clicked by position
+        if isinstance(options, list) and any(str(opt).isdigit() for opt in options):
+            value = scale_value(answer)
+            if value > 0:
+                targets.append(f"({xpath_base}//div[@role='radio'])[{value}]")
+        return _click_action(q_identifier, q_type, targets, "first", xpath_base)
+
+    if q_type == "checkbox":
+        steps = []
+        for item in answer if isinstance(answer, list) else [answer]:
+            literal = xpath_literal(str(item))
+            steps.append({"op": "check", "targets": [
+                f"({xpath_base}//div[@role='checkbox'][@data-answer-value={literal} or @aria-label={literal}"
+                f" or .//span[normalize-space()={literal}]])[1]"
+            ]})
+        return _steps_action(q_identifier, q_type, steps,
+                             {"xpath": f"{xpath_base}//div[@role='checkbox']", "pick": "first"})
+
+    if q_type == "dropdown":
+        literal = xpath_literal(str(answer))
+        # Open the list, then pick the option; Google renders the open list's options last
+        return _steps_action(q_identifier, q_type, [
+            {"op": "click", "targets": [f"({xpath_base}//div[@role='listbox'])[1]"]},
+            {"op": "click", "targets": [
+                f"({xpath_base}//div[@role='option'][@data-value={literal} or .//span[normalize-space()={literal}]])[last()]",
+                f"(//div[@role='option'][@data-value={literal}])[last()]"
+            ]}
+        ])
+
+    if q_type in GRID_TYPES and isinstance(answer, dict):
+        role = "checkbox" if q_type == "checkbox_grid" else "radio"
+        steps = []
+        for row, value in answer.items():
+            row_literal = xpath_literal(str(row))
+            for column in value if isinstance(value, list) else [value]:
+                cell = f"//div[@role='{role}'][@data-value={xpath_literal(str(column))} or @data-answer-value={xpath_literal(str(column))}]"
+                steps.append({"op": "check", "targets": [
+                    f"({xpath_base}//*[@role='radiogroup' or @role='group'][@aria-label={row_literal}]{cell})[1]",
+                    f"({xpath_base}//tr[normalize-space(th)={row_literal}]{cell})[1]"
+                ]})
+        return _steps_action(q_identifier, q_type, steps)
+
+    if q_type in ("date", "time"):
+        if q_type == "date":
+            value = _iso_value(answer, DATE_FORMATS, "%Y-%m-%d")
+        else:
+            value = _iso_value(answer, TIME_FORMATS, "%H:%M")
+        return {
+            "question": q_identifier,
+            "type": q_type,
+            "op": "type",
+            "targets": [f"({xpath_base}//input[@type='{q_type}'])[1]", f"({xpath_base}//input)[1]"],
+            "value": value
+        }
+
+    return None
+
+
+def compile_plan(form_structure, answers, artifacts=None):
+    """
+    Compile a form structure and answers into a plan dict with the actions
+    to run in order, the unresolved choice answers and the skipped questions.
+    Actions and skipped questions carry the section they are on; actions
+    also keep the resolved answer, which dry runs compare the page against.
+    artifacts are the precompiled per-question artifacts from schema_store.
+    """
+    answers, unresolved = resolve_answers(form_structure, answers, artifacts)
+    actions, skipped = [], []
+    for question in form_structure:
+        q_identifier, q_type = question["identifier"], question["type"]
+        section = question.get("section", 0)
+        answer = answers.get(q_identifier)
+        if q_identifier not in answers:
+            skipped.append({"question": q_identifier, "type": q_type, "section": section, "reason": "missing"})
+            continue
+        if answer is None or (isinstance(answer, (str, list)) and not answer and q_type != "text"):
+            skipped.append({"question": q_identifier, "type": q_type, "section": section, "reason": "empty"})
+            continue
+        question_artifacts = artifacts.get(q_identifier) if artifacts else None
+        locators = question_artifacts["locators"] if question_artifacts else question_locators(q_identifier)
+        action = compile_action(question, answer, locators)
+        if action is None:
+            skipped.append({"question": q_identifier, "type": q_type, "section": section, "reason": "unsupported"})
+        else:
+            action["section"] = section
+            action["answer"] = answer
+            actions.append(action)
+    return {
+        "version": PLAN_VERSION,
+        "schema_hash": schema_hash(form_structure),
+        "sections": len(split_sections(form_structure)),
+        "actions": actions,
+        "unresolved": [list(item) for item in unresolved],
+        "skipped": skipped
+    }
+
+
+def _find(driver, targets, timeout, condition):
+    """The first element found among the target XPaths, trying them in order"""
+    for xpath in targets:
+        try:
+            return WebDriverWait(driver, timeout).until(condition((By.XPATH, xpath)))
+        except TimeoutException:
+            logger.debug("Target not found: %s", xpath)
+    return None
+
+
+def _type(driver, element, value):
+    # Date and time inputs take keystrokes in the browser's locale format, so their ISO value is set directly
+    if element.get_attribute("type") not in ("date", "time"):
+        try:
+            element.click()
+            element.clear()
+            element.send_keys(value)
+            return
+        except Exception as e:
+            logger.debug("send_keys failed (%s); setting the value directly", e)
+    driver.execute_script(SET_VALUE_JS, element, value)
+
+
+def _run_steps(driver, action):
+    """Run the steps of a multi-step action; the fallback is clicked only if no step found its target"""
+    statuses = []
+    for step in action["steps"]:
+        statuses.append(run_action(driver, step))
+        time.sleep(ACTION_SETTLE_TIME)
+    if "filled" not in statuses and action.get("fallback"):
+        return run_action(driver, {"question": action["question"], "op": "check", "targets": [],
+                                   "fallback": action["fallback"]})
+    return next((status for status in statuses if status != "filled"), "filled")
+
+
+def run_action(driver, action):
+    """
+    Run one plan action; returns its status. "steps" actions run their steps
+    in order, "check" clicks a checkbox or radio unless it is already checked.
+    """
+    if action["op"] == "steps":
+        return _run_steps(driver, action)
+    timeout = TARGET_TIMEOUT[action["op"]]
+    if action["op"] == "type":
+        element = _find(driver, action["targets"], timeout, EC.visibility_of_element_located)
+        if element is None:
+            return "timeout"
+        _type(driver, element, action["value"])
+        return "filled"
+
+    element = _find(driver, action["targets"], timeout, EC.element_to_be_clickable)
+    if element is None and action.get("fallback"):
+        candidates = driver.find_elements(By.XPATH, action["fallback"]["xpath"])
+        if candidates:
+            element = candidates[len(candidates) // 2 if action["fallback"]["pick"] == "middle" else 0]
+            logger.debug("Using fallback target for '%s'", action.get("question"))
+    if element is None:
+        return "not_found"
+    if action["op"] == "check" and element.get_attribute("aria-checked") == "true":
+        return "filled"
+    driver.execute_script("arguments[0].click();", element)
+    return "filled"
+
+
+def execute_plan(driver, plan, section=None):
+    """
+    Run the actions of a plan (only those of one section, if given) on the
+    form page currently shown. Returns per-question entries.
+    """
+    questions = [{"identifier": s["question"], "type": s["type"], "status": s["reason"], "duration": 0.0}
+                 for s in plan["skipped"] if section is None or s.get("section", 0) == section]
+    for action in plan["actions"]:
+        if section is not None and action.get("section", 0) != section:
+            continue
+        entry = {"identifier": action["question"], "type": action["type"], "status": "filled", "duration": 0.0}
+        questions.append(entry)
+        question_span = Span("question_fill", type=action["type"]).start()
+        try:
+            entry["status"] = run_action(driver, action)
+            time.sleep(ACTION_SETTLE_TIME)
+        except NoSuchElementException:
+            entry["status"] = "not_found"
+        except Exception as e:
+            entry["status"] = "error"
+            logger.error("Error running plan action for '%s': %s", action["question"], e)
+        entry["duration"] = round(question_span.end(), 3)
+        if entry["status"] != "filled":
+            logger.warning("Plan action for '%s' ended with status %s", action["question"], entry["status"])
+    return questions
+
+
+def fill_form_from_plan(driver, form_url, plan):
+    """Load the form, replay a compiled plan and submit. Returns True if the submission was confirmed."""
+    logger.info("Form filling from plan started: %s", form_url)
+    fill_span = Span("fill_form").start()
+    try:
+        with span("page_load"):
+            load_form(driver, form_url)
+        wait_for_questions(driver)
+        capture_page_metrics(driver, "fill_load")
+        # Stream each section's answers into its page, then move on
+        sections = plan.get("sections", 1)
+        for n in range(sections):
+            execute_plan(driver, plan, n)
+            if n < sections - 1 and not go_to_next_section(driver):
+                logger.error("Could not move on to section %s.", n + 2)
+                return False
+        capture_page_metrics(driver, "fill")
+        return submit_form(driver)
+    except TimeoutException:
+        logger.error("Timed out waiting for form page elements during filling: %s", form_url)
+        return False
+    except Exception as e:
+        logger.error("An unexpected error occurred during form filling: %s", e)
+        return False
+    finally:
+        logger.info("Form filling completed in %.2f seconds", fill_span.end())
+
+
+# Question types whose values READ_BACK_JS reads back
+READ_BACK_TYPES = ("text", "date", "time", "multiple_choice", "linear_scale", "checkbox", "dropdown")
+
+# JavaScript that reads back the current value of every question in one call.
+# arguments[0] is the list of question identifiers; returns one entry per identifier.
+READ_BACK_JS = """
+var identifiers = arguments[0];
+var items = Array.prototype.slice.call(document.querySelectorAll('div[role="listitem"]'));
+function clean(text) { return (text || '').replace(/\\*/g, '').replace(/\\s+/g, ' ').trim(); }
+function label(el) { return el.getAttribute('data-value') || el.getAttribute('aria-label') || clean(el.textContent); }
+return identifiers.map(function(identifier) {
+    var target = clean(identifier);
+    var item = items.find(function(it) {
+        var heading = it.querySelector('div[role="heading"]');
+        if (heading && clean(heading.textContent).indexOf(target) !== -1) { return true; }
+        var input = it.querySelector('input[aria-label], textarea[aria-label]');
+        return input && clean(input.getAttribute('aria-label')) === target;
+    });
+    if (!item) { return {found: false}; }
+    var text = item.querySelector('input[type="text"], input[type="email"], input[type="url"], input[type="number"], input[type="date"], input[type="time"], textarea');
+    var radios = item.querySelectorAll('div[role="radio"][aria-checked="true"]');
+    var boxes = item.querySelectorAll('div[role="checkbox"][aria-checked="true"]');
+    var option = item.querySelector('div[role="option"][aria-selected="true"]');
+    return {
+        found: true,
+        text: text ? text.value : null,
+        radios: Array.prototype.map.call(radios, label),
+        checkboxes: Array.prototype.map.call(boxes, label),
+        dropdown: option ? label(option) : null
+    };
+});
+"""
+
+
+def _read_back_matches(q_type, expected, actual):
+    """Compare an intended answer with the value read back from the page."""
+    if q_type not in READ_BACK_TYPES:
+        return None  # No read-back support for this question type
+    if not actual.get("found"):
+        return False
+    if q_type in ("text", "date", "time"):
+        return (actual.get("text") or "") == str(expected)
+    if q_type in ("multiple_choice", "linear_scale"):
+        return str(expected) in actual.get("radios", [])
+    if q_type == "checkbox":
+        expected = expected if isinstance(expected, list) else [expected]
+        return set(map(str, expected)) <= set(actual.get("checkboxes", []))
+    return actual.get("dropdown") == str(expected)  # dropdown
+
+
+def dry_run_plan(driver, form_url, plan):
+    """
+    Load the form and replay a plan like fill_form_from_plan, but stop before
+    clicking Submit. Each section is read back in a single JavaScript call
+    and compared with the planned answers before moving on ("Next" never
+    submits). Returns a fill report dict; nothing is submitted.
+    """
+    logger.info("Dry run form filling started: %s", form_url)
+    total_span = Span("dry_run").start()
+    report = {
+        "form_url": form_url,
+        "load_time": None,
+        "fill_time": None,
+        "verify_time": None,
+        "total_time": None,
+        "questions": [],
+        "unresolved": plan["unresolved"],
+        "verified": 0,
+        "mismatched": 0,
+        "error": None
+    }
+    # The value an action sets (a typed text, a scale point) or else the answer it picks
+    expected_answers = {action["question"]: action.get("value", action.get("answer")) for action in plan["actions"]}
+
+    try:
+        with span("page_load") as load_span:
+            load_form(driver, form_url)
+        report["load_time"] = round(load_span.duration, 3)
+        wait_for_questions(driver)
+        capture_page_metrics(driver, "fill_load")
+
+        report["fill_time"] = report["verify_time"] = 0.0
+        sections = plan.get("sections", 1)
+        for n in range(sections):
+            with span("fill_questions") as fill_span:
+                questions = execute_plan(driver, plan, n)
+            report["fill_time"] = round(report["fill_time"] + fill_span.duration, 3)
+            report["questions"].extend(questions)
+
+            with span("verify") as verify_span:
+                read_back = driver.execute_script(READ_BACK_JS, [entry["identifier"] for entry in questions])
+            report["verify_time"] = round(report["verify_time"] + verify_span.duration, 3)
+
+            for entry, actual in zip(questions, read_back):
+                expected = expected_answers.get(entry["identifier"])
+                entry["expected"] = expected
+                entry["actual"] = actual
+                entry["matched"] = _read_back_matches(entry["type"], expected, actual) if expected is not None else None
+                if entry["matched"] is True:
+                    report["verified"] += 1
+                elif entry["matched"] is False:
+                    report["mismatched"] += 1
+                    logger.debug("Mismatch for '%s': expected '%s', found %s", entry["identifier"], expected, actual)
+
+            if n < sections - 1 and not go_to_next_section(driver):
+                report["error"] = f"Could not move on to section {n + 2}"
+                break
+        capture_page_metrics(driver, "fill")
+    except TimeoutException:
+        report["error"] = "Timed out waiting for the form to load"
+        logger.error("Timed out waiting for form page elements during dry run: %s", form_url)
+    except Exception as e:
+        report["error"] = str(e)
+        logger.error("An unexpected error occurred during dry run: %s", e)
+    finally:
+        report["total_time"] = round(total_span.end(), 3)
+        logger.info("Dry run completed in %.2f seconds: %s verified, %s mismatched",
+                    report["total_time"], report["verified"], report["mismatched"])
+
+    return report
+
+
+def save_plans(path, plans):
+    """Append plans to a JSONL file"""
+    with open(path, 'a', encoding='utf-8') as f:
+        for plan in plans:
+            f.write(json.dumps(plan, ensure_ascii=False) + "\n")
+
+
+def load_plans(path):
+    """Read every plan of a JSONL file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile and inspect answer plans.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compile_parser = commands.add_parser("compile", help="Compile answer sets into plans")
+    compile_parser.add_argument("structure", help="JSON file with the parsed form structure")
+    compile_parser.add_argument("answers", help="JSONL file with one answer set per line")
+    compile_parser.add_argument("-o", "--output", default="plans.jsonl", help="JSONL file to append plans to")
+    show_parser = commands.add_parser("show", help="Print the actions of stored plans")
+    show_parser.add_argument("plans", help="JSONL file of plans")
+    args = parser.parse_args(argv)
+
+    if args.command == "compile":
+        with open(args.structure, 'r', encoding='utf-8') as f:
+            form_structure = json.load(f)
+        with open(args.answers, 'r', encoding='utf-8') as f:
+            plans = [compile_plan(form_structure, json.loads(line)) for line in f if line.strip()]
+        save_plans(args.output, plans)
+        print(f"Compiled {len(plans)} plan(s) into {args.output}")
+    else:
+        for n, plan in enumerate(load_plans(args.plans), 1):
+            print(f"Plan {n} (schema {plan['schema_hash']}): {len(plan['actions'])} action(s), "
+                  f"{len(plan['skipped'])} skipped, {len(plan['unresolved'])} unresolved")
+            for action in plan["actions"]:
+                if "steps" in action:
+                    target = f"{len(action['steps'])} step(s)"
+                else:
+                    target = action.get("value", f"{len(action['targets'])} target(s)")
+                print(f"  {action['op']:<5} {action['question'][:50]!r}: {target}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
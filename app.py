@@ -3,22 +3,21 @@ Streamlit application for the Google Form Filler
 """
 
 import streamlit as st
-import time
-import json
 import os
 import re
-import sys
-from datetime import datetime
 from config import (
     AGE_GROUPS, GENDER_OPTIONS, COUNTRIES, 
-    MAX_RESPONSES_PER_USER, MAX_RESPONSES_PER_FORM
+    MAX_RESPONSES_PER_USER,
+    LOG_REFRESH_FPS
 )
 
-# Import the form filler functionality
-from proto1 import (
-    setup_driver, extract_form_structure, 
-    generate_responses, fill_form
-)
+# Import the background job runner (runs the form filler off the script thread)
+from job_runner import COMPLETED, FINISHED_STATES
+from log_stream import LogTail
+from user_tracker import QuotaExceededError
+from token_budget import TokenBudgetExceededError
+from circuit_breaker import CircuitOpenError
+from log_config import configure_logging
 
 # Set page config
 st.set_page_config(
@@ -28,6 +27,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Route the form filler's logs through the background log writer
+configure_logging()
+
 # Initialize user tracker
 @st.cache_resource
 def get_user_tracker():
@@ -36,6 +38,14 @@ def get_user_tracker():
 
 user_tracker = get_user_tracker()
 
+# Initialize the background job runner, shared by all sessions
+@st.cache_resource
+def get_job_runner():
+    from job_runner import JobRunner
+    return JobRunner(tracker=get_user_tracker())
+
+job_runner = get_job_runner()
+
 # Get user's IP address (in production, you'd extract this from request headers)
 def get_client_ip():
     # For local development, use a placeholder IP
@@ -58,6 +68,30 @@ Please use responsibly and ethically. This tool is for educational purposes only
 st.sidebar.header("Usage Information")
 st.sidebar.info(f"You have {remaining_submissions} out of {MAX_RESPONSES_PER_USER} daily submissions remaining.")
 
+# Today's usage analytics, read from the rollups only
+with st.sidebar.expander("Usage analytics (today)"):
+    usage_summary = user_tracker.get_usage_summary()
+    if usage_summary["requested"]:
+        st.metric("Success rate", f"{usage_summary['success_rate']:.0%}")
+        st.write(f"{usage_summary['successful']} of {usage_summary['requested']} submissions succeeded.")
+        if usage_summary["failures"]:
+            st.write("Failures: " + ", ".join(f"{reason} ({count})" for reason, count in usage_summary["failures"].items()))
+        for stage, latency in usage_summary["latency"].items():
+            st.write(f"{stage}: p50 {latency['p50']:.1f}s, p95 {latency['p95']:.1f}s")
+        for form in usage_summary["forms"]:
+            st.caption(f"{form['form_url'][:50]}: {form['successful']}/{form['requested']}")
+    else:
+        st.write("No submissions recorded today.")
+
+# Shared browser queue
+with st.sidebar.expander("Browser queue"):
+    queue_stats = job_runner.scheduler_stats()
+    st.write(f"{queue_stats['queued']} submission(s) waiting, {queue_stats['free_drivers']} browser(s) free.")
+    for tenant, stats in sorted(queue_stats["tenants"].items()):
+        if stats["completed"] or stats["waiting"] or stats["running"]:
+            st.caption(f"{tenant}: {stats['per_hour']} in the last hour, "
+                       f"wait p50 {stats['wait_p50'] or 0:.1f}s / p95 {stats['wait_p95'] or 0:.1f}s")
+
 # Form URL input
 form_url = st.text_input("Google Form URL", help="Enter the full URL of the Google Form")
 
@@ -94,9 +128,31 @@ with col2:
                               min_value=1, max_value=min(remaining_submissions, 15), 
                               value=min(3, remaining_submissions), 
                               help=f"Maximum {min(remaining_submissions, 15)} responses allowed")
+    
+    profile_job = st.checkbox("Profile this job", value=False,
+                              help="Record a Python profile and Chrome page metrics for this job (slower)")
+
+# Look up the job started by this session, if any
+active_job_id = st.session_state.get("job_id")
+active_job = job_runner.status(active_job_id) if active_job_id else None
+job_in_progress = active_job is not None and active_job["status"] not in FINISHED_STATES
+
+# Offer to resume this user's interrupted jobs
+if not job_in_progress:
+    for job in job_runner.resumable_jobs(client_ip)[:3]:
+        with st.sidebar.expander(f"Interrupted job {job['id']}"):
+            st.write(f"{job['spec']['form_url']}")
+            st.write(f"{job['completed']} of {job['requested']} submissions done.")
+            if st.button("Resume", key=f"resume_{job['id']}"):
+                try:
+                    if job_runner.resume(job["id"]):
+                        st.session_state["job_id"] = job["id"]
+                        st.rerun()
+                except QuotaExceededError as e:
+                    st.error(str(e))
 
 # Submit button
-if st.button("Generate and Submit Responses", disabled=remaining_submissions <= 0):
+if st.button("Generate and Submit Responses", disabled=remaining_submissions <= 0 or job_in_progress):
     if not form_url:
         st.error("Please enter a Google Form URL.")
     elif not audience:
@@ -110,98 +166,78 @@ if st.button("Generate and Submit Responses", disabled=remaining_submissions <=
     elif not objective:
         st.error("Please describe the form objective.")
     else:
-        # Create a status bar
-        status_bar = st.progress(0)
-        status_text = st.empty()
-        
-        # Create a placeholder for the log output
-        log_output = st.empty()
+        # Combine audience information
+        target_profile = f"A {', '.join(gender)} aged {', '.join(age_group)} from {', '.join(country)}. {audience} {objective}"
         
-        # Store logs in a list for display
-        logs = []
-        
-        def update_log(message):
-            """Update log display with new message"""
-            logs.append(f"{datetime.now().strftime('%H:%M:%S')} - {message}")
-            log_output.code("\n".join(logs), language="bash")
+        # Reserve quota and hand the job to a background worker; progress is polled below
+        try:
+            st.session_state["job_id"] = job_runner.submit({
+                "form_url": form_url,
+                "target_profile": target_profile,
+                "num_responses": num_responses,
+                "age_groups": age_group,
+                "genders": gender,
+                "countries": country,
+                "client_ip": client_ip,
+                "user_agent": user_agent,
+                "priority": "interactive",
+                "profile": profile_job
+            })
+            st.rerun()
+        except (QuotaExceededError, TokenBudgetExceededError, CircuitOpenError) as e:
+            st.error(str(e))
+
+# Job progress
+def show_job_progress(job):
+    """Update the progress bar and status line of a job"""
+    requested = job["requested"]
+    status_bar.progress(min(job["completed"] / requested, 1.0) if requested else 0.0)
+    status_text.text(job["message"])
+
+stream_job = False
+if active_job:
+    st.subheader(f"Job {active_job['id']}")
+    if active_job["requested"] < active_job["spec"].get("requested_responses", active_job["requested"]):
+        st.info(f"Only {active_job['requested']} submissions fit your remaining quota and the job's token budget.")
+    status_bar = st.progress(0.0)
+    status_text = st.empty()
+    log_output = st.empty()
+    
+    # Keep one tail per job in the session so reruns only read newly written log lines
+    log_tails = st.session_state.setdefault("log_tails", {})
+    if active_job["id"] not in log_tails:
+        log_tails[active_job["id"]] = LogTail(job_runner.store.log_path(active_job["id"]))
+    log_tail = log_tails[active_job["id"]]
+    
+    show_job_progress(active_job)
+    log_tail.poll()
+    log_tail.render(log_output)
+    
+    if active_job["status"] in FINISHED_STATES:
+        successful = active_job["successful"]
+        requested = active_job["requested"]
+        remaining = user_tracker.get_remaining_submissions(client_ip, user_agent)
+        st.sidebar.success(f"Updated: You have {remaining} submissions remaining today.")
         
-        # Start the process
-        update_log(f"Starting to process {form_url}")
-        update_log(f"Preparing to generate {num_responses} responses")
+        if active_job["status"] == COMPLETED and successful > 0:
+            st.success(f"Successfully submitted {successful} out of {requested} responses!")
+        elif active_job["error"]:
+            st.error(f"An error occurred: {active_job['error']}")
+        else:
+            st.error("Failed to submit any responses. Check the logs for details.")
         
-        # Setup WebDriver for Streamlit environment
-        update_log("Setting up WebDriver for Streamlit environment...")
-        driver = setup_driver("chrome")  # Explicitly request Chrome
+        log_path = job_runner.store.log_path(active_job["id"])
+        if os.path.exists(log_path):
+            with open(log_path, 'rb') as f:
+                st.download_button("Download full log", f, file_name=f"job_{active_job['id']}.log")
         
-        if driver:
-            try:
-                # Combine audience information
-                target_profile = f"A {', '.join(gender)} aged {', '.join(age_group)} from {', '.join(country)}. {audience} {objective}"
-                update_log(f"Target profile: {target_profile}")
-                
-                successful_submissions = 0
-                
-                for i in range(num_responses):
-                    # Update progress
-                    progress = (i) / num_responses
-                    status_bar.progress(progress)
-                    status_text.text(f"Processing submission {i+1} of {num_responses}...")
-                    
-                    # Extract form structure
-                    update_log(f"Extracting form structure for submission {i+1}...")
-                    form_structure = extract_form_structure(driver, form_url)
-                    
-                    if not form_structure:
-                        update_log("Failed to extract form structure. Skipping.")
-                        continue
-                    
-                    # Generate responses
-                    update_log(f"Generating responses for submission {i+1}...")
-                    answers = generate_responses(form_structure, target_profile, i)
-                    
-                    if not answers:
-                        update_log("Failed to generate answers. Skipping.")
-                        continue
-                    
-                    # Fill form
-                    update_log(f"Filling form for submission {i+1}...")
-                    if fill_form(driver, form_url, form_structure, answers):
-                        successful_submissions += 1
-                        update_log(f"✅ Submission {i+1} completed successfully.")
-                    else:
-                        update_log(f"❌ Submission {i+1} failed.")
-                    
-                    # Add delay between submissions
-                    if i < num_responses - 1:
-                        wait_time = 5
-                        update_log(f"Waiting {wait_time} seconds before next submission...")
-                        time.sleep(wait_time)
-                
-                # Final update
-                status_bar.progress(1.0)
-                status_text.text(f"Completed {successful_submissions} out of {num_responses} submissions.")
-                
-                # Record the usage
-                user_tracker.record_usage(client_ip, user_agent, form_url, num_responses, successful_submissions)
-                
-                # Update remaining submissions display
-                remaining = user_tracker.get_remaining_submissions(client_ip, user_agent)
-                st.sidebar.success(f"Updated: You have {remaining} submissions remaining today.")
-                
-                if successful_submissions > 0:
-                    st.success(f"Successfully submitted {successful_submissions} out of {num_responses} responses!")
-                else:
-                    st.error("Failed to submit any responses. Check the logs for details.")
-            
-            except Exception as e:
-                update_log(f"Error: {str(e)}")
-                st.error(f"An error occurred: {str(e)}")
-            finally:
-                # Close the WebDriver
-                update_log("Closing WebDriver...")
-                driver.quit()
-        else:
-            st.error("Failed to set up WebDriver. Check if you have Microsoft Edge installed.")
+        for artifact_path in active_job.get("profile_artifacts", []):
+            if os.path.exists(artifact_path):
+                with open(artifact_path, 'rb') as f:
+                    st.download_button(f"Download {os.path.basename(artifact_path)}", f,
+                                       file_name=os.path.basename(artifact_path), key=artifact_path)
+    else:
+        stream_job = True
 
 # Footer
 st.markdown("---")
@@ -209,3 +245,22 @@ st.markdown("""
 **Disclaimer**: This tool is meant for educational and testing purposes only. 
 Do not use it to submit fraudulent or spam responses to forms.
 """)
+
+# While a job runs, only this fragment reruns, LOG_REFRESH_FPS times per second; the rest
+# of the script (and its sidebar queries) runs again once the job has finished
+@st.fragment(run_every=1 / LOG_REFRESH_FPS)
+def stream_job_progress(job_id):
+    """Refresh the progress when it changed and the log view when new lines arrived"""
+    job = job_runner.status(job_id)
+    if job is None or job["status"] in FINISHED_STATES:
+        st.rerun()
+    progress = (job_id, job["completed"], job["message"])
+    if progress != st.session_state.get("job_progress"):
+        st.session_state["job_progress"] = progress
+        show_job_progress(job)
+    # Only reads the bytes appended since the last run; the view is redrawn only if they held new lines
+    log_tail.poll()
+    log_tail.render(log_output)
+
+if stream_job:
+    stream_job_progress(active_job["id"])
@@ -0,0 +1,634 @@
+"""
+Async driver module for the Google Form Filler.
+Drives Chrome over the DevTools Protocol websocket instead of chromedriver,
+so one asyncio event loop can run many pages at once. Commands are
+pipelined: every command carries an id and its reply resolves a future, so
+a page can have many commands in flight (all the independent actions of a
+form section are sent together), and load and network events are delivered
+to subscribers as they arrive instead of being polled for.
+
+The async equivalents of the extract and fill functions of proto1 and
+answer_plan work on an AsyncPage:
+
+    async with await AsyncBrowser.launch() as browser:
+        page = await browser.new_page()
+        form_structure = await extract_form_structure_async(page, form_url)
+        submitted = await fill_form_async(page, form_url, form_structure, answers)
+
+fill_many_async fills a list of compiled plans on several pages of one
+browser at once. From the command line:
+
+    python async_driver.py plans.jsonl --form-url https://docs.google.com/forms/d/e/.../viewform --pages 4
+
+Needs the websockets package and a local Chrome (or Chromium).
+"""
+
+import argparse
+import asyncio
+import contextvars
+import functools
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+from config import ASYNC_PAGES, CDP_COMMAND_TIMEOUT, WEBDRIVER_WAIT_TIME, QUESTION_WAIT_TIME
+from proto1 import (
+    FORM_SELECTOR, NEXT_BUTTON_XPATH, SUBMIT_SELECTORS, CONFIRMATION_TEXTS, ERROR_XPATH, CHROME_PATHS,
+    CAPTURE_FORM_JS, GRID_OPTIONS_JS, placeholder_answers
+)
+from answer_plan import compile_plan, TARGET_TIMEOUT, load_plans
+from form_parser import parse_html
+from browser_profiles import chrome_profile_arguments
+from metrics import Span, span
+from log_config import get_logger
+
+logger = get_logger(__name__)
+
+# Seconds between checks of a page condition, and of quiet network before a page counts as idle
+POLL_INTERVAL = 0.1
+NETWORK_IDLE_TIME = 0.5
+
+# Seconds to wait for Chrome to report its DevTools port
+LAUNCH_TIMEOUT = 20
+
+QUESTIONS_READY_JS = ("document.readyState === 'complete' && "
+                      "document.querySelector('div[role=\"listitem\"]') !== null")
+
+# Marks the current section's first question, so the next section can be told apart from it
+MARK_SECTION_JS = f"""
+var anchor = document.querySelector('div[role="listitem"]') || document.querySelector('{FORM_SELECTOR}');
+if (anchor) {{ anchor.setAttribute('data-filler-stale', '1'); }}
+"""
+NEXT_SECTION_READY_JS = (f"document.readyState === 'complete' && document.querySelector('{FORM_SELECTOR}') !== null && "
+                         "document.querySelector('[data-filler-stale]') === null")
+
+# Finds the first element of a list of XPaths and CSS selectors (XPaths start with "//" or "(")
+FIND_JS = """
+function find(selectors) {
+    for (var i = 0; i < selectors.length; i++) {
+        var el = selectors[i].indexOf('//') === 0 || selectors[i].indexOf('(') === 0
+            ? document.evaluate(selectors[i], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue
+            : document.querySelector(selectors[i]);
+        if (el) { return el; }
+    }
+    return null;
+}
+function exists(selectors) { return find(selectors) !== null; }
+"""
+
+# Runs one plan action (see answer_plan) in the page and returns its status
+RUN_ACTION_JS = FIND_JS + """
+function runAction(action) {
+    if (action.op === 'steps') {
+        var statuses = action.steps.map(runAction);
+        if (statuses.indexOf('filled') === -1 && action.fallback) {
+            return runAction({op: 'check', targets: [], fallback: action.fallback});
+        }
+        return statuses.filter(function(status) { return status !== 'filled'; })[0] || 'filled';
+    }
+    var el = find(action.targets);
+    if (action.op === 'type') {
+        if (!el) { return 'timeout'; }
+        el.focus();
+        var setter = Object.getOwnPropertyDescriptor(Object.getPrototypeOf(el), 'value').set;
+        setter.call(el, action.value);
+        el.dispatchEvent(new Event('input', { bubbles: true }));
+        el.dispatchEvent(new Event('change', { bubbles: true }));
+        return 'filled';
+    }
+    if (!el && action.fallback) {
+        var candidates = document.evaluate(action.fallback.xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        if (candidates.snapshotLength) {
+            el = candidates.snapshotItem(action.fallback.pick === 'middle' ? Math.floor(candidates.snapshotLength / 2) : 0);
+        }
+    }
+    if (!el) { return 'not_found'; }
+    if (action.op === 'check' && el.getAttribute('aria-checked') === 'true') { return 'filled'; }
+    el.click();
+    return 'filled';
+}
+"""
+
+CLICK_JS = FIND_JS + """
+function click(selectors) {
+    var el = find(selectors);
+    if (!el) { return false; }
+    el.scrollIntoView({block: 'center'});
+    el.click();
+    return true;
+}
+"""
+
+SUBMISSION_RESULT_JS = f"""
+(function() {{
+    var text = document.body ? document.body.innerText : '';
+    var confirmed = {json.dumps(CONFIRMATION_TEXTS)}.some(function(t) {{ return text.indexOf(t) !== -1; }});
+    var errors = document.evaluate({json.dumps(ERROR_XPATH)}, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    var messages = [];
+    for (var i = 0; i < errors.snapshotLength; i++) {{
+        var message = errors.snapshotItem(i).innerText.trim();
+        if (message) {{ messages.push(message); }}
+    }}
+    return {{confirmed: confirmed, errors: messages, url: location.href}};
+}})()
+"""
+
+
+class CDPError(Exception):
+    """Raised when a DevTools command fails or the connection is lost"""
+
+
+def find_chrome():
+    """Path of a local Chrome or Chromium binary, or None"""
+    for path in CHROME_PATHS:
+        if os.path.exists(path):
+            return path
+    for name in ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser", "chrome"):
+        path = shutil.which(name)
+        if path:
+            return path
+    return None
+
+
+def _call(script, function, *args):
+    """An expression that defines the functions of `script` and calls one of them with JSON arguments"""
+    return f"(function() {{{script}\nreturn {function}({', '.join(json.dumps(arg) for arg in args)});}})()"
+
+
+class CDPConnection:
+    def __init__(self, ws):
+        """A DevTools websocket: replies resolve their command's future, events go to listeners"""
+        self._ws = ws
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._listeners = defaultdict(list)
+        self._reader = asyncio.get_running_loop().create_task(self._read())
+
+    @classmethod
+    async def connect(cls, url):
+        if websockets is None:
+            raise RuntimeError("The async driver needs the websockets package (pip install websockets).")
+        return cls(await websockets.connect(url, max_size=None))
+
+    async def send(self, method, params=None, session_id=None, timeout=CDP_COMMAND_TIMEOUT):
+        """Send a command and wait for its result; other commands can be in flight meanwhile"""
+        message_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        message = {"id": message_id, "method": method, "params": params or {}}
+        if session_id:
+            message["sessionId"] = session_id
+        try:
+            await self._ws.send(json.dumps(message))
+            return await asyncio.wait_for(future, timeout)
+        except websockets.ConnectionClosed as e:
+            raise CDPError(f"DevTools connection closed: {e}") from e
+        finally:
+            self._pending.pop(message_id, None)
+
+    def on(self, method, callback, session_id=None):
+        """Call callback(params) for every `method` event of the session"""
+        self._listeners[(method, session_id)].append(callback)
+
+    async def _read(self):
+        try:
+            async for raw in self._ws:
+                message = json.loads(raw)
+                if "id" in message:
+                    future = self._pending.get(message["id"])
+                    if future is None or future.done():
+                        continue
+                    if "error" in message:
+                        future.set_exception(CDPError(message["error"].get("message", "DevTools command failed")))
+                    else:
+                        future.set_result(message.get("result", {}))
+                else:
+                    for callback in list(self._listeners.get((message.get("method"), message.get("sessionId")), ())):
+                        callback(message.get("params", {}))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(CDPError("DevTools connection closed"))
+
+    async def close(self):
+        await self._ws.close()
+        await self._reader
+
+
+class AsyncPage:
+    def __init__(self, connection, target_id, session_id):
+        """One tab of an AsyncBrowser, attached through its own DevTools session"""
+        self.connection = connection
+        self.target_id = target_id
+        self.session_id = session_id
+        self.inflight = set()
+        self.last_network_activity = time.monotonic()
+        self._loaded = asyncio.Event()
+
+    async def _enable(self):
+        for method, callback in (("Page.loadEventFired", self._on_load),
+                                 ("Network.requestWillBeSent", self._on_request),
+                                 ("Network.loadingFinished", self._on_request_done),
+                                 ("Network.loadingFailed", self._on_request_done)):
+            self.connection.on(method, callback, self.session_id)
+        await asyncio.gather(self.send("Page.enable"), self.send("Network.enable"), self.send("Runtime.enable"))
+
+    def _on_load(self, params):
+        self._loaded.set()
+
+    def _on_request(self, params):
+        self.inflight.add(params["requestId"])
+        self.last_network_activity = time.monotonic()
+
+    def _on_request_done(self, params):
+        self.inflight.discard(params["requestId"])
+        self.last_network_activity = time.monotonic()
+
+    async def send(self, method, params=None):
+        return await self.connection.send(method, params, self.session_id)
+
+    def expect_load(self):
+        """Call before an action that navigates; wait_for_load then waits for the new page"""
+        self._loaded.clear()
+
+    async def wait_for_load(self, timeout=WEBDRIVER_WAIT_TIME):
+        await asyncio.wait_for(self._loaded.wait(), timeout)
+
+    async def goto(self, url, timeout=WEBDRIVER_WAIT_TIME):
+        """Navigate and wait for the page's load event"""
+        self.expect_load()
+        result = await self.send("Page.navigate", {"url": url})
+        if result.get("errorText"):
+            raise CDPError(f"Navigation to {url} failed: {result['errorText']}")
+        await self.wait_for_load(timeout)
+
+    async def evaluate(self, expression):
+        """The JSON value of a JS expression (promises are awaited)"""
+        result = await self.send("Runtime.evaluate", {"expression": expression, "returnByValue": True,
+                                                      "awaitPromise": True})
+        if "exceptionDetails" in result:
+            details = result["exceptionDetails"]
+            raise CDPError(details.get("exception", {}).get("description") or details.get("text", "Script error"))
+        return result["result"].get("value")
+
+    async def script(self, body):
+        """Run a script written for Selenium's execute_script (a function body with `return`)"""
+        return await self.evaluate(f"(function() {{{body}}})()")
+
+    async def wait_for(self, expression, timeout, interval=POLL_INTERVAL):
+        """Wait until a JS expression is truthy and return its value; raises asyncio.TimeoutError"""
+        deadline = time.monotonic() + timeout
+        while True:
+            value = await self.evaluate(expression)
+            if value:
+                return value
+            if time.monotonic() >= deadline:
+                raise asyncio.TimeoutError(f"Timed out waiting for: {expression[:80]}")
+            await asyncio.sleep(interval)
+
+    async def wait_for_network_idle(self, idle=NETWORK_IDLE_TIME, timeout=WEBDRIVER_WAIT_TIME):
+        """Wait until no request has started or finished for `idle` seconds"""
+        deadline = time.monotonic() + timeout
+        while self.inflight or time.monotonic() - self.last_network_activity < idle:
+            if time.monotonic() >= deadline:
+                raise asyncio.TimeoutError("Timed out waiting for the network to go idle")
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def close(self):
+        await self.connection.send("Target.closeTarget", {"targetId": self.target_id})
+
+
+class AsyncBrowser:
+    def __init__(self, process, connection, user_data_dir, temporary, profiles=None):
+        self.process = process
+        self.connection = connection
+        self.user_data_dir = user_data_dir
+        self._temporary = temporary
+        self._profiles = profiles
+
+    @classmethod
+    async def launch(cls, profiles=None, binary=None):
+        """
+        Start a headless Chrome with remote debugging and connect to it.
+        With profiles (a browser_profiles.ProfileManager) it runs on a claimed
+        persistent profile; otherwise on a temporary one.
+        """
+        binary = binary or find_chrome()
+        if not binary:
+            raise RuntimeError("No Chrome or Chromium binary found.")
+        if profiles:
+            user_data_dir = profiles.claim()
+            arguments = chrome_profile_arguments(user_data_dir)
+        else:
+            user_data_dir = tempfile.mkdtemp(prefix="form-filler-cdp-")
+            arguments = [f"--user-data-dir={user_data_dir}"]
+        port_file = os.path.join(user_data_dir, "DevToolsActivePort")
+        if os.path.exists(port_file):
+            os.remove(port_file)
+
+        process = await asyncio.create_subprocess_exec(
+            binary, "--headless=new", "--remote-debugging-port=0", "--no-sandbox", "--disable-gpu",
+            "--disable-dev-shm-usage", "--no-first-run", "--no-default-browser-check", "--disable-extensions",
+            "--window-size=1920,1080", *arguments, "about:blank",
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        browser = cls(process, None, user_data_dir, temporary=not profiles, profiles=profiles)
+        try:
+            # Chrome writes the port and browser endpoint path here once it listens
+            deadline = time.monotonic() + LAUNCH_TIMEOUT
+            lines = []
+            while len(lines) < 2:
+                if time.monotonic() >= deadline or process.returncode is not None:
+                    raise RuntimeError("Chrome did not start its DevTools endpoint.")
+                await asyncio.sleep(POLL_INTERVAL)
+                if os.path.exists(port_file):
+                    with open(port_file, 'r', encoding='utf-8') as f:
+                        lines = f.read().split()
+            browser.connection = await CDPConnection.connect(f"ws://127.0.0.1:{lines[0]}{lines[1]}")
+        except BaseException:
+            await browser.close()
+            raise
+        logger.info("Chrome DevTools session started (running in headless mode).")
+        return browser
+
+    async def new_page(self):
+        """Open a new tab and attach to it"""
+        target = await self.connection.send("Target.createTarget", {"url": "about:blank"})
+        session = await self.connection.send("Target.attachToTarget", {"targetId": target["targetId"], "flatten": True})
+        page = AsyncPage(self.connection, target["targetId"], session["sessionId"])
+        await page._enable()
+        return page
+
+    async def close(self):
+        if self.connection:
+            try:
+                await self.connection.send("Browser.close", timeout=5)
+            except (CDPError, asyncio.TimeoutError):
+                pass
+            await self.connection.close()
+        if self.process.returncode is None:
+            try:
+                await asyncio.wait_for(self.process.wait(), 5)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+        if self._temporary:
+            shutil.rmtree(self.user_data_dir, ignore_errors=True)
+        elif self._profiles:
+            self._profiles.release(self.user_data_dir)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+async def load_form_async(page, form_url):
+    """Load the form page and wait until the form and its questions are there"""
+    with span("page_load"):
+        await page.goto(form_url)
+        await page.wait_for(f"document.querySelector('{FORM_SELECTOR}') !== null", WEBDRIVER_WAIT_TIME)
+    try:
+        await page.wait_for(QUESTIONS_READY_JS, QUESTION_WAIT_TIME)
+    except asyncio.TimeoutError:
+        logger.debug("No question items appeared within %s seconds; parsing the page as it is.", QUESTION_WAIT_TIME)
+
+
+async def parse_form_page_async(page):
+    """Parse the questions of the page, off the event loop (on the active parse pool, if any)"""
+    with span("capture"):
+        captured = await page.script(CAPTURE_FORM_JS)
+        html = captured["html"] if captured else await page.evaluate("document.documentElement.outerHTML")
+    with span("parse"):
+        # The executor does not inherit the context, which holds the active parse pool
+        context = contextvars.copy_context()
+        form_elements = await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(context.run, parse_html, html))
+    for question in form_elements:
+        if question["type"] in ("grid", "checkbox_grid") and not all(question["options"].values()):
+            grid_data = await page.script(GRID_OPTIONS_JS)
+            question["options"] = {"rows": question["options"]["rows"] or grid_data["rows"],
+                                   "columns": question["options"]["columns"] or grid_data["columns"]}
+    if not form_elements:
+        logger.warning("Could not extract any form questions. The structure might be unexpected.")
+    return form_elements
+
+
+async def go_to_next_section_async(page):
+    """Click "Next" and wait for the next section; False if there is none or it did not appear"""
+    if not await page.evaluate(_call(FIND_JS, "exists", [NEXT_BUTTON_XPATH])):
+        return False
+    with span("section_navigation"):
+        await page.script(MARK_SECTION_JS)
+        await page.evaluate(_call(CLICK_JS, "click", [NEXT_BUTTON_XPATH]))
+        try:
+            await page.wait_for(NEXT_SECTION_READY_JS, WEBDRIVER_WAIT_TIME)
+        except asyncio.TimeoutError:
+            logger.error("Timed out waiting for the next section; a required question may be unanswered.")
+            return False
+    try:
+        await page.wait_for(QUESTIONS_READY_JS, QUESTION_WAIT_TIME)
+    except asyncio.TimeoutError:
+        pass
+    return True
+
+
+async def run_action_async(page, action):
+    """Run one plan action, retrying until its targets appear or TARGET_TIMEOUT passes. Returns its status."""
+    deadline = time.monotonic() + TARGET_TIMEOUT[action["op"]]
+    question_span = Span("question_fill", type=action["type"]).start()
+    try:
+        while True:
+            status = await page.evaluate(_call(RUN_ACTION_JS, "runAction", action))
+            if status == "filled" or time.monotonic() >= deadline:
+                return status
+            await asyncio.sleep(POLL_INTERVAL)
+    except CDPError as e:
+        logger.error("Error running plan action for '%s': %s", action["question"], e)
+        return "error"
+    finally:
+        question_span.end()
+
+
+async def execute_plan_async(page, plan, section=None):
+    """
+    Run the actions of a plan (only those of one section, if given) on the
+    page. The actions are independent, so they are all sent at once.
+    Returns per-question entries like answer_plan.execute_plan.
+    """
+    actions = [a for a in plan["actions"] if section is None or a.get("section", 0) == section]
+    statuses = await asyncio.gather(*(run_action_async(page, action) for action in actions))
+    questions = [{"identifier": s["question"], "type": s["type"], "status": s["reason"]}
+                 for s in plan["skipped"] if section is None or s.get("section", 0) == section]
+    for action, status in zip(actions, statuses):
+        questions.append({"identifier": action["question"], "type": action["type"], "status": status})
+        if status != "filled":
+            logger.warning("Plan action for '%s' ended with status %s", action["question"], status)
+    return questions
+
+
+async def extract_form_structure_async(page, form_url):
+    """
+    Async equivalent of proto1.extract_form_structure: load the form, parse
+    it, and walk multi-section forms with placeholder answers. Returns the
+    structure, or None on failure.
+    """
+    try:
+        await load_form_async(page, form_url)
+        form_elements = []
+        section = 0
+        while True:
+            questions = await parse_form_page_async(page)
+            for question in questions:
+                question["section"] = section
+            form_elements.extend(questions)
+            if not await page.evaluate(_call(FIND_JS, "exists", [NEXT_BUTTON_XPATH])):
+                break
+            await execute_plan_async(page, compile_plan(questions, placeholder_answers(questions)))
+            if not await go_to_next_section_async(page):
+                logger.warning("Could not open section %s; the structure covers %s section(s) only.",
+                               section + 2, section + 1)
+                break
+            section += 1
+        logger.info("Detected %s form questions in %s section(s).", len(form_elements), section + 1)
+        return form_elements
+    except asyncio.TimeoutError:
+        logger.error("Timed out waiting for form elements to load at %s", form_url)
+        return None
+    except Exception as e:
+        # A lost connection or a page the parser chokes on fails this page only, not the whole gather
+        logger.error("Error extracting form structure: %s", e)
+        return None
+
+
+async def submit_form_async(page):
+    """
+    Click the submit button and wait for the confirmation page. Returns True
+    if confirmed, False if the form was not sent, and None if the page never
+    settled and neither confirmed nor rejected the submission.
+    """
+    with span("submit") as submit_span:
+        try:
+            await page.wait_for(_call(FIND_JS, "exists", SUBMIT_SELECTORS), 5)
+        except asyncio.TimeoutError:
+            logger.error("Could not find the submit button after trying all selectors.")
+            return False
+        form_page_url = await page.evaluate("location.href")
+        page.expect_load()
+        await page.evaluate(_call(CLICK_JS, "click", SUBMIT_SELECTORS))
+    logger.debug("Submit button clicked after %.2f seconds.", submit_span.duration)
+    settled = True
+    with span("confirmation"):
+        try:
+            await page.wait_for_load()
+        except asyncio.TimeoutError:
+            # No new document: validation errors, or a form that confirms in place
+            try:
+                await page.wait_for_network_idle()
+            except asyncio.TimeoutError:
+                settled = False
+        result = await page.evaluate(SUBMISSION_RESULT_JS)
+    if result["confirmed"]:
+        logger.info("Form submission confirmed.")
+        return True
+    if result["errors"]:
+        logger.error("Form submission failed. Found validation errors:")
+        for message in result["errors"]:
+            logger.warning("Validation error: %s", message)
+        return False
+    if result["url"] != form_page_url:
+        logger.info("Form submitted: the page moved on to %s", result["url"])
+        return True
+    if not settled:
+        logger.warning("The page was still busy after submitting and shows no confirmation or errors; "
+                       "the submission is unknown.")
+        return None
+    logger.warning("Form submitted, but confirmation message not found and no validation errors detected. Assuming success.")
+    return True
+
+
+async def fill_form_from_plan_async(page, form_url, plan):
+    """
+    Async equivalent of answer_plan.fill_form_from_plan. Returns True if the
+    submission was confirmed, None if its outcome is unknown (see submit_form_async).
+    """
+    logger.info("Form filling from plan started: %s", form_url)
+    fill_span = Span("fill_form").start()
+    try:
+        await load_form_async(page, form_url)
+        sections = plan.get("sections", 1)
+        for n in range(sections):
+            await execute_plan_async(page, plan, n)
+            if n < sections - 1 and not await go_to_next_section_async(page):
+                logger.error("Could not move on to section %s.", n + 2)
+                return False
+        return await submit_form_async(page)
+    except asyncio.TimeoutError:
+        logger.error("Timed out waiting for form page elements during filling: %s", form_url)
+        return False
+    except Exception as e:
+        logger.error("An unexpected error occurred during form filling: %s", e)
+        return False
+    finally:
+        logger.info("Form filling completed in %.2f seconds", fill_span.end())
+
+
+async def fill_form_async(page, form_url, form_structure, answers, artifacts=None):
+    """Async equivalent of proto1.fill_form: compile the answers into a plan and replay it"""
+    return await fill_form_from_plan_async(page, form_url, compile_plan(form_structure, answers, artifacts))
+
+
+async def fill_many_async(form_url, plans, pages=ASYNC_PAGES, profiles=None):
+    """
+    Fill and submit every plan on `pages` tabs of one browser at once.
+    Returns one result (True if confirmed, None if unknown) per plan, in order.
+    """
+    results = [False] * len(plans)
+    queue = asyncio.Queue()
+    for n, plan in enumerate(plans):
+        queue.put_nowait(n)
+
+    async def worker(page):
+        while not queue.empty():
+            n = queue.get_nowait()
+            results[n] = await fill_form_from_plan_async(page, form_url, plans[n])
+
+    async with await AsyncBrowser.launch(profiles) as browser:
+        tabs = await asyncio.gather(*(browser.new_page() for _ in range(max(1, min(pages, len(plans))))))
+        await asyncio.gather(*(worker(page) for page in tabs))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fill stored answer plans over the DevTools Protocol.")
+    parser.add_argument("plans", help="JSONL file of plans (see answer_plan.py)")
+    parser.add_argument("--form-url", required=True, help="URL of the form the plans were compiled for")
+    parser.add_argument("--pages", type=int, default=ASYNC_PAGES, help="Tabs filling plans at the same time")
+    args = parser.parse_args(argv)
+
+    plans = load_plans(args.plans)
+    started = time.time()
+    results = asyncio.run(fill_many_async(args.form_url, plans, args.pages))
+    submitted = sum(result is True for result in results)
+    unknown = sum(result is None for result in results)
+    print(f"{submitted} of {len(plans)} plan(s) submitted ({unknown} unknown) in {time.time() - started:.1f}s",
+          file=sys.stderr)
+    return 0 if submitted == len(plans) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+"""
+Headless batch runner for the Google Form Filler.
+
+Reads a JSONL file with one job per line, for example:
+    {"form_url": "https://docs.google.com/forms/d/e/.../viewform",
+     "profile": "College students interested in tech", "count": 3,
+     "options": {"seed": 7, "age_groups": ["18-24"], "submission_delay": 2}}
+
+With "dry_run": true in the options the form is filled and verified but
+never submitted; each result record then carries the fill report.
+
+Runs the jobs on a shared pool of drivers and writes one JSON result record
+per submission to the output file.
+
+Usage:
+    python batch_cli.py jobs.jsonl --output results.jsonl --concurrency 2
+
+Per-stage timing histograms of every job are written next to its log in the
+job store; --metrics additionally writes those of the whole run. With
+--profile (or "profile": true in a job's options) each job also gets a
+cProfile dump and summary and a log of Chrome's page metrics there
+(<job_id>.profile.pstats, <job_id>.profile.txt, <job_id>.cdp.jsonl).
+
+Jobs are in progress together and their submissions take turns on the
+--concurrency drivers: higher "priority" classes ("interactive", "batch",
+"background") go first, and within a class "tenant"s share the drivers in
+proportion to their "weight" (all three are job options). The jobs' captured
+forms are parsed on PARSE_WORKERS worker processes.
+
+A job line may carry a "job_id"; running the file again then resumes that
+job from its journal instead of starting over.
+
+A form that keeps failing (load timeouts, closed, asking for a login, or
+without parseable questions) opens its circuit: the jobs on it fail before
+their next submission until BREAKER_COOLDOWN has passed and a probe
+submission succeeds.
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import proto1
+from metrics import GLOBAL_REGISTRY
+from log_config import get_logger, configure_logging
+from config import LOG_LEVEL, JOB_MAX_ACTIVE, PARSE_WORKERS
+from job_runner import JobStore, FormJob, COMPLETED, FAILED
+from driver_pool import DriverPool
+from schema_store import SchemaStore
+from form_parser import ParsePool
+from circuit_breaker import CircuitBreaker
+from scheduler import FairScheduler, PRIORITY_CLASSES, DEFAULT_PRIORITY
+
+logger = get_logger(__name__)
+
+# Exit codes
+EXIT_OK = 0              # Every submission succeeded
+EXIT_FAILURES = 1        # At least one submission or job failed
+EXIT_BAD_INPUT = 2       # The job file could not be read or is invalid
+EXIT_SETUP_ERROR = 3     # Gemini model or WebDriver could not be set up
+
+# Options a job line may set, mapped to job spec fields
+JOB_OPTIONS = ("seed", "age_groups", "genders", "countries", "submission_delay", "dry_run", "profile",
+               "token_budget", "tenant", "priority", "weight")
+
+
+def load_jobs(path):
+    """Read and validate the job file. Returns (specs, errors)."""
+    specs, errors = [], []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                job = json.loads(line)
+            except json.JSONDecodeError as e:
+                errors.append(f"line {line_no}: invalid JSON ({e})")
+                continue
+
+            count = job.get("count")
+            if not job.get("form_url"):
+                errors.append(f"line {line_no}: missing form_url")
+            elif not isinstance(count, int) or count <= 0:
+                errors.append(f"line {line_no}: count must be a positive integer")
+            elif (job.get("options") or {}).get("priority", DEFAULT_PRIORITY) not in PRIORITY_CLASSES:
+                errors.append(f"line {line_no}: priority must be one of {', '.join(PRIORITY_CLASSES)}")
+            else:
+                options = job.get("options") or {}
+                spec = {
+                    "form_url": job["form_url"],
+                    "target_profile": job.get("profile", ""),
+                    "num_responses": count
+                }
+                spec.update({key: options[key] for key in JOB_OPTIONS if key in options})
+                specs.append((line_no, job.get("job_id"), spec))
+    return specs, errors
+
+
+class ResultWriter:
+    def __init__(self, stream):
+        """Thread-safe JSONL writer that flushes after every record"""
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        with self._lock:
+            self.stream.write(json.dumps(record) + "\n")
+            self.stream.flush()
+
+
+def run_batch(specs, writer, concurrency, browser_type="chrome", store=None, persistent_profiles=True):
+    """
+    Run every job on a shared driver pool; the jobs' submissions take turns
+    on the drivers through a fair scheduler. The drivers keep persistent
+    profiles and disk caches unless persistent_profiles is False.
+    Returns the final job status records, in job file order.
+    """
+    store = store or JobStore()
+    scheduler = FairScheduler(DriverPool(concurrency, browser_type, persistent_profiles=persistent_profiles))
+    schemas = SchemaStore()
+    # A single job has no other job to overlap its parsing with
+    parse_pool = ParsePool(min(PARSE_WORKERS, len(specs))) if PARSE_WORKERS and len(specs) > 1 else None
+    breaker = CircuitBreaker()
+
+    def run_one(line_no, job_id, spec):
+        record = store.get(job_id) if job_id else None
+        if record is None:
+            record = store.create(spec, job_id)
+        # Profiling is a choice of this run, not part of the resumed job
+        spec = dict(record["spec"], profile=spec.get("profile", False))
+
+        def on_result(result):
+            result["line"] = line_no
+            writer.write(result)
+            status = "ok" if result["success"] else "FAILED"
+            logger.info("[line %s] submission %s/%s: %s", line_no, result["index"] + 1, spec["num_responses"], status)
+
+        job = FormJob(record["id"], spec, store, on_result=on_result, scheduler=scheduler, schemas=schemas,
+                      parse_pool=parse_pool, breaker=breaker)
+        job.run()
+        final = store.get(record["id"])
+        if final["status"] == FAILED:
+            logger.error("[line %s] job %s failed: %s", line_no, record["id"], final["error"])
+        return final
+
+    try:
+        # More jobs than drivers are in progress so that short jobs are not stuck behind long ones
+        workers = max(1, min(len(specs), max(concurrency, JOB_MAX_ACTIVE)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-job") as executor:
+            futures = [executor.submit(run_one, *job) for job in specs]
+            results = [future.result() for future in futures]
+        for tenant, stats in sorted(scheduler.stats()["tenants"].items()):
+            logger.info("Tenant %s: %s submission(s), queue wait p50 %.1fs, p95 %.1fs",
+                        tenant, stats["completed"], stats["wait_p50"] or 0, stats["wait_p95"] or 0)
+        return results
+    finally:
+        scheduler.close()
+        if parse_pool:
+            parse_pool.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run Google Form Filler jobs from a JSONL file.")
+    parser.add_argument("jobs", help="JSONL file with one job per line")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="JSONL file to append result records to")
+    parser.add_argument("-c", "--concurrency", type=int, default=1,
+                        help="Number of browser drivers the jobs share; up to max(concurrency, JOB_MAX_ACTIVE) "
+                             "jobs are in progress at once")
+    parser.add_argument("--browser", default="chrome", choices=["chrome", "edge"], help="Browser to drive")
+    parser.add_argument("--log-level", default=None, choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="Log level for progress output on stderr (default: LOG_LEVEL from config)")
+    parser.add_argument("--metrics", help="Write the span histograms of the whole run to this Prometheus text file")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile every job (cProfile and Chrome page metrics, written next to each job's log)")
+    parser.add_argument("--no-browser-profile", action="store_true",
+                        help="Start every browser with a throwaway profile instead of a persistent one with a disk cache")
+    args = parser.parse_args(argv)
+    configure_logging(args.log_level or LOG_LEVEL)
+
+    try:
+        specs, errors = load_jobs(args.jobs)
+    except OSError as e:
+        print(f"Error: could not read job file: {e}", file=sys.stderr)
+        return EXIT_BAD_INPUT
+    if errors:
+        for error in errors:
+            print(f"Error: {error}", file=sys.stderr)
+        return EXIT_BAD_INPUT
+    if not specs:
+        print("Error: job file contains no jobs.", file=sys.stderr)
+        return EXIT_BAD_INPUT
+    if args.profile:
+        for _, _, spec in specs:
+            spec["profile"] = True
+    if args.concurrency < 1:
+        print("Error: concurrency must be at least 1.", file=sys.stderr)
+        return EXIT_BAD_INPUT
+
+    if not proto1.model:
+        print("Error: Gemini model is not configured.", file=sys.stderr)
+        return EXIT_SETUP_ERROR
+
+    started = time.time()
+    with open(args.output, 'a', encoding='utf-8') as output:
+        writer = ResultWriter(output)
+        results = run_batch(specs, writer, args.concurrency, args.browser,
+                            persistent_profiles=not args.no_browser_profile)
+
+    if args.metrics:
+        GLOBAL_REGISTRY.write(prometheus_path=args.metrics)
+
+    # Count from the job records so submissions skipped on resume are included
+    requested = sum(job["requested"] for job in results)
+    successful = sum(job["successful"] for job in results)
+    print(f"Finished {len(results)} job(s) in {time.time() - started:.1f}s: "
+          f"{successful} of {requested} submissions succeeded.", file=sys.stderr)
+
+    if all(job["error"] == "Failed to set up WebDriver." for job in results):
+        return EXIT_SETUP_ERROR
+    if any(job["status"] != COMPLETED for job in results) or successful < requested:
+        return EXIT_FAILURES
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
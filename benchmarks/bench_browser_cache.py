@@ -0,0 +1,127 @@
+"""
+Warm vs cold browser cache benchmark against the local fake Google Form server.
+
+Each round starts a new browser, runs extract_form_structure and fill_form
+once against a fixture form and quits, like a job or worker restart. Cold
+rounds start on an empty profile every time; warm rounds reuse one
+persistent profile (see browser_profiles) that a priming round has already
+filled. The form script is served with a long max-age and can be padded and
+delayed (--static-padding, --static-latency) to stand in for the weight of
+Google's static JS and CSS.
+
+Reports per-mode extract and fill latency percentiles and how many times
+the script was downloaded per round.
+
+Needs a local Chrome and its WebDriver, like the app itself.
+
+Usage:
+    python benchmarks/bench_browser_cache.py --form all_types --rounds 5 \
+        --static-latency 0.3 --static-padding 500000 --json cache.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import proto1
+from browser_profiles import ProfileManager
+from metrics import Histogram
+from fake_form_server import FakeFormServer
+from bench_e2e import stub_answers
+
+
+def run_round(profiles, form_url, browser, server):
+    """One browser lifetime: extract and fill once. Returns the timings and script downloads."""
+    profile_dir = profiles.claim()
+    driver = proto1.setup_driver(browser, profile_dir)
+    if not driver:
+        profiles.release(profile_dir)
+        raise RuntimeError("Failed to set up WebDriver.")
+    downloads_before = server.static_requests
+    proto1._section_cache.clear()
+    try:
+        started = time.perf_counter()
+        form_structure = proto1.extract_form_structure(driver, form_url)
+        extract = time.perf_counter() - started
+        if not form_structure:
+            raise RuntimeError("Could not extract the fixture form.")
+        started = time.perf_counter()
+        submitted = proto1.fill_form(driver, form_url, form_structure, stub_answers(form_structure))
+        fill = time.perf_counter() - started
+    finally:
+        driver.quit()
+        profiles.release(profile_dir)
+    return {"extract": extract, "fill": fill, "submitted": submitted,
+            "downloads": server.static_requests - downloads_before}
+
+
+def bench_mode(mode, rounds, form_url, browser, server):
+    extract, fill = Histogram(), Histogram()
+    downloads = submitted = 0
+    with tempfile.TemporaryDirectory() as root:
+        warm_profiles = ProfileManager(os.path.join(root, "warm"))
+        if mode == "warm":
+            run_round(warm_profiles, form_url, browser, server)
+        for n in range(rounds):
+            profiles = warm_profiles if mode == "warm" else ProfileManager(os.path.join(root, f"cold-{n}"))
+            result = run_round(profiles, form_url, browser, server)
+            extract.observe(result["extract"])
+            fill.observe(result["fill"])
+            downloads += result["downloads"]
+            submitted += result["submitted"]
+    return {
+        "mode": mode,
+        "rounds": rounds,
+        "submitted": submitted,
+        "extract_p50": extract.percentile(50),
+        "extract_p95": extract.percentile(95),
+        "fill_p50": fill.percentile(50),
+        "fill_p95": fill.percentile(95),
+        "script_downloads_per_round": round(downloads / rounds, 2)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Warm vs cold browser cache benchmark against the fake form server.")
+    parser.add_argument("--form", default="all_types", help="Fixture form id")
+    parser.add_argument("--rounds", type=int, default=5, help="Browser restarts per mode")
+    parser.add_argument("--latency", type=float, default=0.0, help="Server latency per form request (seconds)")
+    parser.add_argument("--static-latency", type=float, default=0.3, help="Latency per form script download (seconds)")
+    parser.add_argument("--static-padding", type=int, default=500000, help="Bytes of padding added to the form script")
+    parser.add_argument("--browser", default="chrome", choices=["chrome", "edge"])
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    server = FakeFormServer(latency=args.latency, static_latency=args.static_latency,
+                            static_padding=args.static_padding).start()
+    if args.form not in server.forms:
+        print(f"Unknown fixture form '{args.form}'. Available: {', '.join(sorted(server.forms))}")
+        return 2
+    form_url = server.form_url(args.form)
+    print(f"Benchmarking {form_url}")
+
+    results = []
+    try:
+        for mode in ("cold", "warm"):
+            result = bench_mode(mode, args.rounds, form_url, args.browser, server)
+            results.append(result)
+            print(f"{mode:<5} extract p50={result['extract_p50']:.3f}s p95={result['extract_p95']:.3f}s  "
+                  f"fill p50={result['fill_p50']:.3f}s p95={result['fill_p95']:.3f}s  "
+                  f"script downloads/round={result['script_downloads_per_round']}  "
+                  f"submitted {result['submitted']}/{result['rounds']}")
+    finally:
+        server.stop()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"form": args.form, "args": vars(args), "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
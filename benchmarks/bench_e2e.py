@@ -0,0 +1,196 @@
+"""
+End-to-end throughput benchmark against the local fake Google Form server.
+
+Runs the interactive CLI path (one driver, extract/generate/fill in a loop)
+and the batch path (batch_cli.run_batch on a driver pool) against a fixture
+form, with a stub in place of the Gemini model, and reports submissions per
+minute, per-stage latency percentiles, memory and the size of the scoped
+form captures against the full pages for each.
+
+Needs a local Chrome (or Edge) and its WebDriver, like the app itself.
+
+Usage:
+    python benchmarks/bench_e2e.py --form all_types --submissions 6 --concurrency 2 \
+        --latency 0.2 --llm-latency 0.5 --json bench.json
+"""
+
+import argparse
+import io
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import proto1
+from batch_cli import ResultWriter, run_batch
+from job_runner import JobStore
+from metrics import GLOBAL_REGISTRY
+from fake_form_server import FakeFormServer
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+        self.prompt_feedback = None
+
+
+class StubModel:
+    def __init__(self, latency=0.0):
+        """Stands in for the Gemini model: answers every question with its first valid option"""
+        self.latency = latency
+
+    def generate_content(self, prompt):
+        time.sleep(self.latency)
+        # The prompt embeds the form structure as a JSON array right after this marker
+        start = prompt.index("[", prompt.index("identifiers that must be used:"))
+        form_structure, _ = json.JSONDecoder().raw_decode(prompt, start)
+        return StubResponse(json.dumps(stub_answers(form_structure)))
+
+
+def stub_answers(form_structure):
+    """Deterministic, valid answers for a parsed form structure"""
+    answers = {}
+    for question in form_structure:
+        q_type, options = question["type"], question["options"]
+        if isinstance(options, dict) and "values" in options:
+            options = options["values"]
+        if q_type in ("text", "date", "time"):
+            answers[question["identifier"]] = {"date": "2024-01-15", "time": "10:30"}.get(q_type, "Benchmark answer")
+        elif q_type == "linear_scale":
+            answers[question["identifier"]] = options[len(options) // 2] if options else "3"
+        elif q_type in ("multiple_choice", "dropdown") and options:
+            answers[question["identifier"]] = options[-1]
+        elif q_type == "checkbox" and options:
+            answers[question["identifier"]] = options[:2]
+        elif q_type in ("grid", "checkbox_grid") and options.get("rows"):
+            column = options["columns"][0] if options["columns"] else ""
+            answers[question["identifier"]] = {
+                row: [column] if q_type == "checkbox_grid" else column for row in options["rows"]
+            }
+    return answers
+
+
+def measure(name, func):
+    """Run func() and collect wall time, span percentiles and memory"""
+    GLOBAL_REGISTRY.clear()
+    tracemalloc.start()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    capture_before = proto1.capture_stats()
+    started = time.perf_counter()
+    submissions, successful = func()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stages = {}
+    for entry in GLOBAL_REGISTRY.snapshot()["spans"]:
+        label = entry["span"] + "".join(f"[{v}]" for v in entry["labels"].values())
+        stages[label] = {"count": entry["count"], "p50": entry["p50"], "p95": entry["p95"]}
+    capture_after = proto1.capture_stats()
+    capture = {key: round(capture_after[key] - capture_before[key], 6) for key in capture_after}
+    return {
+        "path": name,
+        "submissions": submissions,
+        "successful": successful,
+        "elapsed": round(elapsed, 3),
+        "submissions_per_min": round(submissions / elapsed * 60, 2) if elapsed else None,
+        "python_peak_kb": peak // 1024,
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "max_rss_growth_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before,
+        "stages": stages,
+        "capture": capture
+    }
+
+
+def bench_cli(form_url, submissions, browser):
+    """The interactive main() loop: one driver, no delay between submissions"""
+    driver = proto1.setup_driver(browser)
+    if not driver:
+        raise RuntimeError("Failed to set up WebDriver.")
+    successful = 0
+    try:
+        for i in range(submissions):
+            form_structure = proto1.extract_form_structure(driver, form_url)
+            answers = proto1.generate_responses(form_structure, "Benchmark respondents", i) if form_structure else None
+            if answers and proto1.fill_form(driver, form_url, form_structure, answers):
+                successful += 1
+    finally:
+        driver.quit()
+    return submissions, successful
+
+
+def bench_batch(form_url, submissions, concurrency, browser):
+    """batch_cli.run_batch with the submissions split over `concurrency` jobs"""
+    per_job = [submissions // concurrency + (1 if i < submissions % concurrency else 0) for i in range(concurrency)]
+    specs = [
+        (n + 1, None, {"form_url": form_url, "target_profile": "Benchmark respondents",
+                       "num_responses": count, "submission_delay": 0, "seed": n})
+        for n, count in enumerate(per_job) if count
+    ]
+    with tempfile.TemporaryDirectory() as store_dir:
+        jobs = run_batch(specs, ResultWriter(io.StringIO()), concurrency, browser, JobStore(store_dir))
+    return sum(job["completed"] for job in jobs), sum(job["successful"] for job in jobs)
+
+
+def print_result(result):
+    print(f"\n== {result['path']} ==")
+    print(f"{result['successful']}/{result['submissions']} submitted in {result['elapsed']:.1f}s "
+          f"({result['submissions_per_min']} submissions/min)")
+    print(f"Python heap peak {result['python_peak_kb']} KB, max RSS {result['max_rss_kb']} KB "
+          f"(+{result['max_rss_growth_kb']} KB)")
+    capture = result["capture"]
+    print(f"Form capture: {capture['captures']} page(s), {capture['fallbacks']} full-page fallback(s), "
+          f"{capture['captured_chars']} of {capture['page_chars']} characters transferred, "
+          f"~{capture['parse_seconds_saved']:.3f}s of parsing saved")
+    for stage, stats in sorted(result["stages"].items()):
+        print(f"  {stage:<28} n={stats['count']:<4} p50={stats['p50']:.3f}s p95={stats['p95']:.3f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end benchmark against the fake form server.")
+    parser.add_argument("--form", default="all_types", help="Fixture form id")
+    parser.add_argument("--submissions", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=2, help="Drivers for the batch path")
+    parser.add_argument("--latency", type=float, default=0.0, help="Server latency per request (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random server latency (seconds)")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Stub model latency (seconds)")
+    parser.add_argument("--browser", default="chrome", choices=["chrome", "edge"])
+    parser.add_argument("--paths", default="cli,batch", help="Comma-separated paths to run")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    server = FakeFormServer(latency=args.latency, jitter=args.jitter).start()
+    if args.form not in server.forms:
+        print(f"Unknown fixture form '{args.form}'. Available: {', '.join(sorted(server.forms))}")
+        return 2
+    proto1.model = StubModel(args.llm_latency)
+    form_url = server.form_url(args.form)
+    print(f"Benchmarking {form_url}")
+
+    results = []
+    try:
+        paths = args.paths.split(",")
+        if "cli" in paths:
+            results.append(measure("cli", lambda: bench_cli(form_url, args.submissions, args.browser)))
+            print_result(results[-1])
+        if "batch" in paths:
+            results.append(measure(f"batch (concurrency {args.concurrency})",
+                                   lambda: bench_batch(form_url, args.submissions, args.concurrency, args.browser)))
+            print_result(results[-1])
+    finally:
+        server.stop()
+
+    print(f"\nServer recorded {server.response_count()} response(s).")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"form": args.form, "args": vars(args), "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""
+Local stand-in for Google Forms, for offline benchmarks and manual testing.
+
+Serves the HTML fixtures in benchmarks/fixtures as forms at
+    http://127.0.0.1:<port>/forms/d/e/<form_id>/viewform
+where <form_id> is a fixture name: "all_types" serves all_types.html and
+"multi_section" serves multi_section_1.html, multi_section_2.html, ... as
+consecutive sections. POSTs to .../formResponse move to the next section
+("Next") or record the response and show the confirmation page ("Submit").
+The form script is served with a long Cache-Control max-age, like Google's
+static assets, and can be padded and delayed to stand in for their weight.
+
+Usage:
+    python benchmarks/fake_form_server.py --port 8765 --latency 0.2 --jitter 0.1
+"""
+
+import argparse
+import html
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+FORM_PATH = re.compile(r"^/forms/d/e/([\w-]+)/(viewform|formResponse)$")
+
+CONFIRMATION_PAGE = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>{title}</title></head>
+<body>
+<div role="heading">{title}</div>
+<div class="vHW8K">Your response has been recorded.</div>
+<a href="viewform">Submit another response</a>
+</body>
+</html>
+"""
+
+
+def load_fixtures(fixture_dir=FIXTURE_DIR):
+    """Map each form id to the list of its section pages, in order"""
+    forms = {}
+    for name in sorted(os.listdir(fixture_dir)):
+        if not name.endswith(".html"):
+            continue
+        match = re.match(r"^(.*?)(?:_(\d+))?\.html$", name)
+        form_id, section = match.group(1), int(match.group(2) or 1)
+        with open(os.path.join(fixture_dir, name), 'r', encoding='utf-8') as f:
+            forms.setdefault(form_id, []).append((section, f.read()))
+    return {form_id: [page for _, page in sorted(pages)] for form_id, pages in forms.items()}
+
+
+class FakeFormServer:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, fixture_dir=FIXTURE_DIR,
+                 static_latency=0.0, static_padding=0):
+        """
+        Serve the fixtures on host:port (port 0 picks a free port).
+        Every form request is delayed by latency + uniform(0, jitter) seconds,
+        and every download of the form script by static_latency seconds; the
+        script is padded with a comment of static_padding bytes.
+        """
+        self.forms = load_fixtures(fixture_dir)
+        self.latency = latency
+        self.jitter = jitter
+        self.static_latency = static_latency
+        self.static_requests = 0
+        self.responses = []
+        self._lock = threading.Lock()
+        self._thread = None
+        with open(os.path.join(fixture_dir, "form.js"), 'rb') as f:
+            self.script = f.read()
+        if static_padding:
+            self.script += b"\n/*" + b"x" * static_padding + b"*/\n"
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def form_url(self, form_id):
+        return f"{self.base_url}/forms/d/e/{form_id}/viewform"
+
+    def delay(self):
+        if self.latency or self.jitter:
+            time.sleep(self.latency + random.uniform(0, self.jitter))
+
+    def record(self, form_id, fields):
+        with self._lock:
+            self.responses.append({"form_id": form_id, "timestamp": time.time(), "fields": fields})
+
+    def response_count(self, form_id=None):
+        with self._lock:
+            return sum(1 for r in self.responses if form_id is None or r["form_id"] == form_id)
+
+    def start(self):
+        """Serve on a background thread"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-form-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass  # Keep benchmark output clean
+
+            def send_page(self, body, status=200, content_type="text/html; charset=utf-8", cache_control=None):
+                data = body.encode("utf-8") if isinstance(body, str) else body
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                if cache_control:
+                    self.send_header("Cache-Control", cache_control)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                path = urlparse(self.path).path
+                if path == "/static/form.js":
+                    with server._lock:
+                        server.static_requests += 1
+                    if server.static_latency:
+                        time.sleep(server.static_latency)
+                    return self.send_page(server.script, content_type="application/javascript",
+                                          cache_control="public, max-age=31536000, immutable")
+                if path == "/stats":
+                    return self.send_page(json.dumps({"responses": server.response_count()}),
+                                          content_type="application/json")
+                match = FORM_PATH.match(path)
+                if not match or match.group(2) != "viewform" or match.group(1) not in server.forms:
+                    return self.send_page("Not found", status=404, content_type="text/plain")
+                server.delay()
+                self.send_page(server.forms[match.group(1)][0])
+
+            def do_POST(self):
+                match = FORM_PATH.match(urlparse(self.path).path)
+                if not match or match.group(2) != "formResponse" or match.group(1) not in server.forms:
+                    return self.send_page("Not found", status=404, content_type="text/plain")
+                form_id = match.group(1)
+                sections = server.forms[form_id]
+
+                length = int(self.headers.get("Content-Length") or 0)
+                fields = parse_qs(self.rfile.read(length).decode("utf-8"), keep_blank_values=True)
+                answers = json.loads(fields.pop("partialResponse", ["{}"])[0])
+                for key, values in fields.items():
+                    if key.startswith("entry."):
+                        answers[key] = values if len(values) > 1 else values[0]
+
+                server.delay()
+                page = len(fields.get("pageHistory", ["0"])[0].split(","))
+                if fields.get("continue", [""])[0] and page < len(sections):
+                    # Carry the answers given so far into the next section, like Google's partialResponse
+                    carried = f'<input type="hidden" name="partialResponse" value="{html.escape(json.dumps(answers))}">'
+                    return self.send_page(sections[page].replace("</form>", carried + "\n</form>", 1))
+
+                server.record(form_id, answers)
+                title = re.search(r"<title>(.*?)</title>", sections[0])
+                self.send_page(CONFIRMATION_PAGE.format(title=title.group(1) if title else "Form"))
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve Google Form fixtures locally.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every form request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random delay of up to this many seconds")
+    parser.add_argument("--static-latency", type=float, default=0.0, help="Seconds added to every form script download")
+    parser.add_argument("--static-padding", type=int, default=0, help="Bytes of padding added to the form script")
+    args = parser.parse_args(argv)
+
+    server = FakeFormServer(args.host, args.port, args.latency, args.jitter,
+                            static_latency=args.static_latency, static_padding=args.static_padding)
+    for form_id, sections in sorted(server.forms.items()):
+        print(f"{server.form_url(form_id)} ({len(sections)} section(s))")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"Recorded {server.response_count()} response(s).")
+
+
+if __name__ == "__main__":
+    main()
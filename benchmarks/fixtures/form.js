@@ -0,0 +1,36 @@
+// Minimal stand-in for the Google Forms client script: keeps the ARIA state of
+// radios, checkboxes and dropdown options, and posts the answers as entry.* fields.
+document.addEventListener('click', function (event) {
+    var choice = event.target.closest('[role="radio"], [role="checkbox"], [role="option"]');
+    if (choice) {
+        var group = choice.closest('[data-entry]');
+        var role = choice.getAttribute('role');
+        if (role === 'checkbox') {
+            choice.setAttribute('aria-checked', choice.getAttribute('aria-checked') === 'true' ? 'false' : 'true');
+        } else {
+            var state = role === 'option' ? 'aria-selected' : 'aria-checked';
+            group.querySelectorAll('[role="' + role + '"]').forEach(function (other) {
+                other.setAttribute(state, other === choice ? 'true' : 'false');
+            });
+        }
+        return;
+    }
+
+    var button = event.target.closest('[role="button"][data-action]');
+    if (!button) { return; }
+    var form = document.querySelector('form');
+    document.querySelectorAll('[data-entry]').forEach(function (group) {
+        var selected = group.querySelectorAll('[aria-checked="true"], [aria-selected="true"]');
+        selected.forEach(function (choice) {
+            var value = choice.getAttribute('data-value') || choice.getAttribute('aria-label');
+            if (!value) { return; }
+            var input = document.createElement('input');
+            input.type = 'hidden';
+            input.name = group.getAttribute('data-entry');
+            input.value = value;
+            form.appendChild(input);
+        });
+    });
+    form.querySelector('input[name="continue"]').value = button.getAttribute('data-action') === 'next' ? '1' : '';
+    form.submit();
+});
@@ -0,0 +1,108 @@
+"""
+Load test for the quota reservation layer of UserTracker.
+
+Simulates many Streamlit sessions in parallel (several processes, each with
+several threads) that reserve quota, run submissions and release what they
+did not use, then checks that no user or form went over its daily limit.
+
+Usage:
+    python benchmarks/quota_load_test.py --processes 4 --threads 8 --sessions 50
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import MAX_RESPONSES_PER_USER, MAX_RESPONSES_PER_FORM
+from user_tracker import UserTracker, QuotaExceededError
+
+
+def simulate_sessions(db_path, sessions, users, forms, seed, results):
+    """Run `sessions` simulated jobs against the tracker on one thread"""
+    rng = random.Random(seed)
+    tracker = UserTracker(db_path)
+    granted_total = rejected = 0
+    for _ in range(sessions):
+        ip = f"10.0.0.{rng.randrange(users)}"
+        form_url = f"https://docs.google.com/forms/d/e/form{rng.randrange(forms)}/viewform"
+        try:
+            reservation_id, granted = tracker.reserve_quota(ip, "load-test", form_url, rng.randint(1, 5))
+        except QuotaExceededError:
+            rejected += 1
+            continue
+        granted_total += granted
+        # Use part of the reservation, sometimes abandoning the job early
+        for _ in range(rng.randint(0, granted)):
+            tracker.consume_reservation(reservation_id, rng.random() < 0.8)
+        tracker.release_reservation(reservation_id)
+    results.append((granted_total, rejected))
+
+
+def run_process(db_path, threads, sessions, users, forms, seed, queue):
+    results = []
+    workers = [
+        threading.Thread(target=simulate_sessions, args=(db_path, sessions, users, forms, seed * 1000 + t, results))
+        for t in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    queue.put(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test quota reservations.")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--sessions", type=int, default=50, help="Simulated jobs per thread")
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--forms", type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="quota_load_")
+    os.chdir(workdir)  # Keep the legacy JSON migration away from the real usage files
+    db_path = os.path.join(workdir, "usage.db")
+    UserTracker(db_path)
+
+    queue = multiprocessing.Queue()
+    started = time.time()
+    processes = [
+        multiprocessing.Process(target=run_process,
+                                args=(db_path, args.threads, args.sessions, args.users, args.forms, p, queue))
+        for p in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    results = [r for _ in processes for r in queue.get()]
+    for process in processes:
+        process.join()
+    elapsed = time.time() - started
+
+    conn = sqlite3.connect(db_path)
+    user_max = conn.execute("SELECT COALESCE(MAX(count), 0) FROM user_daily").fetchone()[0]
+    form_max = conn.execute("SELECT COALESCE(MAX(count), 0) FROM form_daily").fetchone()[0]
+    leftover = conn.execute("SELECT COUNT(*) FROM reservations").fetchone()[0]
+    total_sessions = args.processes * args.threads * args.sessions
+
+    print(f"Sessions: {total_sessions} in {elapsed:.2f}s ({total_sessions / elapsed:.0f}/s)")
+    print(f"Granted units: {sum(r[0] for r in results)}, rejected jobs: {sum(r[1] for r in results)}")
+    print(f"Highest user count: {user_max} (limit {MAX_RESPONSES_PER_USER})")
+    print(f"Highest form count: {form_max} (limit {MAX_RESPONSES_PER_FORM})")
+    print(f"Reservations left open: {leftover}")
+
+    ok = user_max <= MAX_RESPONSES_PER_USER and form_max <= MAX_RESPONSES_PER_FORM and leftover == 0
+    print("PASS" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
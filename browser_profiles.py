@@ -0,0 +1,159 @@
+"""
+Browser profile module for the Google Form Filler.
+Gives every browser session a persistent Chrome profile and disk cache
+instead of a throwaway one, so the form page's static JS and CSS come
+from the cache once a worker has loaded the form before. A profile
+directory can be used by one browser at a time: each session claims a free
+slot under BROWSER_PROFILE_DIR and gives it back when the browser quits.
+
+The HTTP cache is capped by Chrome itself (--disk-cache-size); released
+profiles that outgrow BROWSER_PROFILE_MAX_BYTES have their caches cleared,
+and slots unused for BROWSER_PROFILE_MAX_AGE are deleted, at most every
+BROWSER_PROFILE_CLEANUP_INTERVAL seconds:
+
+    profiles = ProfileManager()
+    profile_dir = profiles.claim()
+    driver = setup_driver("chrome", profile_dir)
+    ...
+    driver.quit()
+    profiles.release(profile_dir)
+
+Set BROWSER_PROFILES=0 in the environment to go back to throwaway profiles.
+"""
+
+import os
+import shutil
+import threading
+import time
+from config import (
+    BROWSER_PROFILES, BROWSER_PROFILE_DIR, BROWSER_CACHE_MAX_BYTES, BROWSER_PROFILE_MAX_BYTES,
+    BROWSER_PROFILE_MAX_AGE, BROWSER_PROFILE_CLEANUP_INTERVAL
+)
+from log_config import get_logger
+
+logger = get_logger(__name__)
+
+# Marks a slot as in use by a browser of the process whose PID it holds
+CLAIM_FILE = ".claimed"
+
+# Cache directories cleared from an oversized profile, relative to the profile directory
+CACHE_DIRS = ("cache", os.path.join("Default", "Cache"), os.path.join("Default", "Code Cache"),
+              os.path.join("Default", "GPUCache"), os.path.join("Default", "Service Worker", "CacheStorage"))
+
+
+def chrome_profile_arguments(profile_dir, cache_bytes=BROWSER_CACHE_MAX_BYTES):
+    """Command line arguments that make Chrome (or Edge) use a persistent profile and capped disk cache"""
+    return [
+        f"--user-data-dir={os.path.abspath(profile_dir)}",
+        f"--disk-cache-dir={os.path.abspath(os.path.join(profile_dir, 'cache'))}",
+        f"--disk-cache-size={cache_bytes}"
+    ]
+
+
+def directory_size(path):
+    """Total size in bytes of the files under path"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                continue
+    return total
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+class ProfileManager:
+    def __init__(self, root=BROWSER_PROFILE_DIR, max_bytes=BROWSER_PROFILE_MAX_BYTES, max_age=BROWSER_PROFILE_MAX_AGE,
+                 cleanup_interval=BROWSER_PROFILE_CLEANUP_INTERVAL):
+        """Persistent profile slots under root, one per browser session"""
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.cleanup_interval = cleanup_interval
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+        os.makedirs(self.root, exist_ok=True)
+
+    def _slot(self, n):
+        return os.path.join(self.root, f"worker-{n}")
+
+    def _try_claim(self, slot):
+        """Claim a slot for this process; claims of processes that died are taken over"""
+        os.makedirs(slot, exist_ok=True)
+        claim = os.path.join(slot, CLAIM_FILE)
+        try:
+            fd = os.open(claim, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                with open(claim, 'r', encoding='utf-8') as f:
+                    pid = int(f.read().strip() or 0)
+            except (OSError, ValueError):
+                return False
+            if pid and _pid_alive(pid):
+                return False
+            logger.debug("Taking over the profile of exited process %s: %s", pid, slot)
+            os.remove(claim)
+            return self._try_claim(slot)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(str(os.getpid()))
+        return True
+
+    def claim(self):
+        """The directory of a free profile slot, now reserved for one browser session"""
+        self.cleanup()
+        with self._lock:
+            n = 0
+            while not self._try_claim(self._slot(n)):
+                n += 1
+        slot = self._slot(n)
+        logger.debug("Using browser profile %s", slot)
+        return slot
+
+    def release(self, profile_dir):
+        """Give back a slot once its browser has quit, clearing its caches if it outgrew the cap"""
+        self._trim(profile_dir)
+        try:
+            os.remove(os.path.join(profile_dir, CLAIM_FILE))
+        except OSError:
+            pass
+
+    def _trim(self, profile_dir):
+        size = directory_size(profile_dir)
+        if size <= self.max_bytes:
+            return
+        for cache_dir in CACHE_DIRS:
+            shutil.rmtree(os.path.join(profile_dir, cache_dir), ignore_errors=True)
+        logger.info("Cleared the caches of browser profile %s (%s MB over the %s MB cap)", profile_dir,
+                    size // 2**20, self.max_bytes // 2**20)
+
+    def cleanup(self, force=False):
+        """Trim unclaimed profiles over the size cap and delete those unused for max_age seconds"""
+        now = time.time()
+        with self._lock:
+            if not force and now - self._last_cleanup < self.cleanup_interval:
+                return
+            self._last_cleanup = now
+        for name in os.listdir(self.root):
+            slot = os.path.join(self.root, name)
+            if not os.path.isdir(slot) or os.path.exists(os.path.join(slot, CLAIM_FILE)):
+                continue
+            if now - os.path.getmtime(slot) > self.max_age:
+                logger.debug("Deleting unused browser profile %s", slot)
+                shutil.rmtree(slot, ignore_errors=True)
+            else:
+                self._trim(slot)
+
+
+def default_profiles():
+    """A ProfileManager for the configured directory, or None when persistent profiles are turned off"""
+    return ProfileManager() if BROWSER_PROFILES else None
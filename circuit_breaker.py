@@ -0,0 +1,194 @@
+"""
+Circuit breaker module for the Google Form Filler.
+Stops jobs from burning page load timeouts on a form that cannot be filled.
+Failed submissions are classified (load timeout, closed form, login
+required, parse failure, fill failure) and counted per form; once a form
+fails as many times in a row as the threshold of one kind, its circuit
+opens, and every job on that form stops before its next submission. After
+BREAKER_COOLDOWN seconds one submission is let through as a probe
+(half-open): if it succeeds the circuit closes, otherwise it opens again.
+
+The state lives in SQLite, so it is shared by all jobs, workers and
+processes using the same database:
+
+    breaker = CircuitBreaker()
+    if breaker.allow(form_url):
+        ...
+        breaker.record_failure(form_url, classify_failure(driver, PARSE_FAILURE))
+"""
+
+import sqlite3
+import time
+from contextlib import contextmanager
+from config import BREAKER_DB_PATH, BREAKER_THRESHOLDS, BREAKER_COOLDOWN
+from log_config import get_logger
+
+logger = get_logger(__name__)
+
+# Circuit states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Failure kinds
+TIMEOUT = "timeout"
+CLOSED_FORM = "closed_form"
+LOGIN_REQUIRED = "login_required"
+PARSE_FAILURE = "parse_failure"
+FILL_FAILURE = "fill_failure"
+
+# Lowercase markers of a form that stopped accepting responses, and of a sign-in page
+CLOSED_FORM_MARKERS = ("closedform", "no longer accepting responses")
+LOGIN_MARKERS = ("accounts.google.com", "servicelogin", "sign in to continue")
+
+PAGE_TEXT_JS = "return document.body ? document.body.innerText.slice(0, 2000) : '';"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS form_circuits (
+    form_url TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    failures INTEGER NOT NULL DEFAULT 0,
+    last_kind TEXT,
+    opened_at REAL,
+    probe_started_at REAL,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def classify_failure(driver, default=PARSE_FAILURE):
+    """
+    Classify a failed extract or fill from the page the driver was left on:
+    a sign-in page, a closed form, no form at all (the page never loaded),
+    or otherwise `default`.
+    """
+    try:
+        url = (driver.current_url or "").lower()
+        text = (driver.execute_script(PAGE_TEXT_JS) or "").lower()
+        has_form = driver.execute_script("return document.querySelector('form') !== null;")
+    except Exception as e:
+        logger.debug("Could not inspect the page of a failed submission: %s", e)
+        return TIMEOUT
+    if any(marker in url or marker in text for marker in LOGIN_MARKERS):
+        return LOGIN_REQUIRED
+    if any(marker in url or marker in text for marker in CLOSED_FORM_MARKERS):
+        return CLOSED_FORM
+    if not has_form:
+        return TIMEOUT
+    return default
+
+
+class CircuitOpenError(Exception):
+    """Raised when a form's circuit is open and its submissions are short-circuited"""
+
+
+class CircuitBreaker:
+    def __init__(self, db_path=BREAKER_DB_PATH, thresholds=None, cooldown=BREAKER_COOLDOWN):
+        """Per-form failure counts and circuit states, shared through SQLite"""
+        self.db_path = db_path
+        self.thresholds = thresholds or BREAKER_THRESHOLDS
+        self.cooldown = cooldown
+        with self._transaction() as conn:
+            conn.execute(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """
+        A short-lived connection in a write transaction. BEGIN IMMEDIATE takes
+        SQLite's write lock up front, so only one job can claim a probe.
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def _row(self, conn, form_url):
+        row = conn.execute(
+            "SELECT state, failures, last_kind, opened_at, probe_started_at FROM form_circuits WHERE form_url = ?",
+            (form_url,)
+        ).fetchone()
+        if row is None:
+            return {"state": CLOSED, "failures": 0, "last_kind": None, "opened_at": None, "probe_started_at": None}
+        return dict(zip(("state", "failures", "last_kind", "opened_at", "probe_started_at"), row))
+
+    def _save(self, conn, form_url, circuit):
+        conn.execute(
+            "INSERT OR REPLACE INTO form_circuits (form_url, state, failures, last_kind, opened_at, "
+            "probe_started_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (form_url, circuit["state"], circuit["failures"], circuit["last_kind"], circuit["opened_at"],
+             circuit["probe_started_at"], time.time())
+        )
+
+    def status(self, form_url):
+        """The circuit of a form: state, failures, last_kind, opened_at, probe_started_at and retry_at"""
+        # A plain read: WAL readers see the last committed state without taking the write lock
+        conn = self._connect()
+        try:
+            circuit = self._row(conn, form_url)
+        finally:
+            conn.close()
+        circuit["retry_at"] = circuit["opened_at"] + self.cooldown if circuit["state"] == OPEN else None
+        return circuit
+
+    def allow(self, form_url):
+        """
+        Whether a submission to the form may run. Once an open circuit has
+        cooled down the first caller gets through as the half-open probe;
+        a probe that never reported back is replaced after another cooldown.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            circuit = self._row(conn, form_url)
+            if circuit["state"] == CLOSED:
+                return True
+            if circuit["state"] == OPEN and now - circuit["opened_at"] < self.cooldown:
+                return False
+            if circuit["state"] == HALF_OPEN and now - circuit["probe_started_at"] < self.cooldown:
+                return False
+            circuit["state"], circuit["probe_started_at"] = HALF_OPEN, now
+            self._save(conn, form_url, circuit)
+        logger.info("Probing form %s after its circuit opened on %s", form_url, circuit["last_kind"])
+        return True
+
+    def record_success(self, form_url):
+        """A submission to the form worked: close its circuit"""
+        with self._transaction() as conn:
+            circuit = self._row(conn, form_url)
+            if circuit["state"] == CLOSED and not circuit["failures"]:
+                return
+            if circuit["state"] != CLOSED:
+                logger.info("Form %s works again; circuit closed.", form_url)
+            self._save(conn, form_url, {"state": CLOSED, "failures": 0, "last_kind": None,
+                                        "opened_at": None, "probe_started_at": None})
+
+    def record_failure(self, form_url, kind):
+        """
+        Count a classified failure. Returns the new state: a failed probe, or
+        reaching the threshold of this kind, opens the circuit. Failures are
+        counted per kind: a failure of another kind starts the count again.
+        """
+        with self._transaction() as conn:
+            circuit = self._row(conn, form_url)
+            if kind != circuit["last_kind"]:
+                circuit["failures"] = 0
+            circuit["failures"] += 1
+            circuit["last_kind"] = kind
+            if circuit["state"] == HALF_OPEN or circuit["failures"] >= self.thresholds.get(kind, 1):
+                if circuit["state"] != OPEN:
+                    logger.warning("Circuit opened for form %s after %s failure(s), last: %s",
+                                   form_url, circuit["failures"], kind)
+                circuit["state"], circuit["opened_at"], circuit["probe_started_at"] = OPEN, time.time(), None
+            self._save(conn, form_url, circuit)
+        return circuit["state"]
@@ -7,8 +7,12 @@ import os
 # Application settings
 MAX_RESPONSES_PER_USER = 15
 MAX_RESPONSES_PER_FORM = 50
-USER_DB_PATH = "user_database.json"
-USAGE_LOG_PATH = "usage_log.json"
+RESERVATION_TTL = 3600  # Seconds before an abandoned job's quota reservation lapses
+TRACKER_DB_PATH = "usage.db"
+USER_DB_PATH = "user_database.json"  # Legacy JSON store, migrated into TRACKER_DB_PATH
+USAGE_LOG_PATH = "usage_log.json"  # Legacy JSON store, migrated into TRACKER_DB_PATH
+RATE_FLUSH_INTERVAL = 10  # Seconds between background flushes of the in-memory rate counters
+TRACKER_RETENTION_DAYS = 90  # Daily counters older than this are pruned
 
 # API keys
 GEMINI_API_KEY = "GEMINI_API_KEY"  # Replace with environment variable in production
@@ -37,6 +41,45 @@ COUNTRIES = [
     "Brazil", "Mexico", "South Africa", "Other"
 ]
 
+# LLM token budget settings
+JOB_TOKEN_BUDGET = 150000  # Gemini tokens (prompt + output) one job may spend
+TOKEN_DB_PATH = "usage.db"  # Token estimates and actuals, kept for calibration
+CHARS_PER_TOKEN = 4  # Rough characters per token for estimates and missing usage metadata
+
+# Circuit breaker settings
+BREAKER_DB_PATH = "usage.db"  # Per-form circuit states, shared by every job and process
+BREAKER_THRESHOLDS = {  # Consecutive failures of the latest kind after which a form's circuit opens
+    "timeout": 3, "parse_failure": 3, "fill_failure": 5, "closed_form": 1, "login_required": 1
+}
+BREAKER_COOLDOWN = 300  # Seconds an open circuit waits before letting one probe submission through
+
 # WebDriver settings
 WEBDRIVER_WAIT_TIME = 20
 WEBDRIVER_IMPLICIT_WAIT = 5
+BROWSER_PROFILES = os.environ.get("BROWSER_PROFILES", "1") != "0"  # Persistent profile and disk cache per browser session
+BROWSER_PROFILE_DIR = "browser_profiles"
+BROWSER_CACHE_MAX_BYTES = 100 * 2**20  # HTTP disk cache size Chrome keeps per profile
+BROWSER_PROFILE_MAX_BYTES = 300 * 2**20  # A released profile larger than this has its caches cleared
+BROWSER_PROFILE_MAX_AGE = 7 * 24 * 3600  # Seconds after which an unused profile is deleted
+BROWSER_PROFILE_CLEANUP_INTERVAL = 3600  # Minimum seconds between sweeps of the unused profiles
+ASYNC_PAGES = 4  # Tabs the async DevTools driver fills at the same time in one browser
+CDP_COMMAND_TIMEOUT = 30  # Seconds to wait for the reply to a DevTools command
+
+# Form filling settings
+SECTION_CACHE_TTL = 600  # Seconds a walked multi-section form structure is reused
+QUESTION_WAIT_TIME = 5  # Maximum seconds to wait for a loaded page to show its questions
+OPTION_MATCH_THRESHOLD = 0.6  # Minimum fuzzy score for an answer to resolve to an option
+PARSE_WORKERS = 2  # Worker processes parsing captured forms for the running jobs (0 parses on the job's thread)
+PARSE_SHARED_MEMORY_MIN = 256 * 1024  # Bytes of HTML from which it is passed to a parse worker via shared memory
+
+# Logging settings
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")  # DEBUG shows per-question and per-selector detail
+
+# Background job settings
+JOB_STORE_DIR = "jobs"
+SCHEMA_STORE_DIR = "schemas"  # Versioned form structures, see schema_store.py
+JOB_WORKERS = 2  # Number of browser sessions shared by the running jobs
+JOB_MAX_ACTIVE = 16  # Jobs that can be in progress at once, taking turns on the browsers
+LOG_VISIBLE_LINES = 200  # Number of log lines kept on screen
+LOG_REFRESH_FPS = 4  # Maximum log view refreshes per second
+SUBMISSION_DELAY = 5  # Seconds to wait between submissions of a job
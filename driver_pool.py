@@ -0,0 +1,129 @@
+"""
+WebDriver pool module for the Google Form Filler.
+Shares a bounded set of browser sessions between jobs instead of
+starting a new browser for every job. Each session runs on a persistent
+profile from browser_profiles, so its disk cache survives restarts.
+"""
+
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from proto1 import setup_driver
+from browser_profiles import default_profiles
+from log_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class DriverPool:
+    def __init__(self, size=1, browser_type="chrome", profiles=None, persistent_profiles=True):
+        """
+        Pool of at most `size` WebDriver sessions, created on first use.
+        profiles is the browser_profiles.ProfileManager the sessions' profiles
+        are claimed from (the configured one by default); persistent_profiles=False
+        starts them with throwaway profiles.
+        """
+        self.size = size
+        self.browser_type = browser_type
+        self.profiles = profiles or (default_profiles() if persistent_profiles else None)
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._drivers = []
+        self._profile_dirs = {}
+
+    def _create(self):
+        profile_dir = self.profiles.claim() if self.profiles else None
+        driver = setup_driver(self.browser_type, profile_dir)
+        if not driver and self.browser_type == "chrome":
+            logger.warning("Chrome WebDriver setup failed, trying Edge...")
+            driver = setup_driver("edge", profile_dir)
+        if profile_dir and driver:
+            with self._lock:
+                self._profile_dirs[id(driver)] = profile_dir
+        elif profile_dir:
+            self.profiles.release(profile_dir)
+        return driver
+
+    def _quit(self, driver):
+        """Quit a driver and give back its profile"""
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        with self._lock:
+            profile_dir = self._profile_dirs.pop(id(driver), None)
+        if profile_dir:
+            self.profiles.release(profile_dir)
+
+    def acquire(self, timeout=None):
+        """Take an idle driver, starting a new one while below the pool size"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                driver = self._create()
+                with self._lock:
+                    if driver:
+                        self._drivers.append(driver)
+                    else:
+                        self._created -= 1
+                return driver
+
+            # Wait briefly and re-check, since a discarded driver frees a slot
+            wait = 1.0 if deadline is None else min(1.0, deadline - time.monotonic())
+            if wait <= 0:
+                return None
+            try:
+                return self._idle.get(timeout=wait)
+            except queue.Empty:
+                continue
+
+    def release(self, driver, broken=False):
+        """Return a driver to the pool; broken drivers are quit and replaced later"""
+        if broken:
+            self._discard(driver)
+        else:
+            self._idle.put(driver)
+
+    def _discard(self, driver):
+        self._quit(driver)
+        with self._lock:
+            if driver in self._drivers:
+                self._drivers.remove(driver)
+            self._created -= 1
+
+    @contextmanager
+    def driver(self, timeout=None):
+        """Context manager that acquires a driver and releases it afterwards"""
+        driver = self.acquire(timeout)
+        if not driver:
+            raise RuntimeError("Failed to set up WebDriver.")
+        broken = False
+        try:
+            yield driver
+        except Exception:
+            broken = True
+            raise
+        finally:
+            self.release(driver, broken)
+
+    def close(self):
+        """Quit every driver the pool has started"""
+        with self._lock:
+            drivers, self._drivers = self._drivers, []
+            self._created = 0
+        for driver in drivers:
+            self._quit(driver)
+        while not self._idle.empty():
+            self._idle.get_nowait()
@@ -0,0 +1,270 @@
+"""
+Form parsing module for the Google Form Filler.
+Turns captured form HTML into the parsed form structure. Parsing is pure
+Python with no driver involved, so it can run in a pool of worker processes:
+concurrent jobs then parse on separate cores, outside the GIL of the threads
+driving the browsers. HTML of PARSE_SHARED_MEMORY_MIN bytes or more is handed
+to the workers through shared memory instead of being pickled down a pipe.
+
+    with ParsePool() as pool, use_parse_pool(pool):
+        form_structure = parse_html(html)
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+import multiprocessing
+from multiprocessing import shared_memory
+from bs4 import BeautifulSoup
+from config import PARSE_WORKERS, PARSE_SHARED_MEMORY_MIN
+from log_config import get_logger
+
+logger = get_logger(__name__)
+
+_active_pool = ContextVar("parse_pool", default=None)
+
+
+def parse_form_html(html):
+    """Parse the questions of captured form (or page) HTML into the form structure"""
+    soup = BeautifulSoup(html, 'html.parser')
+    form_elements = []
+
+    question_items = soup.select('div[role="listitem"]')
+    logger.debug("Found %s potential question items.", len(question_items))
+
+    if not question_items:
+         question_items = soup.select('div[jscontroller][data-params]')
+         logger.debug("Fallback: Found %s potential question items using data-params.", len(question_items))
+
+    for item in question_items:
+        question_text_element = item.select_one('div[role="heading"]')
+        question_text = question_text_element.get_text(strip=True) if question_text_element else "Unknown Question"
+
+        input_type = "unknown"
+        options = []
+        aria_label = question_text  # Default to question text instead of input placeholder
+
+        # Check for required marker
+        required = "*" in question_text
+        # Remove asterisk from question text for cleaner display
+        clean_question = question_text.replace('*', '').strip()
+
+        # Check for text inputs first
+        text_input = item.select_one('input[type="text"], input[type="email"], input[type="url"], input[type="number"], textarea')
+        if text_input:
+            input_type = "text"
+            # Only use aria-label if it's not a generic placeholder like "Your answer"
+            input_label = text_input.get('aria-label', '').strip()
+            if input_label and input_label != "Your answer":
+                aria_label = input_label
+            else:
+                aria_label = clean_question  # Use question text when placeholder is generic
+        
+        # Check for date input
+        elif item.select_one('input[type="date"], input[placeholder*="Date"]'):
+            input_type = "date"
+            aria_label = clean_question
+        
+        # Check for time input
+        elif item.select_one('input[type="time"], input[placeholder*="Time"]'):
+            input_type = "time"
+            aria_label = clean_question
+        
+        # Check for file upload
+        elif item.select('div[data-params*="uploadType"]'):
+            input_type = "file_upload"
+            aria_label = clean_question
+        
+        # Check for grid questions
+        elif item.select('div[role="grid"], table.freebirdFormviewerViewItemsGridTable'):
+            # Determine if it's a checkbox grid or radio button grid
+            if item.select('div[role="checkbox"]'):
+                input_type = "checkbox_grid"
+            else:
+                input_type = "grid"
+            
+            # Extract rows and columns
+            rows = []
+            cols = []
+            
+            # Try different selectors to catch all possible grid layouts
+            row_elements = item.select('div[role="row"] th, tr th:first-child, div.freebirdFormviewerViewItemsGridRowGroup')
+            col_elements = item.select('div[role="columnheader"], tr th:not(:first-child), div.freebirdFormviewerViewItemsGridCell[role="heading"]')
+            
+            # If traditional selectors fail, try more specific Google Forms selectors
+            if not row_elements:
+                row_elements = item.select('div.freebirdFormviewerViewItemsGridRow')
+            if not col_elements:
+                col_elements = item.select('div.freebirdFormviewerViewItemsGridColumnHeader')
+            
+            for row in row_elements:
+                row_text = row.get_text(strip=True)
+                if row_text:
+                    rows.append(row_text)
+            
+            for col in col_elements:
+                col_text = col.get_text(strip=True)
+                if col_text:
+                    cols.append(col_text)
+            
+            options = {"rows": rows, "columns": cols}
+            aria_label = clean_question
+            
+            # Grids without rows or columns are completed from the live page by proto1.parse_form_page
+
+        # Check for radio buttons (multiple choice)
+        elif item.select('div[role="radiogroup"]'):
+            scale_labels = item.select('label span')
+            scale_values = [lbl.get_text(strip=True) for lbl in scale_labels if lbl.get_text(strip=True)]
+            
+            # Enhanced linear scale detection
+            is_numeric_scale = any(lbl.get_text(strip=True).isdigit() for lbl in scale_labels)
+            is_linear_scale = (
+                is_numeric_scale or 
+                item.select('div[aria-label*="stars"], div[aria-label*="rating"], div[aria-label*="scale"]') or
+                item.select('div[jsname="RRJqzb"]') or  # Google Forms rating component
+                item.select('div[jsname="NfjK7"], div[jsname="jq1lEb"]')  # "Less"/"More" labels
+            )
+
+            if is_linear_scale:
+                input_type = "linear_scale"
+                options = scale_values
+                
+                # Capture endpoint labels (Like "Less" and "More")
+                endpoint_labels = {}
+                less_label = item.select_one('div[jsname="NfjK7"]')
+                more_label = item.select_one('div[jsname="jq1lEb"]')
+                
+                if less_label:
+                    endpoint_labels["start"] = less_label.get_text(strip=True)
+                if more_label:
+                    endpoint_labels["end"] = more_label.get_text(strip=True)
+                
+                # If endpoint labels exist, add them to options
+                if endpoint_labels:
+                    logger.debug("Detected scale with labeled endpoints: %s", endpoint_labels)
+                
+                # Extract actual data-value attributes when available
+                data_values = []
+                radio_buttons = item.select('div[role="radio"]')
+                for button in radio_buttons:
+                    data_val = button.get('data-value')
+                    if data_val:
+                        data_values.append(data_val)
+                
+                if data_values:
+                    options = data_values
+                    logger.debug("Using data-value attributes for scale: %s", options)
+                # If we have radio buttons but no text labels or data-values
+                elif not options and radio_buttons:
+                    options = [str(i+1) for i in range(len(radio_buttons))]
+                    logger.debug("Inferred %s numeric options from radio buttons", len(options))
+                
+                # Store endpoint labels for better response generation
+                if endpoint_labels:
+                    if not isinstance(options, dict):
+                        options = {"values": options, "labels": endpoint_labels}
+                    else:
+                        options["labels"] = endpoint_labels
+                
+                aria_label = clean_question
+            else:
+                input_type = "multiple_choice"
+                option_elements = item.select('div[role="radio"] span')
+                options = [opt.get_text(strip=True) for opt in option_elements if opt.get_text(strip=True)]
+                aria_label = clean_question
+
+        elif item.select('div[role="group"]'):
+            if item.select('div[role="checkbox"]'):
+                input_type = "checkbox"
+                option_elements = item.select('div[role="checkbox"] span')
+                options = [opt.get_text(strip=True) for opt in option_elements if opt.get_text(strip=True)]
+                aria_label = clean_question
+
+        elif item.select_one('div[role="listbox"]'):
+            input_type = "dropdown"
+            option_elements = item.select('div[role="option"] span')
+            options = [opt.get_text(strip=True) for opt in option_elements if opt.get_text(strip=True)]
+            aria_label = clean_question
+
+        if input_type != "unknown":
+             form_elements.append({
+                 "question": clean_question,
+                 "type": input_type,
+                 "options": options,
+                 "identifier": aria_label,
+                 "required": required
+             })
+             logger.debug("Extracted: '%s' (Type: %s, Required: %s, Options: %s)", clean_question, input_type, required, options if options else 'N/A')
+        else:
+             logger.debug("Skipped item, could not determine input type for: '%s'", clean_question)
+
+    return form_elements
+
+
+def _parse_shared(name, size):
+    """Worker side: parse HTML left in a shared memory block by the parent"""
+    # Workers share the parent's resource tracker, so attaching does not claim the block
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        html = bytes(block.buf[:size]).decode("utf-8")
+    finally:
+        block.close()
+    return parse_form_html(html)
+
+
+class ParsePool:
+    def __init__(self, workers=PARSE_WORKERS, shared_min=PARSE_SHARED_MEMORY_MIN):
+        """Worker processes that parse captured form HTML"""
+        self.workers = workers
+        self.shared_min = shared_min
+        # The pool is started from threaded processes (jobs, Streamlit), which must not fork
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+    def parse(self, html):
+        """Parse HTML in a worker process and wait for its form structure"""
+        data = html.encode("utf-8")
+        if len(data) < self.shared_min:
+            return self._executor.submit(parse_form_html, html).result()
+        block = shared_memory.SharedMemory(create=True, size=len(data))
+        try:
+            block.buf[:len(data)] = data
+            return self._executor.submit(_parse_shared, block.name, len(data)).result()
+        finally:
+            block.close()
+            block.unlink()
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+@contextmanager
+def use_parse_pool(pool):
+    """Parse the forms captured in this context on `pool` (None parses in-process)"""
+    token = _active_pool.set(pool)
+    try:
+        yield pool
+    finally:
+        _active_pool.reset(token)
+
+
+def parse_html(html):
+    """
+    Parse form HTML on the active parse pool, if any, or in this process.
+    A failing pool (e.g. a worker that died) falls back to parsing in-process.
+    """
+    pool = _active_pool.get()
+    if pool is not None:
+        try:
+            return pool.parse(html)
+        except Exception as e:
+            logger.warning("Parse worker failed (%s); parsing in this process.", e)
+    return parse_form_html(html)
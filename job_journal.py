@@ -0,0 +1,79 @@
+"""
+Job journal module for the Google Form Filler.
+Records the state of every submission of a job to disk as it happens,
+so an interrupted job can resume without redoing finished work.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from config import JOB_STORE_DIR
+
+
+def schema_hash(form_structure):
+    """Stable hash of a parsed form structure"""
+    payload = json.dumps(form_structure, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class JobJournal:
+    def __init__(self, job_id, root=JOB_STORE_DIR):
+        """Append-only journal with one JSON line per submission event"""
+        self.path = os.path.join(root, f"{job_id}.journal.jsonl")
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _append(self, entry):
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def record_answers(self, index, form_hash, answers):
+        """Record the answers generated for a submission"""
+        self._append({
+            "index": index,
+            "event": "generated",
+            "time": time.time(),
+            "schema_hash": form_hash,
+            "answers": answers
+        })
+
+    def record_result(self, index, form_hash, success):
+        """Record the fill result of a submission"""
+        self._append({
+            "index": index,
+            "event": "filled",
+            "time": time.time(),
+            "schema_hash": form_hash,
+            "success": bool(success)
+        })
+
+    def load(self):
+        """
+        Replay the journal into {index: state}, where state holds the latest
+        schema_hash, answers and success (None until the submission was filled).
+        """
+        states = {}
+        if not os.path.exists(self.path):
+            return states
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash can leave a torn last line; everything before it is valid
+                    continue
+                state = states.setdefault(entry["index"], {"schema_hash": None, "answers": None, "success": None})
+                state["schema_hash"] = entry["schema_hash"]
+                if entry["event"] == "generated":
+                    state["answers"] = entry["answers"]
+                    state["success"] = None
+                elif entry["event"] == "filled":
+                    state["success"] = entry["success"]
+        return states
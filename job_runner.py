@@ -0,0 +1,574 @@
+"""
+Background job module for the Google Form Filler.
+Runs form filling jobs on worker threads and keeps their progress in a
+shared on-disk store, so the Streamlit script only has to poll for status.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
+from config import JOB_STORE_DIR, JOB_WORKERS, JOB_MAX_ACTIVE, SUBMISSION_DELAY, JOB_TOKEN_BUDGET, PARSE_WORKERS
+
+from proto1 import setup_driver, extract_form_structure, build_prompt, generate_responses
+from answer_plan import compile_plan, fill_form_from_plan, dry_run_plan, save_plans
+from persona_sampler import PopulationSampler, build_quota_cells
+from job_journal import JobJournal
+from schema_store import SchemaStore
+from form_parser import ParsePool, use_parse_pool
+from metrics import MetricsRegistry, use_registry, span
+from log_config import log_context
+from profiling import JobProfiler
+from token_budget import TokenLedger, TokenBudgetExceededError, use_budget
+from circuit_breaker import (
+    CircuitBreaker, CircuitOpenError, classify_failure, OPEN, TIMEOUT, PARSE_FAILURE, FILL_FAILURE
+)
+from driver_pool import DriverPool
+from scheduler import FairScheduler, DEFAULT_PRIORITY
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+FINISHED_STATES = (COMPLETED, FAILED)
+
+
+class JobStore:
+    def __init__(self, root=JOB_STORE_DIR):
+        """Store job status records as one JSON file per job"""
+        self.root = root
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, job_id):
+        return os.path.join(self.root, f"{job_id}.json")
+
+    def _write(self, record):
+        # Write to a temp file and swap it in so readers never see a partial file
+        path = self._path(record["id"])
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(record, f)
+        os.replace(tmp_path, path)
+
+    def create(self, spec, job_id=None):
+        """Create a queued job record for a job spec and return it"""
+        # Fix the persona seed up front so a resumed job samples the same personas
+        spec = dict(spec)
+        if spec.get("seed") is None:
+            spec["seed"] = random.randrange(2 ** 32)
+        record = {
+            "id": job_id or uuid.uuid4().hex[:12],
+            "spec": spec,
+            "status": QUEUED,
+            "created_at": time.time(),
+            "updated_at": time.time(),
+            "completed": 0,
+            "successful": 0,
+            "requested": spec["num_responses"],
+            "message": "Waiting for a free worker...",
+            "error": None
+        }
+        with self._lock:
+            self._write(record)
+        return record
+
+    def get(self, job_id):
+        """Load a job record, or None if it does not exist"""
+        try:
+            with open(self._path(job_id), 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def update(self, job_id, **fields):
+        """Update fields of a job record"""
+        with self._lock:
+            record = self.get(job_id)
+            if record is None:
+                return None
+            record.update(fields)
+            record["updated_at"] = time.time()
+            self._write(record)
+            return record
+
+    def log_path(self, job_id):
+        """Path of the full log file of a job"""
+        return os.path.join(self.root, f"{job_id}.log")
+
+    def metrics_paths(self, job_id):
+        """Paths of a job's Prometheus text and JSON metrics exports"""
+        return (os.path.join(self.root, f"{job_id}.metrics.prom"),
+                os.path.join(self.root, f"{job_id}.metrics.json"))
+
+    def plans_path(self, job_id):
+        """Path of the JSONL file with the answer plans a job replayed"""
+        return os.path.join(self.root, f"{job_id}.plans.jsonl")
+
+    def append_log(self, job_id, message):
+        """Append a timestamped line to a job's log file"""
+        line = f"{datetime.now().strftime('%H:%M:%S')} - {message}\n"
+        with self._lock:
+            with open(self.log_path(job_id), 'a', encoding='utf-8') as f:
+                f.write(line)
+
+    def list_jobs(self):
+        """Load all job records, newest first"""
+        records = []
+        for name in os.listdir(self.root):
+            if name.endswith(".json"):
+                record = self.get(name[:-5])
+                # Other JSON exports (e.g. <job_id>.metrics.json) live next to the job records
+                if record and record.get("id") == name[:-5] and "created_at" in record:
+                    records.append(record)
+        return sorted(records, key=lambda r: r["created_at"], reverse=True)
+
+
+class FormJob:
+    def __init__(self, job_id, spec, store, tracker=None, on_result=None, reservation=None, ledger=None,
+                 scheduler=None, schemas=None, parse_pool=None, breaker=None):
+        """
+        A job submits spec["num_responses"] responses to spec["form_url"].
+        Other spec fields: target_profile, age_groups, genders, countries,
+        seed, submission_delay, dry_run (fill and verify without submitting),
+        profile (write a cProfile and CDP page metrics next to the job's log),
+        token_budget (Gemini tokens the job may spend, JOB_TOKEN_BUDGET by default),
+        tenant, priority and weight (how the scheduler shares drivers with other jobs),
+        client_ip and user_agent (the last two for usage tracking).
+        on_result is called with a result dict per submission.
+        reservation is a (reservation_id, granted) quota reservation from the
+        tracker; submissions are charged to it and the job stops when it is used up.
+        ledger is the TokenLedger the job's token estimate and usage are kept in.
+        With a scheduler, each submission runs on a driver leased from it.
+        schemas is the SchemaStore that versions the form and compiles its questions.
+        parse_pool is the form_parser.ParsePool its captured forms are parsed on.
+        breaker is the CircuitBreaker its failures are counted in; the job
+        fails before its next submission once the form's circuit is open.
+        """
+        self.job_id = job_id
+        self.spec = spec
+        self.store = store
+        self.tracker = tracker
+        self.on_result = on_result
+        self.reservation_id, self.reserved_left = reservation or (None, None)
+        self.successful = 0
+        self.personas = []
+        self.last_report = None
+        self.journal = JobJournal(job_id, store.root)
+        self.metrics = MetricsRegistry()
+        self.ledger = ledger or TokenLedger()
+        self.budget = None
+        self.left_to_run = spec["num_responses"]
+        self.scheduler = scheduler
+        self.schemas = schemas or SchemaStore()
+        self.parse_pool = parse_pool
+        self.breaker = breaker or CircuitBreaker()
+
+    def log(self, message):
+        self.store.append_log(self.job_id, message)
+
+    def prepare(self):
+        """Sample one persona per submission for the whole job"""
+        spec = self.spec
+        quotas = build_quota_cells(spec.get("age_groups", []), spec.get("genders", []), spec.get("countries", []))
+        sampler = PopulationSampler(spec["target_profile"], quotas, spec.get("seed"))
+        self.personas = sampler.sample(spec["num_responses"])
+
+    def admit(self, form_structure):
+        """
+        Open the job's token budget from the parsed form. Raises
+        TokenBudgetExceededError if not even one response is affordable and
+        downsizes the job if the budget covers fewer than are left to run.
+        """
+        spec = self.spec
+        prompt = build_prompt(form_structure, spec["target_profile"], self.personas[0]["description"], 0)
+        self.budget = self.ledger.open_budget(self.job_id, spec["form_url"], form_structure, prompt,
+                                              spec["num_responses"], spec.get("token_budget", JOB_TOKEN_BUDGET))
+        affordable = self.budget.affordable()
+        self.log(f"Estimated {self.budget.per_response} tokens per response; "
+                 f"{self.budget.remaining} of {self.budget.limit} budgeted tokens left.")
+        if affordable == 0:
+            raise TokenBudgetExceededError(
+                f"Token budget of {self.budget.limit} cannot cover a response estimated at {self.budget.per_response} tokens."
+            )
+        if affordable < self.left_to_run:
+            self.log(f"Token budget covers only {affordable} of the {self.left_to_run} remaining submissions; "
+                     f"downsizing the job.")
+            record = self.store.get(self.job_id)
+            self.store.update(self.job_id, requested=record["requested"] - self.left_to_run + affordable)
+
+    def carried_answers(self, state, form_hash):
+        """
+        The journaled answers of a submission that are still valid for the
+        current form: all of them if the form is unchanged, those to unchanged
+        questions if it was edited, or None if nothing can be kept.
+        """
+        if not state or not state["answers"]:
+            return None
+        if state["schema_hash"] == form_hash:
+            return state["answers"]
+        diff = self.schemas.diff(self.spec["form_url"], state["schema_hash"], form_hash)
+        if not diff:
+            return None
+        kept = {identifier: state["answers"][identifier] for identifier in diff["unchanged"]
+                if identifier in state["answers"]}
+        return kept or None
+
+    def run_submission(self, driver, i, state=None):
+        """
+        Run one extract/generate/fill cycle. Returns True if the response was submitted.
+        state is the journaled state of this submission from an earlier attempt.
+        """
+        form_url = self.spec["form_url"]
+        stages = {}
+
+        self.log(f"Extracting form structure for submission {i+1}...")
+        with span("extract") as extract_span, use_parse_pool(self.parse_pool):
+            form_structure = extract_form_structure(driver, form_url)
+        stages["extract"] = extract_span.duration
+        if not form_structure:
+            self.log("Failed to extract form structure. Skipping.")
+            self._charge(False, "extract_failed", stages)
+            self._failure(driver, TIMEOUT if form_structure is None else PARSE_FAILURE)
+            return False
+        version, artifacts = self.schemas.update(form_url, form_structure)
+        form_hash = version["schema_hash"]
+
+        # Answers generated before an interruption stay valid for the questions that did not change
+        answers = self.carried_answers(state, form_hash)
+        stale = form_structure if answers is None else [q for q in form_structure if q["identifier"] not in answers]
+        if not stale:
+            self.log(f"Reusing journaled answers for submission {i+1}.")
+        else:
+            if answers:
+                self.log(f"Form changed; keeping {len(answers)} journaled answer(s) and generating "
+                         f"{len(stale)} for submission {i+1}...")
+            else:
+                self.log(f"Generating responses for submission {i+1}...")
+            if self.budget is None:
+                self.admit(form_structure)
+            with span("generate") as generate_span, use_budget(self.budget):
+                generated = generate_responses(stale, self.spec["target_profile"], i, self.personas[i]["description"])
+            stages["generate"] = generate_span.duration
+            self.ledger.record(self.job_id, self.budget)
+            if not generated:
+                self.log("Failed to generate answers. Skipping.")
+                self._charge(False, "generate_failed", stages)
+                return False
+            answers = {**(answers or {}), **generated}
+            self.journal.record_answers(i, form_hash, answers)
+
+        with span("fill") as fill_span:
+            plan = compile_plan(form_structure, answers, artifacts)
+            plan["index"] = i
+            save_plans(self.store.plans_path(self.job_id), [plan])
+            if self.spec.get("dry_run"):
+                self.log(f"Dry run: filling form for submission {i+1} without submitting "
+                         f"({len(plan['actions'])} planned action(s))...")
+                self.last_report = dry_run_plan(driver, form_url, plan)
+                success = self.last_report["error"] is None and self.last_report["mismatched"] == 0
+                self.log(f"Dry run verified {self.last_report['verified']} field(s), "
+                         f"{self.last_report['mismatched']} mismatched.")
+            else:
+                self.log(f"Filling form for submission {i+1} ({len(plan['actions'])} planned action(s))...")
+                success = fill_form_from_plan(driver, form_url, plan)
+        stages["fill"] = fill_span.duration
+        self.journal.record_result(i, form_hash, success)
+        self._charge(success, None if success else "fill_failed", stages)
+        if success:
+            self.breaker.record_success(form_url)
+        elif not self.spec.get("dry_run") or self.last_report["error"]:
+            # Mismatches in a dry run are not the form's fault
+            self._failure(driver, FILL_FAILURE)
+
+        if success:
+            self.log(f"✅ Submission {i+1} completed successfully.")
+        else:
+            self.log(f"❌ Submission {i+1} failed.")
+        return success
+
+    def _failure(self, driver, default_kind):
+        """Classify a failed submission and count it against the form's circuit"""
+        kind = classify_failure(driver, default_kind)
+        if self.breaker.record_failure(self.spec["form_url"], kind) == OPEN:
+            self.log(f"Form circuit is open after a {kind.replace('_', ' ')} failure.")
+
+    def check_circuit(self):
+        """Raise CircuitOpenError if the form's circuit does not let the next submission through"""
+        if self.breaker.allow(self.spec["form_url"]):
+            return
+        circuit = self.breaker.status(self.spec["form_url"])
+        retry = datetime.fromtimestamp(circuit["retry_at"]).strftime("%H:%M:%S") if circuit["retry_at"] else "later"
+        kind = (circuit["last_kind"] or "repeated failures").replace("_", " ")
+        raise CircuitOpenError(f"Form unavailable ({kind}); "
+                               f"skipped the remaining submissions. Try again after {retry}.")
+
+    def _charge(self, success, failure_reason, stages):
+        """
+        Charge a submission attempt to the tracker; dry runs are free.
+        If the job's reservation has expired, the attempt is recorded directly
+        and the rest of the job is reserved again.
+        """
+        if not self.tracker or self.spec.get("dry_run"):
+            return
+        if self.reservation_id and self.tracker.consume_reservation(self.reservation_id, success,
+                                                                    failure_reason, stages):
+            self.reserved_left -= 1
+            return
+        self.tracker.record_usage(self.spec.get("client_ip"), self.spec.get("user_agent", "Unknown"),
+                                  self.spec["form_url"], 1, 1 if success else 0, failure_reason, stages)
+        if self.reservation_id:
+            self.reserved_left -= 1
+            self._renew_reservation()
+
+    def _renew_reservation(self):
+        """
+        Reserve the job's remaining submissions again after its reservation
+        expired; raises QuotaExceededError, which stops the job, if none are left.
+        """
+        self.log("Quota reservation expired; reserving the remaining submissions again.")
+        self.reservation_id, remaining = None, self.reserved_left
+        self.reserved_left = 0
+        if remaining > 0:
+            self.reservation_id, self.reserved_left = self.tracker.reserve_quota(
+                self.spec.get("client_ip"), self.spec.get("user_agent", "Unknown"), self.spec["form_url"], remaining
+            )
+
+    def lease(self, driver):
+        """Context for one submission's driver: a scheduler lease, or the job's own driver"""
+        if self.scheduler is None:
+            return nullcontext(driver)
+        spec = self.spec
+        tenant = spec.get("tenant") or spec.get("client_ip") or "default"
+        return self.scheduler.lease(tenant, spec.get("priority", DEFAULT_PRIORITY), spec.get("weight", 1.0))
+
+    def run(self, driver=None):
+        """
+        Run the job's remaining submissions on the given driver, on drivers
+        leased from the scheduler, or on one of its own.
+        The job's span histograms (and its profile, if asked for) are exported
+        next to its log afterwards.
+        """
+        with use_registry(self.metrics), log_context(job_id=self.job_id):
+            try:
+                if self.spec.get("profile"):
+                    self._run_profiled(driver)
+                else:
+                    self._run(driver)
+            finally:
+                self.export_metrics()
+
+    def _run_profiled(self, driver):
+        profiler = JobProfiler(self.job_id, self.store.root)
+        try:
+            with profiler:
+                self._run(driver)
+        finally:
+            self.store.update(self.job_id, profile_artifacts=profiler.artifacts())
+            self.log(f"Profile written to {profiler.summary_path}")
+
+    def export_metrics(self):
+        prometheus_path, json_path = self.store.metrics_paths(self.job_id)
+        try:
+            self.metrics.write(prometheus_path, json_path)
+        except OSError as e:
+            self.log(f"Could not write metrics: {e}")
+
+    def _run(self, driver):
+        spec = self.spec
+        num_responses = spec["num_responses"]
+        delay = spec.get("submission_delay", SUBMISSION_DELAY)
+        self.store.update(self.job_id, status=RUNNING, started_at=time.time(), message="Setting up WebDriver...")
+
+        states = self.journal.load()
+        done = {i for i, state in states.items() if state["success"] is not None}
+        self.successful = sum(1 for i in done if states[i]["success"])
+        if done:
+            self.log(f"Resuming job: {len(done)} of {num_responses} submissions already done.")
+        else:
+            self.log(f"Starting to process {spec['form_url']}")
+            self.log(f"Preparing to generate {num_responses} responses")
+
+        own_driver = driver is None and self.scheduler is None
+        if own_driver:
+            driver = setup_driver("chrome")
+        if own_driver and not driver:
+            if self.reservation_id:
+                self.tracker.release_reservation(self.reservation_id)
+            self.log("Failed to set up WebDriver.")
+            self.store.update(self.job_id, status=FAILED, error="Failed to set up WebDriver.", message="WebDriver setup failed.")
+            return
+
+        try:
+            self.log(f"Target profile: {spec['target_profile']}")
+            self.prepare()
+
+            pending = [i for i in range(num_responses) if i not in done]
+            for n, i in enumerate(pending):
+                if self.reserved_left is not None and self.reserved_left <= 0:
+                    self.log("Reserved quota used up; stopping the job.")
+                    break
+                if self.budget and not self.budget.can_afford():
+                    self.log(f"Token budget used up ({self.budget.used} of {self.budget.limit} tokens); stopping the job.")
+                    break
+                self.left_to_run = len(pending) - n
+                self.check_circuit()
+                if self.scheduler:
+                    self.store.update(self.job_id, message=f"Waiting for a browser for submission {i+1}...")
+                started = time.time()
+                self.last_report = None
+                with log_context(submission=i + 1), self.lease(driver) as submission_driver:
+                    self.store.update(self.job_id, message=f"Processing submission {i+1} of {num_responses}...")
+                    success = self.run_submission(submission_driver, i, states.get(i))
+                if success:
+                    self.successful += 1
+                self.store.update(self.job_id, completed=len(done) + n + 1, successful=self.successful)
+                if self.on_result:
+                    self.on_result({
+                        "job_id": self.job_id,
+                        "form_url": spec["form_url"],
+                        "index": i,
+                        "success": success,
+                        "duration": round(time.time() - started, 3),
+                        "timestamp": time.time(),
+                        "fill_report": self.last_report
+                    })
+
+                # Add delay between submissions
+                if n < len(pending) - 1:
+                    self.log(f"Waiting {delay} seconds before next submission...")
+                    time.sleep(delay)
+
+            self.store.update(
+                self.job_id, status=COMPLETED, finished_at=time.time(), error=None,
+                message=f"Completed {self.successful} out of {num_responses} submissions."
+            )
+        except Exception as e:
+            self.log(f"Error: {str(e)}")
+            self.store.update(self.job_id, status=FAILED, error=str(e), finished_at=time.time(), message="Job failed.")
+        finally:
+            if self.reservation_id:
+                # Give back the quota of submissions that did not run
+                self.tracker.release_reservation(self.reservation_id)
+            if own_driver:
+                self.log("Closing WebDriver...")
+                driver.quit()
+
+
+class JobRunner:
+    def __init__(self, store=None, tracker=None, max_workers=JOB_WORKERS, ledger=None, max_active=JOB_MAX_ACTIVE):
+        """
+        Run submitted jobs on worker threads. Up to max_active jobs are in
+        progress at once; their submissions take turns on max_workers drivers.
+        """
+        self.store = store or JobStore()
+        self.tracker = tracker
+        self.ledger = ledger or TokenLedger()
+        self.scheduler = FairScheduler(DriverPool(max_workers))
+        self.schemas = SchemaStore()
+        self.parse_pool = ParsePool(PARSE_WORKERS) if PARSE_WORKERS else None
+        self.breaker = CircuitBreaker()
+        self._executor = ThreadPoolExecutor(max_workers=max_active, thread_name_prefix="form-job")
+        self._active = set()
+        self._lock = threading.Lock()
+
+    def _reserve(self, spec, count):
+        """
+        Reserve quota for `count` submissions of a job spec.
+        Returns None when there is no tracker or the job is a dry run;
+        raises QuotaExceededError when nothing can be reserved.
+        """
+        if not self.tracker or spec.get("dry_run"):
+            return None
+        return self.tracker.reserve_quota(spec.get("client_ip"), spec.get("user_agent", "Unknown"),
+                                          spec["form_url"], count)
+
+    def submit(self, spec):
+        """
+        Queue a job and return its job ID.
+        Quota is reserved before the job is queued; a job asking for more than
+        is left, or than its token budget covers by the form's last estimate,
+        is downsized. Raises TokenBudgetExceededError if the budget covers
+        no response at all, and CircuitOpenError while the form's circuit is open.
+        """
+        circuit = self.breaker.status(spec["form_url"])
+        if circuit["state"] == OPEN and circuit["retry_at"] > time.time():
+            raise CircuitOpenError(
+                f"This form failed repeatedly ({circuit['last_kind'].replace('_', ' ')}); "
+                f"try again in {int(circuit['retry_at'] - time.time()) // 60 + 1} minute(s)."
+            )
+        requested = spec["num_responses"]
+        estimate = self.ledger.form_estimate(spec["form_url"])
+        if estimate:
+            limit = spec.get("token_budget", JOB_TOKEN_BUDGET)
+            if limit < estimate:
+                raise TokenBudgetExceededError(
+                    f"Token budget of {limit} cannot cover a response to this form (about {estimate} tokens)."
+                )
+            spec = dict(spec, num_responses=min(requested, limit // estimate))
+        reservation = self._reserve(spec, spec["num_responses"])
+        if reservation and reservation[1] < spec["num_responses"]:
+            spec = dict(spec, num_responses=reservation[1])
+        if spec["num_responses"] < requested:
+            spec = dict(spec, requested_responses=requested)
+        record = self.store.create(spec)
+        self._start(FormJob(record["id"], record["spec"], self.store, self.tracker, reservation=reservation,
+                            ledger=self.ledger, scheduler=self.scheduler, schemas=self.schemas,
+                            parse_pool=self.parse_pool, breaker=self.breaker))
+        return record["id"]
+
+    def resume(self, job_id):
+        """Queue an interrupted job again; finished submissions are skipped"""
+        record = self.store.get(job_id)
+        if record is None or record["status"] == COMPLETED or self.is_active(job_id):
+            return False
+        reservation = self._reserve(record["spec"], max(1, record["requested"] - record["completed"]))
+        self.store.update(job_id, status=QUEUED, error=None, message="Waiting for a free worker...")
+        self._start(FormJob(job_id, record["spec"], self.store, self.tracker, reservation=reservation,
+                            ledger=self.ledger, scheduler=self.scheduler, schemas=self.schemas,
+                            parse_pool=self.parse_pool, breaker=self.breaker))
+        return True
+
+    def _start(self, job):
+        with self._lock:
+            self._active.add(job.job_id)
+        self._executor.submit(self._run, job)
+
+    def _run(self, job):
+        try:
+            job.run()
+        except Exception as e:
+            self.store.update(job.job_id, status=FAILED, error=str(e), message="Job failed.")
+        finally:
+            with self._lock:
+                self._active.discard(job.job_id)
+
+    def is_active(self, job_id):
+        """Whether the job is queued or running in this process"""
+        with self._lock:
+            return job_id in self._active
+
+    def resumable_jobs(self, client_ip=None):
+        """Jobs that did not complete and are not running anywhere in this process"""
+        jobs = []
+        for record in self.store.list_jobs():
+            if record["status"] == COMPLETED or self.is_active(record["id"]):
+                continue
+            if client_ip is not None and record["spec"].get("client_ip") != client_ip:
+                continue
+            jobs.append(record)
+        return jobs
+
+    def status(self, job_id):
+        """Get the current status record of a job"""
+        return self.store.get(job_id)
+
+    def scheduler_stats(self):
+        """Queue wait times and per-tenant throughput of the shared drivers"""
+        return self.scheduler.stats()
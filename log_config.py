@@ -0,0 +1,84 @@
+"""
+Logging module for the Google Form Filler.
+All modules log through children of the "form_filler" logger. Records are
+handed to a queue on the calling thread and formatted and written by a
+single listener thread, so workers never block on the output stream.
+
+Per-job context (job id, submission index) is kept in a context variable
+and added to every record:
+
+    with log_context(job_id="ab12", submission=3):
+        logger.info("Filling form %s", form_url)
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from config import LOG_LEVEL
+
+ROOT_LOGGER = "form_filler"
+LOG_FORMAT = "%(asctime)s %(levelname)-7s [%(job_id)s#%(submission)s] %(name)s: %(message)s"
+
+_context = ContextVar("log_context", default={})
+_listener = None
+_setup_lock = threading.Lock()
+
+
+def get_logger(name):
+    """Logger for a module, e.g. get_logger(__name__)"""
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+@contextmanager
+def log_context(**fields):
+    """Add fields (job_id, submission) to every record logged in this context"""
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def current_context():
+    """The fields added by the enclosing log_context() blocks"""
+    return dict(_context.get())
+
+
+class ContextFilter(logging.Filter):
+    def filter(self, record):
+        context = _context.get()
+        record.job_id = context.get("job_id", "-")
+        record.submission = context.get("submission", "-")
+        return True
+
+
+def configure_logging(level=LOG_LEVEL, stream=None):
+    """
+    Send form_filler logs through a queue to `stream` (stderr by default).
+    Safe to call more than once; later calls only change the level.
+    """
+    global _listener
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.setLevel(level)
+    with _setup_lock:
+        if _listener is not None:
+            return logger
+
+        handler = logging.StreamHandler(stream or sys.stderr)
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        log_queue = queue.SimpleQueue()
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        # The context lives on the logging thread, so it has to be captured before queueing
+        queue_handler.addFilter(ContextFilter())
+        logger.addHandler(queue_handler)
+        logger.propagate = False
+
+        _listener = logging.handlers.QueueListener(log_queue, handler)
+        _listener.start()
+        atexit.register(_listener.stop)
+    return logger
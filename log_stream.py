@@ -0,0 +1,73 @@
+"""
+Log streaming module for the Google Form Filler.
+Tails a job's log file incrementally into a bounded ring buffer and
+refreshes the Streamlit log view at a limited frame rate.
+"""
+
+import os
+import time
+from collections import deque
+from config import LOG_VISIBLE_LINES, LOG_REFRESH_FPS
+
+# How far back to start when a tail is opened on a large existing log
+INITIAL_TAIL_BYTES = 64 * 1024
+
+
+class LogTail:
+    def __init__(self, path, max_lines=LOG_VISIBLE_LINES, fps=LOG_REFRESH_FPS):
+        """Follow a log file, keeping only the last max_lines lines in memory"""
+        self.path = path
+        self.lines = deque(maxlen=max_lines)
+        self.offset = None
+        self._partial = b""
+        self._skip_first = False
+        self._dirty = False
+        self._min_interval = 1.0 / fps
+        self._last_render = 0.0
+        self._placeholder = None
+
+    def poll(self):
+        """Read the bytes appended since the last poll. Returns the number of new lines."""
+        if not os.path.exists(self.path):
+            return 0
+
+        with open(self.path, 'rb') as f:
+            if self.offset is None:
+                # Skip straight to the end of a large log; only the tail is shown anyway
+                size = f.seek(0, os.SEEK_END)
+                self.offset = max(0, size - INITIAL_TAIL_BYTES)
+                if self.offset:
+                    f.seek(self.offset - 1)
+                    self._skip_first = f.read(1) != b"\n"  # Drop the cut-off first line
+            f.seek(self.offset)
+            chunk = f.read()
+
+        if not chunk:
+            return 0
+        self.offset += len(chunk)
+
+        *complete, self._partial = (self._partial + chunk).split(b"\n")
+        if self._skip_first and complete:
+            complete = complete[1:]
+            self._skip_first = False
+
+        for line in complete:
+            self.lines.append(line.decode("utf-8", errors="replace"))
+        if complete:
+            self._dirty = True
+        return len(complete)
+
+    def render(self, placeholder):
+        """
+        Draw the log view into placeholder. A new placeholder (one per script
+        run) is drawn at once; after that the view is only redrawn when new
+        lines arrived and the frame interval has passed.
+        """
+        now = time.monotonic()
+        if placeholder is self._placeholder and (not self._dirty or now - self._last_render < self._min_interval):
+            return False
+        placeholder.code("\n".join(self.lines), language="bash")
+        self._placeholder = placeholder
+        self._dirty = False
+        self._last_render = now
+        return True
@@ -0,0 +1,187 @@
+"""
+Instrumentation module for the Google Form Filler.
+Times named spans (driver setup, page load, parse, LLM call, per-question
+fill, submit, confirmation) into fixed-bucket histograms that can be
+exported as Prometheus text or a JSON snapshot.
+
+Every span is recorded in the process-wide registry and, when one is active
+in the current context, in the job's own registry:
+
+    with use_registry(job_metrics):
+        with span("page_load"):
+            ...
+"""
+
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is unbounded
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 60, 120]
+
+METRIC_NAME = "form_filler_span_seconds"
+
+
+class Histogram:
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        """Fixed-bucket histogram; counts[i] holds values <= bounds[i], the last slot the rest"""
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def bucket(self, value):
+        return bisect_left(self.bounds, value)
+
+    def observe(self, value):
+        self.counts[self.bucket(value)] += 1
+        self.sum += value
+
+    @property
+    def total(self):
+        return sum(self.counts)
+
+    def percentile(self, q):
+        """Estimate the q-th percentile (0-100) by interpolating inside the matching bucket"""
+        total = self.total
+        if not total:
+            return None
+        rank = q / 100 * total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.bounds[-1] * 2
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """Histograms keyed by span name and label set"""
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds, labels=None):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def snapshot(self):
+        """JSON-serializable view of every histogram"""
+        with self._lock:
+            items = sorted(self._histograms.items())
+            spans = [{
+                "span": name,
+                "labels": dict(labels),
+                "count": h.total,
+                "sum": round(h.sum, 6),
+                "p50": h.percentile(50),
+                "p95": h.percentile(95),
+                "p99": h.percentile(99),
+                "buckets": list(h.counts)
+            } for (name, labels), h in items]
+        return {"bounds": LATENCY_BUCKETS, "spans": spans}
+
+    def to_prometheus(self):
+        """Render every histogram in the Prometheus text exposition format"""
+        lines = [
+            f"# HELP {METRIC_NAME} Duration of instrumented form filler stages.",
+            f"# TYPE {METRIC_NAME} histogram"
+        ]
+        with self._lock:
+            items = sorted(self._histograms.items())
+            for (name, labels), h in items:
+                label_text = ",".join([f'span="{_escape(name)}"'] + [f'{k}="{_escape(v)}"' for k, v in labels])
+                cumulative = 0
+                for bound, count in zip(h.bounds + ["+Inf"], h.counts):
+                    cumulative += count
+                    lines.append(f'{METRIC_NAME}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+                lines.append(f"{METRIC_NAME}_sum{{{label_text}}} {h.sum:.6f}")
+                lines.append(f"{METRIC_NAME}_count{{{label_text}}} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, prometheus_path=None, json_path=None):
+        """Export to a Prometheus text file and/or a JSON snapshot file"""
+        if prometheus_path:
+            with open(prometheus_path, 'w', encoding='utf-8') as f:
+                f.write(self.to_prometheus())
+        if json_path:
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump(self.snapshot(), f, indent=2)
+
+
+# Aggregates every span recorded in this process
+GLOBAL_REGISTRY = MetricsRegistry()
+
+_current_registry = ContextVar("metrics_registry", default=None)
+
+
+@contextmanager
+def use_registry(registry):
+    """Additionally record the spans of the current context into `registry`"""
+    token = _current_registry.set(registry)
+    try:
+        yield registry
+    finally:
+        _current_registry.reset(token)
+
+
+class Span:
+    def __init__(self, name, **labels):
+        """A timed stage; the duration is recorded when the span ends"""
+        self.name = name
+        self.labels = labels
+        self.started = None
+        self.duration = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        return self
+
+    def end(self):
+        if self.duration is None:
+            self.duration = time.perf_counter() - self.started
+            GLOBAL_REGISTRY.observe(self.name, self.duration, self.labels)
+            registry = _current_registry.get()
+            if registry is not None:
+                registry.observe(self.name, self.duration, self.labels)
+        return self.duration
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end()
+        return False
+
+
+def span(name, **labels):
+    """Time a block: `with span("submit") as s: ...`; s.duration holds the seconds afterwards"""
+    return Span(name, **labels)
+
+
+def timed(name, **labels):
+    """Decorator that records every call of a function as a span"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with Span(name, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,197 @@
+"""
+Option resolution module for the Google Form Filler.
+Matches generated answers against the parsed option lists in pure Python,
+so the browser only ever receives one exact click target per question.
+"""
+
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from functools import lru_cache
+from config import OPTION_MATCH_THRESHOLD
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+# Question types whose answers must be one of the parsed options
+CHOICE_TYPES = ("multiple_choice", "dropdown", "checkbox")
+GRID_TYPES = ("grid", "checkbox_grid")
+
+# Words that change what an option means, so answers must agree on them
+NEGATION_WORDS = frozenset(("not", "non", "never", "dont", "didnt", "isnt", "wasnt"))
+NEGATION_PREFIXES = ("dis", "un", "in", "im", "ir", "il", "non")
+INTENSIFIERS = frozenset(("very", "extremely", "really", "highly", "strongly", "completely",
+                          "totally", "somewhat", "slightly", "fairly", "quite"))
+
+
+def normalize_text(text):
+    """Lowercase, strip accents/punctuation and collapse whitespace"""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = _PUNCTUATION.sub(" ", text.lower())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def tokenize(text):
+    """Split normalized text into a set of tokens"""
+    return frozenset(normalize_text(text).split())
+
+
+def split_negations(tokens, other_tokens):
+    """
+    Separate the negations from the words of tokens. Negation words count as
+    negations, and so do words that are a word of other_tokens with a negation
+    prefix: next to "not satisfied", "dissatisfied" is "satisfied" negated.
+    Returns (number of negations, the remaining words).
+    """
+    negations, words = 0, set()
+    for token in tokens:
+        stem = next((token[len(prefix):] for prefix in NEGATION_PREFIXES
+                     if token.startswith(prefix) and token[len(prefix):] in other_tokens), None)
+        if token in NEGATION_WORDS:
+            negations += 1
+        elif stem:
+            negations += 1
+            words.add(stem)
+        else:
+            words.add(token)
+    return negations, frozenset(words)
+
+
+class OptionIndex:
+    def __init__(self, options):
+        """Precompute the normalized and tokenized form of every option"""
+        self.options = [opt for opt in options if str(opt).strip()]
+        self._exact = {}
+        self._entries = []
+        for option in self.options:
+            normalized = normalize_text(option)
+            self._exact.setdefault(normalized, option)
+            self._entries.append((option, normalized, tokenize(option)))
+
+    def score(self, answer_norm, answer_tokens, option_norm, option_tokens):
+        """
+        Fuzzy similarity between a normalized answer and option in [0, 1].
+        Answers and options that disagree on negation never match; an answer
+        whose words are all in the option (or the other way round) scores
+        high, unless the extra words are intensifiers ("very"), which make the
+        option a different one.
+        """
+        if not answer_norm or not option_norm:
+            return 0.0
+        answer_negations, answer_words = split_negations(answer_tokens, option_tokens)
+        option_negations, option_words = split_negations(option_tokens, answer_tokens)
+        if answer_negations != option_negations:
+            return 0.0
+        shorter, longer = sorted((answer_words, option_words), key=len)
+        if shorter and shorter <= longer and not (longer - shorter) & INTENSIFIERS:
+            containment = 0.8 + 0.2 * len(shorter) / len(longer)
+        else:
+            containment = 0.0
+        union = answer_tokens | option_tokens
+        overlap = len(answer_tokens & option_tokens) / len(union) if union else 0.0
+        ratio = SequenceMatcher(None, answer_norm, option_norm).ratio()
+        return max(containment, 0.5 * overlap + 0.5 * ratio)
+
+    def resolve(self, answer):
+        """
+        Resolve an answer to one of the options.
+        Returns (option, score); option is None when nothing scores above the threshold.
+        """
+        answer_norm = normalize_text(answer)
+        if answer_norm in self._exact:
+            return self._exact[answer_norm], 1.0
+
+        answer_tokens = frozenset(answer_norm.split())
+        best_option, best_score = None, 0.0
+        for option, option_norm, option_tokens in self._entries:
+            score = self.score(answer_norm, answer_tokens, option_norm, option_tokens)
+            if score > best_score:
+                best_option, best_score = option, score
+
+        if best_score >= OPTION_MATCH_THRESHOLD:
+            return best_option, best_score
+        return None, best_score
+
+
+@lru_cache(maxsize=512)
+def _cached_index(options):
+    return OptionIndex(options)
+
+
+def get_option_index(options):
+    """Get the (cached) index for an option list"""
+    return _cached_index(tuple(str(opt) for opt in options))
+
+
+def compile_indexes(question):
+    """The option indexes a question's answers are resolved with, by role"""
+    options = question.get("options")
+    if question["type"] in CHOICE_TYPES and isinstance(options, list) and options:
+        return {"options": get_option_index(options)}
+    if question["type"] in GRID_TYPES and isinstance(options, dict):
+        return {"rows": get_option_index(options.get("rows", [])),
+                "columns": get_option_index(options.get("columns", []))}
+    return {}
+
+
+def resolve_answers(form_structure, answers, artifacts=None):
+    """
+    Resolve every choice answer against its question's options.
+    artifacts may map identifiers to {"indexes": compile_indexes(question)}
+    so the indexes of unchanged questions are not looked up again.
+    Returns (resolved_answers, unresolved) where unresolved is a list of
+    (identifier, answer) pairs that could not be matched to any option.
+    Unresolved answers are kept as-is so the fill step can apply its fallback.
+    """
+    resolved = dict(answers)
+    unresolved = []
+
+    for question in form_structure:
+        identifier = question["identifier"]
+        q_type = question["type"]
+        options = question.get("options")
+        answer = resolved.get(identifier)
+        if answer is None or not options:
+            continue
+        question_artifacts = artifacts.get(identifier) if artifacts else None
+        indexes = question_artifacts["indexes"] if question_artifacts else compile_indexes(question)
+
+        if q_type in CHOICE_TYPES and isinstance(options, list):
+            index = indexes["options"]
+            if isinstance(answer, list):
+                matched = []
+                for item in answer:
+                    option, _ = index.resolve(item)
+                    if option is None:
+                        unresolved.append((identifier, item))
+                    elif option not in matched:
+                        matched.append(option)
+                resolved[identifier] = matched or answer
+            else:
+                option, _ = index.resolve(answer)
+                if option is None:
+                    unresolved.append((identifier, answer))
+                else:
+                    resolved[identifier] = option
+
+        elif q_type in GRID_TYPES and isinstance(options, dict) and isinstance(answer, dict):
+            row_index, col_index = indexes["rows"], indexes["columns"]
+            grid_answer = {}
+            for row, value in answer.items():
+                row_option, _ = row_index.resolve(row)
+                if row_option is None:
+                    unresolved.append((identifier, row))
+                    row_option = row
+                values = value if isinstance(value, list) else [value]
+                cols = []
+                for item in values:
+                    col_option, _ = col_index.resolve(item)
+                    if col_option is None:
+                        unresolved.append((identifier, item))
+                        col_option = item
+                    cols.append(col_option)
+                grid_answer[row_option] = cols if isinstance(value, list) else cols[0]
+            resolved[identifier] = grid_answer
+
+    return resolved, unresolved
@@ -0,0 +1,175 @@
+"""
+Persona sampling module for the Google Form Filler.
+Draws a whole batch of personas at once from demographic quota targets,
+so building the persona for a submission is a list lookup.
+"""
+
+import random
+import re
+from functools import lru_cache
+from itertools import product
+
+# Keyword tables used to detect traits from the target audience description.
+# Within a category the first label (in order) with a matching keyword wins.
+PERSONA_KEYWORDS = {
+    "age_group": {
+        "student": ["18-24", "college student", "university student"],
+        "young professional": ["25-34", "young professional", "recent graduate"],
+        "professional": ["35-44", "mid-career", "experienced professional"],
+        "senior professional": ["45-54", "55-64", "senior", "manager", "executive"],
+        "retired": ["65+", "retired", "senior citizen"]
+    },
+    "industry": {
+        "technology": ["tech", "IT", "software", "developer", "engineer", "programming"],
+        "healthcare": ["medical", "healthcare", "doctor", "nurse", "patient", "hospital"],
+        "education": ["education", "teacher", "professor", "student", "academic"],
+        "business": ["business", "finance", "marketing", "sales", "entrepreneur"],
+        "creative": ["creative", "design", "artist", "writer", "musician"]
+    },
+    "experience": {
+        "beginner": ["beginner", "novice", "new", "starting", "learning"],
+        "intermediate": ["intermediate", "familiar", "some experience"],
+        "advanced": ["advanced", "expert", "professional", "experienced"]
+    }
+}
+
+PERSONA_DEFAULTS = {"age_group": "adult", "industry": "general", "experience": "varied"}
+
+PERSONA_VARIATIONS = [
+    {"perspective": "practical", "trait": "pragmatic", "priority": "efficiency and results"},
+    {"perspective": "analytical", "trait": "detail-oriented", "priority": "accuracy and thoroughness"},
+    {"perspective": "innovative", "trait": "creative", "priority": "new ideas and approaches"},
+    {"perspective": "critical", "trait": "skeptical", "priority": "identifying issues and improvements"},
+    {"perspective": "enthusiastic", "trait": "optimistic", "priority": "positive outcomes and opportunities"},
+    {"perspective": "cautious", "trait": "careful", "priority": "minimizing risks and downsides"}
+]
+
+
+class KeywordMatcher:
+    def __init__(self, keyword_table):
+        """Compile every keyword of every category into a single regex"""
+        self.categories = list(keyword_table)
+        self._rank = {}
+        labels_by_keyword = {}
+        for category, labels in keyword_table.items():
+            for rank, (label, keywords) in enumerate(labels.items()):
+                self._rank[(category, label)] = rank
+                for keyword in keywords:
+                    labels_by_keyword.setdefault(keyword, set()).add((category, label))
+
+        # At any position the regex reports only the longest keyword, so each
+        # keyword also carries the labels of the keywords that are its prefixes.
+        keywords = sorted(labels_by_keyword, key=len, reverse=True)
+        self._labels = {}
+        for keyword in keywords:
+            hits = set()
+            for other in keywords:
+                if keyword.startswith(other):
+                    hits |= labels_by_keyword[other]
+            self._labels[keyword] = hits
+        self._pattern = re.compile("(?=(" + "|".join(re.escape(k) for k in keywords) + "))")
+
+    def detect(self, text):
+        """Scan the text once and return the winning label per category (or None)"""
+        found = set()
+        for keyword in set(self._pattern.findall(text.lower())):
+            found |= self._labels[keyword]
+
+        detected = dict.fromkeys(self.categories)
+        for category, label in found:
+            current = detected[category]
+            if current is None or self._rank[(category, label)] < self._rank[(category, current)]:
+                detected[category] = label
+        return detected
+
+
+_matcher = KeywordMatcher(PERSONA_KEYWORDS)
+
+
+@lru_cache(maxsize=256)
+def detect_traits(target_audience):
+    """Detect age group, industry and experience from an audience description"""
+    detected = _matcher.detect(target_audience)
+    return {key: detected[key] or PERSONA_DEFAULTS[key] for key in PERSONA_DEFAULTS}
+
+
+def build_quota_cells(age_groups, genders, countries, weights=None):
+    """
+    Build quota targets for every (age group, gender, country) cell.
+    weights optionally maps a cell tuple to its relative share; cells default to 1.
+    """
+    weights = weights or {}
+    return {cell: weights.get(cell, 1.0) for cell in product(age_groups, genders, countries)}
+
+
+def allocate_quotas(quotas, n):
+    """Split n personas across cells proportionally using the largest remainder method"""
+    cells = [cell for cell, share in quotas.items() if share > 0]
+    total = sum(quotas[cell] for cell in cells)
+    if not cells or n <= 0:
+        return {}
+
+    exact = [quotas[cell] * n / total for cell in cells]
+    counts = [int(value) for value in exact]
+    shortfall = n - sum(counts)
+    by_remainder = sorted(range(len(cells)), key=lambda i: exact[i] - counts[i], reverse=True)
+    for i in by_remainder[:shortfall]:
+        counts[i] += 1
+    return {cell: count for cell, count in zip(cells, counts) if count}
+
+
+class PopulationSampler:
+    def __init__(self, target_audience, quotas=None, seed=None):
+        """
+        target_audience: free text description used for trait detection
+        quotas: {(age_group, gender, country): share}; empty means no demographic cells
+        seed: makes the drawn population reproducible
+        """
+        self.target_audience = target_audience
+        self.quotas = quotas or {}
+        self.seed = seed
+        self.traits = detect_traits(target_audience)
+
+    def sample(self, n):
+        """Draw n personas in one batch, honouring the quota targets exactly"""
+        rng = random.Random(self.seed)
+
+        cells = []
+        for cell, count in allocate_quotas(self.quotas, n).items():
+            cells.extend([cell] * count)
+        rng.shuffle(cells)
+
+        # Spread the variations evenly, then shuffle so neighbours differ
+        variations = (PERSONA_VARIATIONS * (n // len(PERSONA_VARIATIONS) + 1))[:n]
+        rng.shuffle(variations)
+
+        personas = []
+        for i in range(n):
+            persona = dict(self.traits)
+            persona.update(variations[i])
+            if cells:
+                age, gender, country = cells[i]
+                persona.update({"age_range": age, "gender": gender, "country": country})
+            persona["description"] = describe_persona(persona, i)
+            personas.append(persona)
+        return personas
+
+
+def describe_persona(persona, variation_index):
+    """Render a persona dict as the prompt block used by generate_responses"""
+    demographics = ""
+    if persona.get("gender"):
+        demographics = (
+            f"\n    - Demographics: {persona['gender']}, aged {persona['age_range']}, "
+            f"from {persona['country']}."
+        )
+
+    return f"""
+    PERSONA:{demographics}
+    - You are a {persona['age_group']} with {persona['experience']} experience in the {persona['industry']} field.
+    - You have a {persona['perspective']} perspective and tend to be {persona['trait']}.
+    - You prioritize {persona['priority']} when evaluating options or providing feedback.
+    - Variation #{variation_index+1}: Your responses should reflect this distinct perspective.
+
+    When generating answers, stay true to this persona's viewpoint and priorities.
+    """
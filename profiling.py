@@ -0,0 +1,131 @@
+"""
+Profiling module for the Google Form Filler.
+Opt-in, per-job profiling: a cProfile of the Python side of the whole job,
+plus Chrome DevTools performance metrics (script time, layout, style
+recalculation, DOM nodes, JS heap) captured after every page load and fill.
+
+Capture points call capture_page_metrics(), which does nothing unless a
+profiler is active in the current context:
+
+    with JobProfiler(job_id, store.root):
+        ...
+        capture_page_metrics(driver, "page_load")
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+from contextvars import ContextVar
+from log_config import get_logger, current_context
+
+logger = get_logger(__name__)
+
+# Performance.getMetrics values written for every capture
+CDP_METRICS = (
+    "ScriptDuration", "LayoutDuration", "RecalcStyleDuration", "TaskDuration",
+    "LayoutCount", "RecalcStyleCount", "Nodes", "Documents", "JSEventListeners",
+    "JSHeapUsedSize", "JSHeapTotalSize"
+)
+
+# Cumulative counters; the capture also records how much they grew since the last one
+CDP_COUNTERS = ("ScriptDuration", "LayoutDuration", "RecalcStyleDuration", "TaskDuration",
+                "LayoutCount", "RecalcStyleCount")
+
+# Functions listed in the text summary of the Python profile
+SUMMARY_LIMIT = 40
+
+_active_profiler = ContextVar("job_profiler", default=None)
+
+
+def profile_paths(root, job_id):
+    """Paths of a job's pstats dump, its text summary and its CDP metrics log"""
+    return (os.path.join(root, f"{job_id}.profile.pstats"),
+            os.path.join(root, f"{job_id}.profile.txt"),
+            os.path.join(root, f"{job_id}.cdp.jsonl"))
+
+
+class JobProfiler:
+    def __init__(self, job_id, root):
+        """Profile one job; artifacts are written next to its log in `root`"""
+        self.job_id = job_id
+        self.stats_path, self.summary_path, self.cdp_path = profile_paths(root, job_id)
+        self.profile = cProfile.Profile()
+        self._token = None
+        self._enabled_drivers = set()
+        self._unsupported_drivers = set()
+        self._last = {}
+
+    def __enter__(self):
+        # Start a fresh CDP log; a resumed job profiles only its new run
+        open(self.cdp_path, 'w').close()
+        self._token = _active_profiler.set(self)
+        self.profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profile.disable()
+        _active_profiler.reset(self._token)
+        try:
+            self.write_profile()
+        except OSError as e:
+            logger.error("Could not write profile of job %s: %s", self.job_id, e)
+        return False
+
+    def write_profile(self):
+        """Dump the pstats file and a text summary sorted by cumulative time"""
+        self.profile.dump_stats(self.stats_path)
+        out = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=out)
+        stats.sort_stats("cumulative").print_stats(SUMMARY_LIMIT)
+        stats.sort_stats("tottime").print_stats(SUMMARY_LIMIT)
+        with open(self.summary_path, 'w', encoding='utf-8') as f:
+            f.write(out.getvalue())
+
+    def capture(self, driver, stage):
+        """Append the page's current CDP performance metrics for a stage"""
+        driver_id = id(driver)
+        if driver_id in self._unsupported_drivers:
+            return None
+        try:
+            if driver_id not in self._enabled_drivers:
+                driver.execute_cdp_cmd("Performance.enable", {"timeDomain": "timeTicks"})
+                self._enabled_drivers.add(driver_id)
+            result = driver.execute_cdp_cmd("Performance.getMetrics", {})
+        except Exception as e:
+            # Not a Chromium driver, or the session is gone; stop asking this driver
+            logger.warning("CDP performance metrics unavailable: %s", e)
+            self._unsupported_drivers.add(driver_id)
+            return None
+
+        values = {m["name"]: m["value"] for m in result.get("metrics", [])}
+        metrics = {name: values[name] for name in CDP_METRICS if name in values}
+        last = self._last.get(driver_id, {})
+        delta = {name: round(metrics[name] - last.get(name, 0), 6) for name in CDP_COUNTERS if name in metrics}
+        self._last[driver_id] = metrics
+
+        context = current_context()
+        entry = {
+            "timestamp": time.time(),
+            "submission": context.get("submission"),
+            "stage": stage,
+            "metrics": metrics,
+            "delta": delta
+        }
+        with open(self.cdp_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + "\n")
+        return entry
+
+    def artifacts(self):
+        """Artifact paths that were written"""
+        return [path for path in (self.stats_path, self.summary_path, self.cdp_path) if os.path.exists(path)]
+
+
+def capture_page_metrics(driver, stage):
+    """Record CDP metrics for a stage when the current job is being profiled"""
+    profiler = _active_profiler.get()
+    if profiler is not None:
+        return profiler.capture(driver, stage)
+    return None
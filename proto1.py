@@ -1,6 +1,11 @@
 import os
+import argparse
+import copy
+import threading
 import time
 import json
+import logging
+from contextlib import nullcontext
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -18,10 +23,49 @@ from selenium.webdriver.edge.options import Options as EdgeOptions
 # --- End WebDriver Imports ---
 
 import google.generativeai as genai
-from bs4 import BeautifulSoup # Using BS4 alongside Selenium for easier parsing sometimes
+
+from form_parser import parse_html
+from persona_sampler import PERSONA_VARIATIONS, describe_persona, detect_traits
+from metrics import Span, span, timed
+from log_config import get_logger, configure_logging, log_context
+from profiling import JobProfiler, capture_page_metrics
+from token_budget import record_llm_usage
+from browser_profiles import chrome_profile_arguments, default_profiles
+from circuit_breaker import CircuitBreaker, classify_failure, TIMEOUT, PARSE_FAILURE, FILL_FAILURE
+
+logger = get_logger(__name__)
+
+FORM_SELECTOR = 'form[action*="formResponse"]'
+NEXT_BUTTON_XPATH = '//div[@role="button"][.//span[normalize-space()="Next"]]'
+SUBMIT_SELECTORS = [
+    '//div[@role="button"][.//span[normalize-space()="Submit"]]',
+    '//button[@type="submit"][contains(normalize-space(), "Submit")]',
+    '//div[@role="button"][contains(@jsname, "OCpkoe")]',
+    'div[role="button"][jsname*="OCpkoe"]',
+    'button[type="submit"]'
+]
+CONFIRMATION_TEXTS = ["Your response has been recorded", "Submission successful"]
+ERROR_XPATH = '//div[@role="alert" or contains(@id, "error") or contains(@class, "error")]'
+
+# Common Chrome install locations
+CHROME_PATHS = [
+    # Windows paths
+    r"C:\Program Files\Google\Chrome\Application\chrome.exe",
+    r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe",
+    # Linux paths
+    "/usr/bin/google-chrome",
+    "/usr/bin/google-chrome-stable",
+    # MacOS paths
+    "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"
+]
+
+# Combined structures of multi-section forms, by form URL: (extracted at, structure)
+_section_cache = {}
 
 # --- Configuration ---
 # Configure the Gemini API with the key from config
+from config import SECTION_CACHE_TTL, QUESTION_WAIT_TIME, JOB_STORE_DIR
+
 try:
     from config import GEMINI_API_KEY
     API_KEY = GEMINI_API_KEY
@@ -29,39 +73,26 @@ except ImportError:
     API_KEY = os.environ.get("GEMINI_API_KEY", "")
 
 if not API_KEY:
-    print("Error: API key not available.")
+    logger.error("API key not available.")
     model = None  # Ensure model is None if API key is missing
 else:
     try:
         genai.configure(api_key=API_KEY)
         model_name = 'gemini-2.0-flash'  # Updated to latest Gemini 2.0 Flash model
         model = genai.GenerativeModel(model_name)
-        print(f"Gemini model '{model_name}' configured.")
+        logger.info("Gemini model '%s' configured.", model_name)
     except Exception as e:
-        print(f"Error configuring Gemini: {e}")
+        logger.error("Error configuring Gemini: %s", e)
         model = None # Ensure model is None if configuration fails
 
-# Add this utility function at the top level for consistent header formatting
-def print_header(message, level=1):
-    """Print a formatted header message with different emphasis levels."""
-    if level == 1:   # Major section header
-        separator = "=" * 80
-        print(f"\n{separator}")
-        print(f"  {message}")
-        print(f"{separator}")
-    elif level == 2: # Sub-section header
-        separator = "-" * 60
-        print(f"\n{separator}")
-        print(f"  {message}")
-        print(f"{separator}")
-    elif level == 3: # Important status/error
-        print(f"\n>>> {message} <<<")
-    else:            # Regular header
-        print(f"\n--- {message} ---")
-
 # Selenium WebDriver setup
-def setup_driver(browser_type="chrome"):
-    """Sets up the Selenium WebDriver with support for different browsers and environments."""
+@timed("driver_setup")
+def setup_driver(browser_type="chrome", profile_dir=None):
+    """
+    Sets up the Selenium WebDriver with support for different browsers and environments.
+    With a profile_dir (see browser_profiles) the browser keeps its profile and
+    disk cache there; otherwise it starts with a throwaway profile.
+    """
     try:
         # First try Chrome (best for cross-platform compatibility)
         if browser_type.lower() == "chrome":
@@ -77,30 +108,22 @@ def setup_driver(browser_type="chrome"):
             
             # Set user agent
             options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
+            if profile_dir:
+                for argument in chrome_profile_arguments(profile_dir):
+                    options.add_argument(argument)
 
             # Handle the case when running in Streamlit Cloud
             if "STREAMLIT_SHARING" in os.environ or "STREAMLIT_CLOUD" in os.environ:
-                print("Detected Streamlit Cloud environment. Using special Chrome setup.")
+                logger.debug("Detected Streamlit Cloud environment. Using special Chrome setup.")
                 # In Streamlit Cloud, we need a different approach
                 options.binary_location = "/usr/bin/google-chrome-stable"
                 service = ChromeService(executable_path="/usr/local/bin/chromedriver")
                 driver = webdriver.Chrome(service=service, options=options)
             else:
                 # Try to detect Chrome in common locations
-                chrome_paths = [
-                    # Windows paths
-                    r"C:\Program Files\Google\Chrome\Application\chrome.exe",
-                    r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe",
-                    # Linux paths
-                    "/usr/bin/google-chrome",
-                    "/usr/bin/google-chrome-stable",
-                    # MacOS paths
-                    "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"
-                ]
-                
-                for path in chrome_paths:
+                for path in CHROME_PATHS:
                     if os.path.exists(path):
-                        print(f"Found Chrome at: {path}")
+                        logger.debug("Found Chrome at: %s", path)
                         options.binary_location = path
                         break
                         
@@ -109,11 +132,11 @@ def setup_driver(browser_type="chrome"):
                     service = ChromeService(ChromeDriverManager().install())
                     driver = webdriver.Chrome(service=service, options=options)
                 except Exception as chrome_error:
-                    print(f"Error setting up Chrome with webdriver-manager: {chrome_error}")
+                    logger.error("Error setting up Chrome with webdriver-manager: %s", chrome_error)
                     # Try direct Chrome setup without service
                     driver = webdriver.Chrome(options=options)
             
-            print("Chrome WebDriver setup successful (running in headless mode).")
+            logger.info("Chrome WebDriver setup successful (running in headless mode).")
             return driver
             
         # Edge as fallback (Windows-specific)
@@ -128,17 +151,20 @@ def setup_driver(browser_type="chrome"):
             options.add_argument("--disable-notifications")
             options.add_argument("--disable-popup-blocking")
             options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36 Edg/91.0.864.59")
+            if profile_dir:
+                for argument in chrome_profile_arguments(profile_dir):
+                    options.add_argument(argument)
 
             service = EdgeService(EdgeChromiumDriverManager().install())
             driver = webdriver.Edge(service=service, options=options)
-            print("Edge WebDriver setup successful (running in headless mode).")
+            logger.info("Edge WebDriver setup successful (running in headless mode).")
             return driver
     except Exception as e:
-        print(f"Error setting up WebDriver: {e}")
+        logger.error("Error setting up WebDriver: %s", e)
         
         # If standard setup fails, try a more direct approach for Streamlit
         try:
-            print("Attempting alternative setup for Streamlit environment...")
+            logger.info("Attempting alternative setup for Streamlit environment...")
             options = webdriver.ChromeOptions()
             options.add_argument("--headless=new")
             options.add_argument("--disable-gpu")
@@ -158,14 +184,14 @@ def setup_driver(browser_type="chrome"):
                     from selenium.webdriver.chrome.service import Service
                     driver = webdriver.Chrome(service=Service(), options=options)
                     
-            print("Alternative Chrome WebDriver setup successful.")
+            logger.info("Alternative Chrome WebDriver setup successful.")
             return driver
         except Exception as alt_e:
-            print(f"Alternative setup also failed: {alt_e}")
+            logger.warning("Alternative setup also failed: %s", alt_e)
             
             # One last attempt with Firefox if available
             try:
-                print("Attempting Firefox as last resort...")
+                logger.info("Attempting Firefox as last resort...")
                 from selenium.webdriver.firefox.options import Options as FirefoxOptions
                 from selenium.webdriver.firefox.service import Service as FirefoxService
                 from webdriver_manager.firefox import GeckoDriverManager
@@ -174,370 +200,260 @@ def setup_driver(browser_type="chrome"):
                 firefox_options.add_argument("--headless")
                 firefox_service = FirefoxService(GeckoDriverManager().install())
                 driver = webdriver.Firefox(service=firefox_service, options=firefox_options)
-                print("Firefox WebDriver setup successful.")
+                logger.info("Firefox WebDriver setup successful.")
                 return driver
             except Exception as ff_e:
-                print(f"Firefox setup failed: {ff_e}")
+                logger.warning("Firefox setup failed: %s", ff_e)
                 return None
 
 # --- Form Parsing ---
-def extract_form_structure(driver, form_url):
+# Serializes a pruned clone of the form (no scripts, styles, SVG icons) in the
+# browser, so only the form's markup crosses the WebDriver wire. Also returns
+# the size of the whole document for the capture statistics.
+CAPTURE_FORM_JS = """
+var form = document.querySelector('form[action*="formResponse"]');
+if (!form || !form.querySelector('div[role="listitem"], div[jscontroller][data-params]')) { return null; }
+var clone = form.cloneNode(true);
+clone.querySelectorAll('script, style, svg, noscript, link, iframe').forEach(function (el) { el.remove(); });
+return {html: clone.outerHTML, page_length: document.documentElement.outerHTML.length};
+"""
+
+_capture_lock = threading.Lock()
+_capture_totals = {"captures": 0, "fallbacks": 0, "captured_chars": 0, "page_chars": 0, "parse_seconds": 0.0}
+
+def capture_form_html(driver):
     """
-    Navigates to the form and extracts questions and input types using Selenium.
-    Returns a list of dictionaries, each representing a question.
+    Returns (html, page_length) for the form on the current page: the pruned
+    form subtree and the size of the whole document, or the full page source
+    and None when no form container with questions can be found.
     """
-    print(f"Attempting to load form: {form_url}")
     try:
-        driver.get(form_url)
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, 'form[action*="formResponse"]'))
-        )
-        print("Form page loaded.")
-        time.sleep(2) # Allow dynamic elements to potentially load
-
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        form_elements = []
+        captured = driver.execute_script(CAPTURE_FORM_JS)
+    except Exception as e:
+        logger.debug("Scoped form capture failed: %s", e)
+        captured = None
+    if captured:
+        return captured["html"], captured["page_length"]
+    logger.debug("No form container found; falling back to the full page source.")
+    html = driver.page_source
+    return html, None
+
+def capture_stats():
+    """
+    Totals of the form captures so far: how many fell back to the full page,
+    and for the scoped ones the characters transferred against the full
+    documents' size and their parse time, plus the parse time saved,
+    estimated from the parse rate of the scoped captures.
+    """
+    with _capture_lock:
+        totals = dict(_capture_totals)
+    scoped_chars = totals["captured_chars"]
+    rate = totals["parse_seconds"] / scoped_chars if scoped_chars else 0.0
+    totals["saved_chars"] = max(totals["page_chars"] - scoped_chars, 0)
+    totals["parse_seconds_saved"] = round(totals["saved_chars"] * rate, 6)
+    return totals
+
+# Reads grid row and column headers from the live page, for grids whose
+# captured markup did not yield them
+GRID_OPTIONS_JS = """
+var result = {rows: [], columns: []};
+var gridContainer = document.querySelector('.freebirdFormviewerViewItemsGridScrollContainer');
+if (gridContainer) {
+    // Get row headers
+    var rowHeaders = gridContainer.querySelectorAll('.freebirdFormviewerViewItemsGridRowHeader');
+    rowHeaders.forEach(function(header) {
+        result.rows.push(header.textContent.trim());
+    });
+
+    // Get column headers
+    var colHeaders = gridContainer.querySelectorAll('.freebirdFormviewerViewItemsGridColumnHeader');
+    colHeaders.forEach(function(header) {
+        result.columns.push(header.textContent.trim());
+    });
+}
+return result;
+"""
+
+def complete_grid_options(driver, form_elements):
+    """Fills in missing grid rows/columns via JavaScript on the driver's page."""
+    for question in form_elements:
+        if question["type"] not in ("grid", "checkbox_grid"):
+            continue
+        rows, cols = question["options"]["rows"], question["options"]["columns"]
+        if rows and cols:
+            continue
+        try:
+            grid_data = driver.execute_script(GRID_OPTIONS_JS)
+            if grid_data['rows']:
+                rows = grid_data['rows']
+            if grid_data['columns']:
+                cols = grid_data['columns']
+            question["options"] = {"rows": rows, "columns": cols}
+            logger.debug("Extracted grid data via JavaScript: %s rows, %s columns", len(rows), len(cols))
+        except Exception as e:
+            logger.warning("Error extracting grid via JavaScript: %s", e)
+
+def parse_form_page(driver):
+    """
+    Parses the questions on the form page currently shown in the driver.
+    The captured HTML is parsed on the active parse pool (see form_parser);
+    the Selenium fallback below needs the live page and stays on this thread.
+    """
+    with span("capture"):
+        html, page_length = capture_form_html(driver)
+    parse_span = Span("parse").start()
 
-        question_items = soup.select('div[role="listitem"]')
-        print(f"Found {len(question_items)} potential question items.")
-
-        if not question_items:
-             question_items = soup.select('div[jscontroller][data-params]')
-             print(f"Fallback: Found {len(question_items)} potential question items using data-params.")
-
-        for item in question_items:
-            question_text_element = item.select_one('div[role="heading"]')
-            question_text = question_text_element.get_text(strip=True) if question_text_element else "Unknown Question"
-
-            input_type = "unknown"
-            options = []
-            aria_label = question_text  # Default to question text instead of input placeholder
-
-            # Check for required marker
-            required = "*" in question_text
-            # Remove asterisk from question text for cleaner display
-            clean_question = question_text.replace('*', '').strip()
-
-            # Check for text inputs first
-            text_input = item.select_one('input[type="text"], input[type="email"], input[type="url"], input[type="number"], textarea')
-            if text_input:
-                input_type = "text"
-                # Only use aria-label if it's not a generic placeholder like "Your answer"
-                input_label = text_input.get('aria-label', '').strip()
-                if input_label and input_label != "Your answer":
-                    aria_label = input_label
-                else:
-                    aria_label = clean_question  # Use question text when placeholder is generic
-            
-            # Check for date input
-            elif item.select_one('input[type="date"], input[placeholder*="Date"]'):
-                input_type = "date"
-                aria_label = clean_question
-            
-            # Check for time input
-            elif item.select_one('input[type="time"], input[placeholder*="Time"]'):
-                input_type = "time"
-                aria_label = clean_question
-            
-            # Check for file upload
-            elif item.select('div[data-params*="uploadType"]'):
-                input_type = "file_upload"
-                aria_label = clean_question
-            
-            # Check for grid questions
-            elif item.select('div[role="grid"], table.freebirdFormviewerViewItemsGridTable'):
-                # Determine if it's a checkbox grid or radio button grid
-                if item.select('div[role="checkbox"]'):
-                    input_type = "checkbox_grid"
-                else:
-                    input_type = "grid"
-                
-                # Extract rows and columns
-                rows = []
-                cols = []
-                
-                # Try different selectors to catch all possible grid layouts
-                row_elements = item.select('div[role="row"] th, tr th:first-child, div.freebirdFormviewerViewItemsGridRowGroup')
-                col_elements = item.select('div[role="columnheader"], tr th:not(:first-child), div.freebirdFormviewerViewItemsGridCell[role="heading"]')
-                
-                # If traditional selectors fail, try more specific Google Forms selectors
-                if not row_elements:
-                    row_elements = item.select('div.freebirdFormviewerViewItemsGridRow')
-                if not col_elements:
-                    col_elements = item.select('div.freebirdFormviewerViewItemsGridColumnHeader')
-                
-                for row in row_elements:
-                    row_text = row.get_text(strip=True)
-                    if row_text:
-                        rows.append(row_text)
-                
-                for col in col_elements:
-                    col_text = col.get_text(strip=True)
-                    if col_text:
-                        cols.append(col_text)
-                
-                options = {"rows": rows, "columns": cols}
-                aria_label = clean_question
-                
-                # If we couldn't extract rows/columns properly, use JavaScript
-                if not rows or not cols:
-                    try:
-                        js_code = """
-                        var result = {rows: [], columns: []};
-                        var gridContainer = document.querySelector('.freebirdFormviewerViewItemsGridScrollContainer');
-                        if (gridContainer) {
-                            // Get row headers
-                            var rowHeaders = gridContainer.querySelectorAll('.freebirdFormviewerViewItemsGridRowHeader');
-                            rowHeaders.forEach(function(header) {
-                                result.rows.push(header.textContent.trim());
-                            });
-                            
-                            // Get column headers
-                            var colHeaders = gridContainer.querySelectorAll('.freebirdFormviewerViewItemsGridColumnHeader');
-                            colHeaders.forEach(function(header) {
-                                result.columns.push(header.textContent.trim());
-                            });
-                        }
-                        return result;
-                        """
-                        grid_data = driver.execute_script(js_code)
-                        if grid_data['rows']:
-                            rows = grid_data['rows']
-                        if grid_data['columns']:
-                            cols = grid_data['columns']
-                        options = {"rows": rows, "columns": cols}
-                        print(f"  Extracted grid data via JavaScript: {len(rows)} rows, {len(cols)} columns")
-                    except Exception as e:
-                        print(f"  Error extracting grid via JavaScript: {e}")
-
-            # Check for radio buttons (multiple choice)
-            elif item.select('div[role="radiogroup"]'):
-                scale_labels = item.select('label span')
-                scale_values = [lbl.get_text(strip=True) for lbl in scale_labels if lbl.get_text(strip=True)]
-                
-                # Enhanced linear scale detection
-                is_numeric_scale = any(lbl.get_text(strip=True).isdigit() for lbl in scale_labels)
-                is_linear_scale = (
-                    is_numeric_scale or 
-                    item.select('div[aria-label*="stars"], div[aria-label*="rating"], div[aria-label*="scale"]') or
-                    item.select('div[jsname="RRJqzb"]') or  # Google Forms rating component
-                    item.select('div[jsname="NfjK7"], div[jsname="jq1lEb"]')  # "Less"/"More" labels
-                )
-
-                if is_linear_scale:
-                    input_type = "linear_scale"
-                    options = scale_values
-                    
-                    # Capture endpoint labels (Like "Less" and "More")
-                    endpoint_labels = {}
-                    less_label = item.select_one('div[jsname="NfjK7"]')
-                    more_label = item.select_one('div[jsname="jq1lEb"]')
-                    
-                    if less_label:
-                        endpoint_labels["start"] = less_label.get_text(strip=True)
-                    if more_label:
-                        endpoint_labels["end"] = more_label.get_text(strip=True)
-                    
-                    # If endpoint labels exist, add them to options
-                    if endpoint_labels:
-                        print(f"  Detected scale with labeled endpoints: {endpoint_labels}")
-                    
-                    # Extract actual data-value attributes when available
-                    data_values = []
-                    radio_buttons = item.select('div[role="radio"]')
-                    for button in radio_buttons:
-                        data_val = button.get('data-value')
-                        if data_val:
-                            data_values.append(data_val)
-                    
-                    if data_values:
-                        options = data_values
-                        print(f"  Using data-value attributes for scale: {options}")
-                    # If we have radio buttons but no text labels or data-values
-                    elif not options and radio_buttons:
-                        options = [str(i+1) for i in range(len(radio_buttons))]
-                        print(f"  Inferred {len(options)} numeric options from radio buttons")
-                    
-                    # Store endpoint labels for better response generation
-                    if endpoint_labels:
-                        if not isinstance(options, dict):
-                            options = {"values": options, "labels": endpoint_labels}
-                        else:
-                            options["labels"] = endpoint_labels
-                    
-                    aria_label = clean_question
-                else:
-                    input_type = "multiple_choice"
-                    option_elements = item.select('div[role="radio"] span')
-                    options = [opt.get_text(strip=True) for opt in option_elements if opt.get_text(strip=True)]
-                    aria_label = clean_question
-
-            elif item.select('div[role="group"]'):
-                if item.select('div[role="checkbox"]'):
-                    input_type = "checkbox"
-                    option_elements = item.select('div[role="checkbox"] span')
-                    options = [opt.get_text(strip=True) for opt in option_elements if opt.get_text(strip=True)]
-                    aria_label = clean_question
-
-            elif item.select_one('div[role="listbox"]'):
-                input_type = "dropdown"
-                option_elements = item.select('div[role="option"] span')
-                options = [opt.get_text(strip=True) for opt in option_elements if opt.get_text(strip=True)]
-                aria_label = clean_question
-
-            if input_type != "unknown":
-                 form_elements.append({
-                     "question": clean_question,
-                     "type": input_type,
-                     "options": options,
-                     "identifier": aria_label,
-                     "required": required
-                 })
-                 print(f"  Extracted: '{clean_question}' (Type: {input_type}, Required: {required}, Options: {options if options else 'N/A'})")
-            else:
-                 print(f"  Skipped item, could not determine input type for: '{clean_question}'")
+    form_elements = parse_html(html)
+    complete_grid_options(driver, form_elements)
 
-        if not form_elements:
-            print("Warning: Could not extract any form questions. The structure might be unexpected.")
-            print("Trying Selenium-based element finding...")
-            try:
-                question_containers = driver.find_elements(By.XPATH, '//div[contains(@class, "Qr7Oae")]/div/div/div[contains(@class, "freebirdFormviewerComponentsQuestionBaseRoot")]')
-                if not question_containers:
-                    question_containers = driver.find_elements(By.CSS_SELECTOR, 'div[role="listitem"]')
-
-                print(f"Found {len(question_containers)} potential containers via Selenium.")
-
-                for container in question_containers:
-                    try:
-                        q_text = container.find_element(By.CSS_SELECTOR, 'div[role="heading"]').text.strip()
-                        q_type = "unknown"
-                        q_options = []
-                        q_identifier = q_text
-
-                        if container.find_elements(By.CSS_SELECTOR, 'input[type="text"], textarea'):
-                            q_type = "text"
-                            try:
-                                q_identifier = container.find_element(By.CSS_SELECTOR, 'input[type="text"], textarea').get_attribute('aria-label') or q_text
-                            except NoSuchElementException:
-                                q_identifier = q_text
-                        elif container.find_elements(By.CSS_SELECTOR, 'div[role="radiogroup"]'):
-                            q_type = "multiple_choice"
-                            opts = container.find_elements(By.CSS_SELECTOR, 'div[role="radio"] span')
-                            q_options = [o.text.strip() for o in opts if o.text.strip()]
-                        elif container.find_elements(By.CSS_SELECTOR, 'div[role="checkbox"]'):
-                             q_type = "checkbox"
-                             opts = container.find_elements(By.CSS_SELECTOR, 'div[role="checkbox"] span')
-                             q_options = [o.text.strip() for o in opts if o.text.strip()]
-                        elif container.find_elements(By.CSS_SELECTOR, 'div[role="listbox"]'):
-                            q_type = "dropdown"
-                        elif container.find_elements(By.CSS_SELECTOR, 'div[role="radiogroup"][aria-labelledby]'):
-                            scale_opts = container.find_elements(By.CSS_SELECTOR, 'label span')
-                            if any(lbl.text.strip().isdigit() for lbl in scale_opts):
-                                q_type = "linear_scale"
-                                q_options = [lbl.text.strip() for lbl in scale_opts if lbl.text.strip()]
-
-                        if q_type != "unknown":
-                            form_elements.append({
-                                "question": q_text,
-                                "type": q_type,
-                                "options": q_options,
-                                "identifier": q_identifier.strip() if q_identifier else q_text
-                            })
-                            print(f"  Extracted via Selenium: '{q_text}' (Type: {q_type}, Options: {q_options if q_options else 'N/A'})")
-                        else:
-                            print(f"  Skipped Selenium item, could not determine input type for: '{q_text}'")
-
-                    except NoSuchElementException:
-                        print("  Skipped a container, couldn't find expected elements within it.")
-                        continue
-                    except Exception as e:
-                        print(f"  Error processing a container: {e}")
-                        continue
+    if not form_elements:
+        logger.warning("Could not extract any form questions. The structure might be unexpected.")
+        logger.debug("Trying Selenium-based element finding...")
+        try:
+            question_containers = driver.find_elements(By.XPATH, '//div[contains(@class, "Qr7Oae")]/div/div/div[contains(@class, "freebirdFormviewerComponentsQuestionBaseRoot")]')
+            if not question_containers:
+                question_containers = driver.find_elements(By.CSS_SELECTOR, 'div[role="listitem"]')
+
+            logger.debug("Found %s potential containers via Selenium.", len(question_containers))
 
-            except Exception as e:
-                print(f"Error during Selenium-based extraction: {e}")
+            for container in question_containers:
+                try:
+                    q_text = container.find_element(By.CSS_SELECTOR, 'div[role="heading"]').text.strip()
+                    q_type = "unknown"
+                    q_options = []
+                    q_identifier = q_text
 
-        print("\n--- DETECTED FORM STRUCTURE ---")
-        for i, elem in enumerate(form_elements):
-            print(f"Question {i+1}: '{elem['question']}' (Type: {elem['type']})")
-            if elem['options']:
-                print(f"  Options: {elem['options']}")
-            print(f"  Identifier: '{elem['identifier']}'")
-        print("----------------------------\n")
+                    if container.find_elements(By.CSS_SELECTOR, 'input[type="text"], textarea'):
+                        q_type = "text"
+                        try:
+                            q_identifier = container.find_element(By.CSS_SELECTOR, 'input[type="text"], textarea').get_attribute('aria-label') or q_text
+                        except NoSuchElementException:
+                            q_identifier = q_text
+                    elif container.find_elements(By.CSS_SELECTOR, 'div[role="radiogroup"]'):
+                        q_type = "multiple_choice"
+                        opts = container.find_elements(By.CSS_SELECTOR, 'div[role="radio"] span')
+                        q_options = [o.text.strip() for o in opts if o.text.strip()]
+                    elif container.find_elements(By.CSS_SELECTOR, 'div[role="checkbox"]'):
+                         q_type = "checkbox"
+                         opts = container.find_elements(By.CSS_SELECTOR, 'div[role="checkbox"] span')
+                         q_options = [o.text.strip() for o in opts if o.text.strip()]
+                    elif container.find_elements(By.CSS_SELECTOR, 'div[role="listbox"]'):
+                        q_type = "dropdown"
+                    elif container.find_elements(By.CSS_SELECTOR, 'div[role="radiogroup"][aria-labelledby]'):
+                        scale_opts = container.find_elements(By.CSS_SELECTOR, 'label span')
+                        if any(lbl.text.strip().isdigit() for lbl in scale_opts):
+                            q_type = "linear_scale"
+                            q_options = [lbl.text.strip() for lbl in scale_opts if lbl.text.strip()]
+
+                    if q_type != "unknown":
+                        form_elements.append({
+                            "question": q_text,
+                            "type": q_type,
+                            "options": q_options,
+                            "identifier": q_identifier.strip() if q_identifier else q_text
+                        })
+                        logger.debug("Extracted via Selenium: '%s' (Type: %s, Options: %s)", q_text, q_type, q_options if q_options else 'N/A')
+                    else:
+                        logger.debug("Skipped Selenium item, could not determine input type for: '%s'", q_text)
+
+                except NoSuchElementException:
+                    logger.debug("Skipped a container, couldn't find expected elements within it.")
+                    continue
+                except Exception as e:
+                    logger.warning("Error processing a container: %s", e)
+                    continue
+
+        except Exception as e:
+            logger.error("Error during Selenium-based extraction: %s", e)
+
+    parse_seconds = parse_span.end()
+    with _capture_lock:
+        _capture_totals["captures"] += 1
+        if page_length is None:
+            _capture_totals["fallbacks"] += 1
+        else:
+            _capture_totals["parse_seconds"] += parse_seconds
+            _capture_totals["captured_chars"] += len(html)
+            _capture_totals["page_chars"] += page_length
+    if page_length:
+        logger.debug("Captured %s of %s characters of the page (%.0f%%), parsed in %.3f seconds.",
+                     len(html), page_length, 100 * len(html) / page_length, parse_seconds)
+    return form_elements
 
+def extract_form_structure(driver, form_url):
+    """
+    Navigates to the form and extracts questions and input types using Selenium.
+    Forms with "Next" sections are walked once, section by section, with
+    placeholder answers to get past required questions (nothing is submitted);
+    their combined structure is cached for SECTION_CACHE_TTL seconds.
+    Returns a list of dictionaries, each representing a question; "section"
+    is the 0-based index of the page the question is on.
+    """
+    cached = _section_cache.get(form_url)
+    if cached and time.time() - cached[0] < SECTION_CACHE_TTL:
+        logger.debug("Using the cached multi-section structure of %s", form_url)
+        return copy.deepcopy(cached[1])
+    # answer_plan builds on the helpers of this module, so it is imported here
+    from answer_plan import compile_plan, execute_plan
+
+    logger.debug("Attempting to load form: %s", form_url)
+    try:
+        with span("page_load") as load_span:
+            load_form(driver, form_url)
+        logger.debug("Form page loaded in %.2f seconds.", load_span.duration)
+        wait_for_questions(driver)
+        capture_page_metrics(driver, "extract_load")
+
+        form_elements = []
+        section = 0
+        while True:
+            questions = parse_form_page(driver)
+            for question in questions:
+                question["section"] = section
+            form_elements.extend(questions)
+            if find_next_button(driver) is None:
+                break
+            # Required questions have to be answered before Google lets us see the next section
+            execute_plan(driver, compile_plan(questions, placeholder_answers(questions)))
+            if not go_to_next_section(driver):
+                logger.warning("Could not open section %s; the structure covers %s section(s) only.",
+                               section + 2, section + 1)
+                break
+            section += 1
+            capture_page_metrics(driver, "extract_section")
+
+        logger.info("Detected %s form questions in %s section(s).", len(form_elements), section + 1)
+        if logger.isEnabledFor(logging.DEBUG):
+            for i, elem in enumerate(form_elements):
+                logger.debug("Question %s: '%s' (Type: %s, Section: %s, Identifier: '%s', Options: %s)",
+                             i+1, elem['question'], elem['type'], elem['section'] + 1, elem['identifier'], elem['options'])
+        if section:
+            _section_cache[form_url] = (time.time(), copy.deepcopy(form_elements))
         return form_elements
 
     except TimeoutException:
-        print(f"Error: Timed out waiting for form elements to load at {form_url}")
+        logger.error("Timed out waiting for form elements to load at %s", form_url)
         return None
     except Exception as e:
-        print(f"Error extracting form structure: {e}")
+        logger.error("Error extracting form structure: %s", e)
         return None
 
 # Add helper functions for form filling
-def fill_multiple_choice(driver, xpath_base, answer, q_identifier, options=None):
-    """Helper function to fill multiple choice questions"""
-    print(f"  Handling multiple choice for '{q_identifier}' with answer: '{answer}'")
-    
-    try:
-        # Direct approach - try to find the option with matching text and click it
-        option_xpath = f"{xpath_base}//div[@role='radio']//span[contains(normalize-space(), '{answer}')]/ancestor::div[@role='radio']"
-        
-        try:
-            option_element = WebDriverWait(driver, 3).until(
-                EC.element_to_be_clickable((By.XPATH, option_xpath))
-            )
-            driver.execute_script("arguments[0].click();", option_element)
-            print(f"  Selected option with text: '{answer}'")
-            return True
-        except (TimeoutException, NoSuchElementException):
-            print(f"  Could not find option with exact text: '{answer}'")
-            
-            # Fallback 1: Fuzzy match against available options if provided
-            if options:
-                best_match = None
-                best_score = 0
-                
-                for option in options:
-                    # Simple matching score - can be improved
-                    if answer.lower() in option.lower() or option.lower() in answer.lower():
-                        score = len(set(answer.lower()) & set(option.lower()))
-                        if score > best_score:
-                            best_score = score
-                            best_match = option
-                
-                if best_match:
-                    fuzzy_xpath = f"{xpath_base}//div[@role='radio']//span[contains(normalize-space(), '{best_match}')]/ancestor::div[@role='radio']"
-                    try:
-                        fuzzy_element = WebDriverWait(driver, 3).until(
-                            EC.element_to_be_clickable((By.XPATH, fuzzy_xpath))
-                        )
-                        driver.execute_script("arguments[0].click();", fuzzy_element)
-                        print(f"  Selected best matching option: '{best_match}'")
-                        return True
-                    except (TimeoutException, NoSuchElementException):
-                        print(f"  Could not find fuzzy matched option: '{best_match}'")
-            
-            # Fallback 2: Get all radio buttons and click the first one
-            try:
-                all_options = driver.find_elements(By.XPATH, f"{xpath_base}//div[@role='radio']")
-                if all_options:
-                    # Just click the first one as a last resort
-                    driver.execute_script("arguments[0].click();", all_options[0])
-                    print(f"  Selected first available option as fallback")
-                    return True
-            except Exception as e:
-                print(f"  Failed to select any option: {e}")
-                
-        return False
-    except Exception as e:
-        print(f"  Error in multiple choice handling: {e}")
-        return False
-
-def enhance_linear_scale_support(driver, xpath_base, answer, q_identifier, q_options=None):
-    """Enhanced approach for linear scale/rating questions with endpoint labels support"""
-    print(f"  Handling linear scale/rating with answer: {answer}")
-    
+def xpath_literal(value):
+    """Quote a string for use as an XPath literal, handling embedded quotes."""
+    value = str(value)
+    if "'" not in value:
+        return f"'{value}'"
+    if '"' not in value:
+        return f'"{value}"'
+    parts = value.split("'")
+    return "concat(" + ", \"'\", ".join(f"'{part}'" for part in parts) + ")"
+
+def scale_value(answer, q_options=None):
+    """
+    Map a linear scale answer to its 1-based numeric value: numbers are kept,
+    endpoint labels and rating words are translated; 0 if nothing matches.
+    """
     # Extract endpoint labels if available
     endpoint_labels = {}
     if isinstance(q_options, dict) and "labels" in q_options:
@@ -550,7 +466,7 @@ def enhance_linear_scale_support(driver, xpath_base, answer, q_identifier, q_opt
     try:
         # First try direct conversion to integer
         num_answer = int(answer)
-        print(f"  Input answer '{answer}' is already numeric: {num_answer}")
+        logger.debug("Input answer '%s' is already numeric: %s", answer, num_answer)
     except (ValueError, TypeError):
         num_answer = 0
         # Check if answer matches endpoint labels
@@ -561,7 +477,7 @@ def enhance_linear_scale_support(driver, xpath_base, answer, q_identifier, q_opt
             
             if start_label and start_label in lower_answer:
                 num_answer = 1  # First option
-                print(f"  Mapped endpoint label '{start_label}' to value 1")
+                logger.debug("Mapped endpoint label '%s' to value 1", start_label)
             elif end_label and end_label in lower_answer:
                 # Map to the last option
                 if scale_values and all(str(v).isdigit() for v in scale_values):
@@ -569,7 +485,7 @@ def enhance_linear_scale_support(driver, xpath_base, answer, q_identifier, q_opt
                 else:
                     # Assume 5-point scale as fallback
                     num_answer = 5
-                print(f"  Mapped endpoint label '{end_label}' to value {num_answer}")
+                logger.debug("Mapped endpoint label '%s' to value %s", end_label, num_answer)
             else:
                 # Try to map text ratings to numbers
                 rating_map = {
@@ -583,381 +499,184 @@ def enhance_linear_scale_support(driver, xpath_base, answer, q_identifier, q_opt
                 for text, num in rating_map.items():
                     if text in lower_answer:
                         num_answer = num
-                        print(f"  Mapped text '{answer}' to numeric value {num}")
+                        logger.debug("Mapped text '%s' to numeric value %s", answer, num)
                         break
-    
-    # Direct approach using data-value attribute
+    return num_answer
+
+def load_form(driver, form_url):
+    """Loads the form page and waits until the form is present."""
+    driver.get(form_url)
+    WebDriverWait(driver, 20).until(
+        EC.presence_of_element_located((By.CSS_SELECTOR, FORM_SELECTOR))
+    )
+
+def wait_for_questions(driver, timeout=QUESTION_WAIT_TIME):
+    """Waits until the page has finished loading and shows its questions, at most `timeout` seconds."""
     try:
-        # Find all radio buttons with their data-values
-        radio_elements = driver.find_elements(By.XPATH, f"{xpath_base}//div[@role='radio']")
-        
-        if radio_elements:
-            print(f"  Found {len(radio_elements)} radio buttons")
-            
-            # Try to map using data-value attribute
-            if num_answer > 0 and num_answer <= len(radio_elements):
-                # Try to find button with matching data-value
-                for button in radio_elements:
-                    data_value = button.get_attribute("data-value")
-                    if data_value and int(data_value) == num_answer:
-                        driver.execute_script("arguments[0].click();", button)
-                        print(f"  Selected option with data-value={num_answer}")
-                        return True
-                
-                # If we didn't find by data-value, use position (0-based index)
-                idx = num_answer - 1
-                driver.execute_script("arguments[0].click();", radio_elements[idx])
-                print(f"  Selected option at position {idx+1}")
-                return True
-            else:
-                # If no valid numeric answer, use middle value as default
-                middle_idx = len(radio_elements) // 2
-                driver.execute_script("arguments[0].click();", radio_elements[middle_idx])
-                print(f"  Selected middle option (position {middle_idx+1}) as fallback")
-                return True
-                
-        return False
-    except Exception as e:
-        print(f"  Error in direct data-value approach: {e}")
-        
-        # Traditional approach as fallback
-        js_code = f"""
-        var found = false;
-        var radioButtons = document.querySelectorAll('{xpath_base} div[role="radio"]');
-        
-        if (radioButtons.length > 0) {{
-            var targetIndex = {num_answer - 1};
-            // If we have a valid target index, use it
-            if (targetIndex >= 0 && targetIndex < radioButtons.length) {{
-                radioButtons[targetIndex].click();
-                found = true;
-            }} else {{
-                // Otherwise click the middle option
-                var middleIndex = Math.floor(radioButtons.length / 2);
-                radioButtons[middleIndex].click();
-                found = true;
-            }}
-        }}
-        return found;
-        """
-        
-        if driver.execute_script(js_code):
-            print("  Selected linear scale option via JavaScript")
-            return True
-        
+        WebDriverWait(driver, timeout).until(lambda d: d.execute_script(
+            "return document.readyState === 'complete' && document.querySelector('div[role=\"listitem\"]') !== null"
+        ))
+    except TimeoutException:
+        logger.debug("No question items appeared within %s seconds; parsing the page as it is.", timeout)
+
+def find_next_button(driver):
+    """The "Next" button of the current section, or None on the last section."""
+    buttons = driver.find_elements(By.XPATH, NEXT_BUTTON_XPATH)
+    return buttons[0] if buttons else None
+
+def go_to_next_section(driver):
+    """
+    Clicks "Next" and waits until the next section has replaced the current one.
+    Returns False if there is no next section or it did not appear (for example
+    because a required question was left unanswered).
+    """
+    button = find_next_button(driver)
+    if button is None:
         return False
+    anchors = driver.find_elements(By.CSS_SELECTOR, 'div[role="listitem"]') or \
+        driver.find_elements(By.CSS_SELECTOR, FORM_SELECTOR)
+    with span("section_navigation"):
+        driver.execute_script("arguments[0].click();", button)
+        try:
+            if anchors:
+                WebDriverWait(driver, 20).until(EC.staleness_of(anchors[0]))
+            WebDriverWait(driver, 20).until(EC.presence_of_element_located((By.CSS_SELECTOR, FORM_SELECTOR)))
+        except TimeoutException:
+            logger.error("Timed out waiting for the next section; a required question may be unanswered.")
+            return False
+    wait_for_questions(driver)
+    return True
+
+def split_sections(form_structure):
+    """Groups the questions of a structure by section, in section order."""
+    count = max((q.get("section", 0) for q in form_structure), default=0) + 1
+    sections = [[] for _ in range(count)]
+    for question in form_structure:
+        sections[question.get("section", 0)].append(question)
+    return sections
+
+def placeholder_answers(questions):
+    """Minimal valid answers that get a section past its required questions."""
+    answers = {}
+    for question in questions:
+        q_type, options = question["type"], question.get("options")
+        if isinstance(options, dict) and "values" in options:
+            options = options["values"]
+        if q_type == "text":
+            answers[question["identifier"]] = "placeholder@example.com" if "email" in question["identifier"].lower() else "N/A"
+        elif q_type == "linear_scale":
+            answers[question["identifier"]] = options[len(options) // 2] if options else "3"
+        elif q_type == "multiple_choice" and options:
+            answers[question["identifier"]] = options[0]
+        elif q_type == "dropdown" and options:
+            # The first entry of a dropdown is usually the empty "Choose" prompt
+            answers[question["identifier"]] = options[1] if len(options) > 1 else options[0]
+        elif q_type == "checkbox" and options:
+            answers[question["identifier"]] = options[:1]
+        elif q_type in ("grid", "checkbox_grid") and isinstance(options, dict) and options.get("columns"):
+            answers[question["identifier"]] = {row: options["columns"][0] for row in options.get("rows", [])}
+        elif q_type == "date":
+            answers[question["identifier"]] = "2000-01-01"
+        elif q_type == "time":
+            answers[question["identifier"]] = "12:00"
+    return answers
+
+def question_locators(identifier):
+    """XPaths that find a question's container and its text input by the question text"""
+    escaped_identifier = identifier.replace('"', '\\"')
+    clean_identifier = escaped_identifier.replace("*", "").strip()
+    xpath_base = (
+        f'//div[@role="listitem" or contains(@class, "Qr7Oae") or contains(@class, "freebirdFormviewerComponentsQuestion")]'
+        f'[.//div[@role="heading"][contains(normalize-space(), "{clean_identifier}")] '
+        f'or (.//span[contains(text(), "{clean_identifier}") and not(ancestor::div[contains(@class, "quantumWizTextinputPaperinputMainContent")])]'
+        f'or .//input[@aria-label="{escaped_identifier}"] '
+        f'or .//textarea[@aria-label="{escaped_identifier}"])]'
+    )
+    return {
+        "clean_identifier": clean_identifier,
+        "xpath_base": xpath_base,
+        "text_xpath": f"({xpath_base}//input[@type='text' or @type='email' or @type='url' or @type='number'] | {xpath_base}//textarea)[1]",
+        "text_fallback_xpath": f"//div[contains(., '{clean_identifier}')]//input[@type='text'] | //div[contains(., '{clean_identifier}')]//textarea"
+    }
 
-def fill_form(driver, form_url, form_structure, answers):
-    """Fills and submits the Google Form using Selenium."""
-    print_header("FORM FILLING STARTED", 1)
-    start_time = time.time()
-    
-    try:
-        print(f"Loading form: {form_url}")
-        driver.get(form_url)
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, 'form[action*="formResponse"]'))
-        )
-        print(f"Form loaded in {time.time() - start_time:.2f} seconds")
-        time.sleep(1)
-
-        for question_data in form_structure:
-            question_start_time = time.time()
-            q_identifier = question_data["identifier"]
-            q_type = question_data["type"]
-
-            if q_identifier not in answers:
-                print_header(f"Missing answer for: '{q_identifier}'", 3)
-                continue
-
-            answer = answers[q_identifier]
-            if answer is None or (isinstance(answer, (str, list)) and not answer and q_type != "text"):
-                 print_header(f"Empty answer for: '{q_identifier}'", 3)
-                 continue
-
-            print_header(f"Processing question: '{q_identifier}'", 2)
-            print(f"Type: {q_type}, Answer: '{answer}'")
+def submit_form(driver):
+    """Clicks the submit button of a filled form and checks for confirmation."""
+    submit_button = None
 
-            try:
-                escaped_identifier = q_identifier.replace('"', '\\"')
-                xpath_safe_identifier = escaped_identifier.replace("*", "\\*").replace("[", "\\[").replace("]", "\\]")
-                clean_identifier = escaped_identifier.replace("*", "").strip()
-                
-                xpath_base = (
-                    f'//div[@role="listitem" or contains(@class, "Qr7Oae") or contains(@class, "freebirdFormviewerComponentsQuestion")]'
-                    f'[.//div[@role="heading"][contains(normalize-space(), "{clean_identifier}")] '
-                    f'or (.//span[contains(text(), "{clean_identifier}") and not(ancestor::div[contains(@class, "quantumWizTextinputPaperinputMainContent")])]'
-                    f'or .//input[@aria-label="{escaped_identifier}"] '
-                    f'or .//textarea[@aria-label="{escaped_identifier}"])]'
-                )
-                
-                print(f"  Looking for question with clean identifier: '{clean_identifier}'")
-
-                if q_type == "text":
-                    element_xpath = f"({xpath_base}//input[@type='text' or @type='email' or @type='url' or @type='number'] | {xpath_base}//textarea)[1]"
-                    try:
-                        element = WebDriverWait(driver, 5).until(
-                            EC.visibility_of_element_located((By.XPATH, element_xpath))
-                        )
-                    except TimeoutException:
-                        print(f"  First attempt failed. Trying fallback approach...")
-                        fallback_xpath = f"//div[contains(., '{clean_identifier}')]//input[@type='text'] | //div[contains(., '{clean_identifier}')]//textarea"
-                        element = WebDriverWait(driver, 5).until(
-                            EC.visibility_of_element_located((By.XPATH, fallback_xpath))
-                        )
-                        print(f"  Found input element using fallback approach")
-                    
-                    try:
-                        element.click()
-                        element.clear()
-                        element.send_keys(answer)
-                        print(f"  Filled text field with: '{answer[:50]}...' (via send_keys)")
-                    except Exception as e1:
-                        print(f"  First attempt failed: {e1}")
-                        try:
-                            driver.execute_script("arguments[0].value = arguments[1];", element, answer)
-                            driver.execute_script("arguments[0].dispatchEvent(new Event('input', { bubbles: true }));", element)
-                            print(f"  Filled text field with: '{answer[:50]}...' (via value property)")
-                        except Exception as e2:
-                            print(f"  Second attempt failed: {e2}")
-                            try:
-                                for char in answer:
-                                    element.send_keys(char)
-                                    time.sleep(0.01)
-                                print(f"  Filled text field with: '{answer[:50]}...' (character by character)")
-                            except Exception as e3:
-                                print(f"  All text input methods failed: {e3}")
-                                raise
-
-                elif q_type == "linear_scale":
-                    # Pass the question options to the enhanced function
-                    result = enhance_linear_scale_support(driver, xpath_base, answer, q_identifier, question_data.get('options'))
-                    if not result:
-                        print(f"  WARNING: Failed to select linear scale option for '{q_identifier}'")
-                        try:
-                            # Last attempt - click directly on any radio button in this question
-                            radio_buttons = driver.find_elements(By.XPATH, f"{xpath_base}//div[@role='radio']")
-                            if radio_buttons:
-                                middle_idx = len(radio_buttons) // 2  # Choose middle option as safest
-                                driver.execute_script("arguments[0].click();", radio_buttons[middle_idx])
-                                print(f"  Selected option via direct selector as last resort")
-                                time.sleep(0.5)  # Give it time to register
-                        except Exception as e:
-                            print(f"  Final attempt failed: {e}")
-
-                elif q_type == "multiple_choice":
-                    # Improve multiple_choice handling too, in case some linear scales are classified wrong
-                    try:
-                        # First try: Use our standard multiple choice handler
-                        result = fill_multiple_choice(driver, xpath_base, answer, q_identifier, question_data.get('options'))
-                        
-                        # If it failed and options look numerical, try the linear scale approach as fallback
-                        if not result and question_data.get('options') and any(opt.isdigit() for opt in question_data.get('options')):
-                            print("  First attempt failed. Options look numerical, trying linear scale approach...")
-                            result = enhance_linear_scale_support(driver, xpath_base, answer, q_identifier)
-                            
-                        if not result:
-                            # Last resort: Just click any radio button
-                            radios = driver.find_elements(By.XPATH, f"{xpath_base}//div[@role='radio']")
-                            if radios:
-                                driver.execute_script("arguments[0].click();", radios[0])
-                                print(f"  Selected first radio button as last resort")
-                                time.sleep(0.5)  # Give it time to register
-                    except Exception as e:
-                        print(f"  Error in multiple choice handling: {e}")
-
-                print(f"Question completed in {time.time() - question_start_time:.2f} seconds")
-                time.sleep(0.5)
-
-            except TimeoutException:
-                print_header(f"TIMEOUT on question: '{q_identifier}'", 3)
-                print(f"Error: Timed out trying to find or interact with element for question: '{q_identifier}'. It might not be visible, the identifier might be incorrect, or the page structure is unexpected.")
-            except NoSuchElementException:
-                print_header(f"ELEMENT NOT FOUND: '{q_identifier}'", 3)
-                print(f"Error: Could not find element for question: '{q_identifier}'. The form structure might have changed or the identifier is wrong.")
-            except Exception as e:
-                print_header(f"ERROR on question: '{q_identifier}'", 3)
-                print(f"Error filling question '{q_identifier}': {e}")
-
-        print_header("Searching for submit button", 2)
-        submit_selectors = [
-            '//div[@role="button"][.//span[normalize-space()="Submit"]]',
-            '//button[@type="submit"][contains(normalize-space(), "Submit")]',
-            '//div[@role="button"][contains(@jsname, "OCpkoe")]',
-            'div[role="button"][jsname*="OCpkoe"]',
-            'button[type="submit"]'
-        ]
-        submit_button = None
-        
-        print("Searching for submit button...")
-        for i, selector in enumerate(submit_selectors):
-             try:
-                 finder = By.XPATH if selector.startswith("//") else By.CSS_SELECTOR
-                 print(f"  Trying selector ({'XPath' if finder == By.XPATH else 'CSS'}) #{i+1}: {selector}")
-                 submit_button = WebDriverWait(driver, 5).until(
-                     EC.element_to_be_clickable((finder, selector))
-                 )
-                 print(f"Found submit button using selector #{i+1}.")
-                 break
-             except TimeoutException:
-                 print(f"  Selector #{i+1} timed out.")
-                 continue
-             except NoSuchElementException:
-                 print(f"  Selector #{i+1} not found.")
-                 continue
-             except Exception as e:
-                 print(f"  Error with selector #{i+1}: {e}")
-                 continue
-
-        if submit_button:
-            print_header("Submitting form", 2)
-            try:
-                driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", submit_button)
-                time.sleep(0.5)
-                driver.execute_script("arguments[0].click();", submit_button)
-                print("Submit button clicked.")
-                time.sleep(3)
-
-                confirmation_texts = ["Your response has been recorded", "Submission successful"]
-                page_text = driver.find_element(By.TAG_NAME, 'body').text
-                if any(conf_text in page_text for conf_text in confirmation_texts):
-                    print("Form submission confirmed.")
-                    return True
-                else:
-                     error_elements = driver.find_elements(By.XPATH, '//div[@role="alert" or contains(@id, "error") or contains(@class, "error")]')
-                     if error_elements:
-                         print("Error: Form submission failed. Found validation errors:")
-                         for error in error_elements:
-                             error_text = error.text.strip()
-                             if error_text:
-                                 print(f"  - {error_text}")
-                         return False
-                     else:
-                         print("Warning: Form submitted, but confirmation message not found and no validation errors detected. Assuming success.")
-                         return True
-
-            except Exception as e:
-                print(f"Error clicking submit button or checking confirmation: {e}")
+    try:
+        with span("submit") as submit_span:
+            logger.debug("Searching for submit button...")
+            for i, selector in enumerate(SUBMIT_SELECTORS):
+                try:
+                    finder = By.XPATH if selector.startswith("//") else By.CSS_SELECTOR
+                    logger.debug("Trying selector (%s) #%s: %s", 'XPath' if finder == By.XPATH else 'CSS', i+1, selector)
+                    submit_button = WebDriverWait(driver, 5).until(
+                        EC.element_to_be_clickable((finder, selector))
+                    )
+                    logger.debug("Found submit button using selector #%s.", i+1)
+                    break
+                except TimeoutException:
+                    logger.debug("Selector #%s timed out.", i+1)
+                    continue
+                except NoSuchElementException:
+                    logger.debug("Selector #%s not found.", i+1)
+                    continue
+                except Exception as e:
+                    logger.warning("Error with selector #%s: %s", i+1, e)
+                    continue
+
+            if not submit_button:
+                logger.error("Could not find the submit button after trying all selectors.")
                 return False
+
+            logger.debug("Submitting form")
+            driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", submit_button)
+            time.sleep(0.5)
+            driver.execute_script("arguments[0].click();", submit_button)
+        logger.debug("Submit button clicked after %.2f seconds.", submit_span.duration)
+
+        with span("confirmation"):
+            time.sleep(3)
+            page_text = driver.find_element(By.TAG_NAME, 'body').text
+        if any(conf_text in page_text for conf_text in CONFIRMATION_TEXTS):
+            logger.info("Form submission confirmed.")
+            return True
         else:
-            print_header("SUBMIT BUTTON NOT FOUND", 3)
-            print("Error: Could not find the submit button after trying all selectors.")
-            return False
+             error_elements = driver.find_elements(By.XPATH, ERROR_XPATH)
+             if error_elements:
+                 logger.error("Form submission failed. Found validation errors:")
+                 for error in error_elements:
+                     error_text = error.text.strip()
+                     if error_text:
+                         logger.warning("Validation error: %s", error_text)
+                 return False
+             else:
+                 logger.warning("Form submitted, but confirmation message not found and no validation errors detected. Assuming success.")
+                 return True
 
-    except TimeoutException:
-        print_header("FORM LOAD TIMEOUT", 3)
-        print(f"Error: Timed out waiting for form page elements during filling: {form_url}")
-        return False
     except Exception as e:
-        print_header("UNEXPECTED ERROR", 3)
-        print(f"An unexpected error occurred during form filling: {e}")
+        logger.error("Error clicking submit button or checking confirmation: %s", e)
         return False
-    finally:
-        total_time = time.time() - start_time
-        print_header(f"Form filling completed in {total_time:.2f} seconds", 2)
+
+def fill_form(driver, form_url, form_structure, answers, artifacts=None):
+    """Fills and submits the Google Form by compiling the answers into a plan and replaying it (see answer_plan)."""
+    # answer_plan builds on the helpers of this module, so it is imported here
+    from answer_plan import compile_plan, fill_form_from_plan
+    return fill_form_from_plan(driver, form_url, compile_plan(form_structure, answers, artifacts))
 
 def generate_dynamic_persona(target_audience, variation_index):
     """
     Generate a dynamic persona based on the target audience description
     to provide more varied and realistic form responses.
+    For whole jobs prefer persona_sampler.PopulationSampler, which draws
+    every persona of the job in one batch.
     """
-    # Extract demographic information from target audience
-    audience_lower = target_audience.lower()
-    
-    # Detect age groups
-    age_groups = {
-        "student": ["18-24", "college student", "university student"],
-        "young professional": ["25-34", "young professional", "recent graduate"],
-        "professional": ["35-44", "mid-career", "experienced professional"],
-        "senior professional": ["45-54", "55-64", "senior", "manager", "executive"],
-        "retired": ["65+", "retired", "senior citizen"]
-    }
-    
-    # Detect potential industries or interests
-    industries = {
-        "technology": ["tech", "IT", "software", "developer", "engineer", "programming"],
-        "healthcare": ["medical", "healthcare", "doctor", "nurse", "patient", "hospital"],
-        "education": ["education", "teacher", "professor", "student", "academic"],
-        "business": ["business", "finance", "marketing", "sales", "entrepreneur"],
-        "creative": ["creative", "design", "artist", "writer", "musician"]
-    }
-    
-    # Detect experience levels
-    experience_levels = {
-        "beginner": ["beginner", "novice", "new", "starting", "learning"],
-        "intermediate": ["intermediate", "familiar", "some experience"],
-        "advanced": ["advanced", "expert", "professional", "experienced"]
-    }
-    
-    # Select demographic attributes
-    detected_age = None
-    for age, keywords in age_groups.items():
-        if any(keyword in audience_lower for keyword in keywords):
-            detected_age = age
-            break
-    
-    detected_industry = None
-    for industry, keywords in industries.items():
-        if any(keyword in audience_lower for keyword in keywords):
-            detected_industry = industry
-            break
-    
-    detected_experience = None
-    for level, keywords in experience_levels.items():
-        if any(keyword in audience_lower for keyword in keywords):
-            detected_experience = level
-            break
-    
-    # Apply variations to create diverse personas
-    variations = [
-        {"perspective": "practical", "trait": "pragmatic", "priority": "efficiency and results"},
-        {"perspective": "analytical", "trait": "detail-oriented", "priority": "accuracy and thoroughness"},
-        {"perspective": "innovative", "trait": "creative", "priority": "new ideas and approaches"},
-        {"perspective": "critical", "trait": "skeptical", "priority": "identifying issues and improvements"},
-        {"perspective": "enthusiastic", "trait": "optimistic", "priority": "positive outcomes and opportunities"},
-        {"perspective": "cautious", "trait": "careful", "priority": "minimizing risks and downsides"}
-    ]
-    
-    variation = variations[variation_index % len(variations)]
-    
-    # Build the persona description
-    persona = {
-        "age_group": detected_age or "adult",
-        "industry": detected_industry or "general",
-        "experience": detected_experience or "varied",
-        "perspective": variation["perspective"],
-        "trait": variation["trait"],
-        "priority": variation["priority"]
-    }
-    
-    # Create a detailed persona description
-    persona_description = f"""
-    PERSONA:
-    - You are a {persona['age_group']} with {persona['experience']} experience in the {persona['industry']} field.
-    - You have a {persona['perspective']} perspective and tend to be {persona['trait']}.
-    - You prioritize {persona['priority']} when evaluating options or providing feedback.
-    - Variation #{variation_index+1}: Your responses should reflect this distinct perspective.
-    
-    When generating answers, stay true to this persona's viewpoint and priorities.
-    """
-    
-    return persona_description
+    persona = detect_traits(target_audience).copy()
+    persona.update(PERSONA_VARIATIONS[variation_index % len(PERSONA_VARIATIONS)])
+    return describe_persona(persona, variation_index)
 
-def generate_responses(form_structure, target_audience, variation_index):
-    """
-    Generates responses for the form using the Gemini API.
-    Adds variation based on the variation_index by creating realistic personas.
-    """
-    if not model:
-        print("Error: Gemini model not configured.")
-        return None
-    if not form_structure:
-        print("Error: Cannot generate responses, form structure is empty.")
-        return None
-
-    # Generate a dynamic persona based on target audience
-    persona = generate_dynamic_persona(target_audience, variation_index)
-    
+def build_prompt(form_structure, target_audience, persona, variation_index):
+    """The Gemini prompt asking for one persona's answers to a form"""
     # Standard variations to maintain compatibility with existing code
     variations = [
         "Focus on practical aspects.",
@@ -1005,13 +724,35 @@ def generate_responses(form_structure, target_audience, variation_index):
 
     IMPORTANT: ONLY include fields that are in the form structure above.
     """
+    return prompt
+
+def generate_responses(form_structure, target_audience, variation_index, persona=None):
+    """
+    Generates responses for the form using the Gemini API.
+    Adds variation based on the variation_index by creating realistic personas.
+    A pre-sampled persona description can be passed in to skip persona building.
+    """
+    if not model:
+        logger.error("Gemini model not configured.")
+        return None
+    if not form_structure:
+        logger.error("Cannot generate responses, form structure is empty.")
+        return None
+
+    # Generate a dynamic persona based on target audience unless one was sampled
+    if persona is None:
+        persona = generate_dynamic_persona(target_audience, variation_index)
+    
+    prompt = build_prompt(form_structure, target_audience, persona, variation_index)
 
-    print(f"\n--- Generating Response {variation_index + 1} ---")
-    print(f"Target Audience: {target_audience}")
-    print(f"Using Dynamic Persona:\n{persona}")
+    logger.debug("Generating response %s", variation_index + 1)
+    logger.debug("Target Audience: %s", target_audience)
+    logger.debug("Using Dynamic Persona:\n%s", persona)
 
     try:
-        response = model.generate_content(prompt)
+        with span("llm_call"):
+            response = model.generate_content(prompt)
+        record_llm_usage(prompt, response)
         response_text = response.text.strip()
         if response_text.startswith("```json"):
             response_text = response_text[7:]
@@ -1021,10 +762,9 @@ def generate_responses(form_structure, target_audience, variation_index):
 
         try:
             answers = json.loads(response_text)
-            print("Generated Answers (JSON):")
-            print(json.dumps(answers, indent=2))
+            logger.debug("Generated answers: %s", answers)
             if not isinstance(answers, dict):
-                print("Error: Gemini response is not a valid JSON dictionary.")
+                logger.error("Gemini response is not a valid JSON dictionary.")
                 return None
 
             form_identifiers = {q["identifier"] for q in form_structure}
@@ -1034,9 +774,9 @@ def generate_responses(form_structure, target_audience, variation_index):
             extra_keys = generated_keys - form_identifiers
 
             if missing_keys:
-                print(f"Warning: Gemini response missing answers for identifiers: {missing_keys}")
+                logger.warning("Gemini response missing answers for identifiers: %s", missing_keys)
             if extra_keys:
-                print(f"Warning: Gemini response included unexpected identifiers: {extra_keys}")
+                logger.warning("Gemini response included unexpected identifiers: %s", extra_keys)
 
             # Add validation for rating scales before returning answers
             if isinstance(answers, dict):
@@ -1044,7 +784,7 @@ def generate_responses(form_structure, target_audience, variation_index):
                     if q["type"] == "linear_scale" and q["identifier"] in answers:
                         answer = answers[q["identifier"]]
                         if not str(answer).isdigit():
-                            print(f"Warning: Non-numeric value '{answer}' for linear scale question '{q['identifier']}'")
+                            logger.warning("Non-numeric value '%s' for linear scale question '%s'", answer, q['identifier'])
                             
                             # Extract the scale range
                             scale_options = q.get("options", [])
@@ -1062,104 +802,132 @@ def generate_responses(form_structure, target_audience, variation_index):
                                 numeric_options.sort()
                                 default_value = numeric_options[len(numeric_options) // 2]
                                 answers[q["identifier"]] = str(default_value)
-                                print(f"  Converted to numeric value: {default_value}")
+                                logger.debug("Converted to numeric value: %s", default_value)
                             else:
                                 # Assume a 1-5 scale as a fallback and pick the middle
                                 answers[q["identifier"]] = "3"
-                                print(f"  Assumed 1-5 scale and set default value: 3")
+                                logger.debug("Assumed 1-5 scale and set default value: 3")
                                 
             return answers
         except json.JSONDecodeError as json_err:
-            print(f"Error: Could not decode JSON response from Gemini: {json_err}")
-            print(f"Received text: {response_text}")
+            logger.error("Could not decode JSON response from Gemini: %s", json_err)
+            logger.debug("Received text: %s", response_text)
             return None
 
     except Exception as e:
-        print(f"Error generating responses from Gemini: {e}")
+        logger.error("Error generating responses from Gemini: %s", e)
         if "API key not valid" in str(e):
-            print("Please ensure your API key is correct and valid.")
+            logger.error("Please ensure your API key is correct and valid.")
         try:
             if response and hasattr(response, 'prompt_feedback'):
-                 print(f"Prompt Feedback: {response.prompt_feedback}")
+                 logger.debug("Prompt Feedback: %s", response.prompt_feedback)
         except Exception:
              pass
 
         return None
 
 # --- Main Execution ---
-def main():
-    print_header("AI GOOGLE FORM FILLER", 1)
-    print("Disclaimer: Use responsibly and ethically. Automating form submissions may violate terms of service.")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate and submit AI responses to a Google Form, asking for the details interactively.")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"Write a cProfile dump and Chrome page metrics of the run to {JOB_STORE_DIR}/cli-<time>.*")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    logger.info("AI Google Form Filler")
+    logger.info("Disclaimer: Use responsibly and ethically. Automating form submissions may violate terms of service.")
 
     form_url = input("Enter the Google Form link: ")
     target_audience = input("Enter the target audience description: ")
     try:
         num_responses = int(input("Enter the number of responses to generate: "))
         if num_responses <= 0:
-            print("Number of responses must be positive.")
+            logger.error("Number of responses must be positive.")
             return
     except ValueError:
-        print("Invalid number. Please enter an integer.")
+        logger.error("Invalid number. Please enter an integer.")
         return
 
     if not API_KEY or not model:
-        print("Exiting due to missing API key or Gemini model configuration error.")
+        logger.error("Exiting due to missing API key or Gemini model configuration error.")
         return
 
     # Try Chrome first, fall back to Edge if needed
-    driver = setup_driver("chrome")
+    profiles = default_profiles()
+    profile_dir = profiles.claim() if profiles else None
+    driver = setup_driver("chrome", profile_dir)
     if not driver:
-        print("Chrome WebDriver setup failed, trying Edge...")
-        driver = setup_driver("edge")
+        logger.warning("Chrome WebDriver setup failed, trying Edge...")
+        driver = setup_driver("edge", profile_dir)
         
     if not driver:
-        print("Exiting due to WebDriver setup failure.")
+        logger.error("Exiting due to WebDriver setup failure.")
+        if profile_dir:
+            profiles.release(profile_dir)
         return
 
     form_structure = None
+    breaker = CircuitBreaker()
+    profiler = None
+    if args.profile:
+        os.makedirs(JOB_STORE_DIR, exist_ok=True)
+        profiler = JobProfiler(f"cli-{time.strftime('%Y%m%d-%H%M%S')}", JOB_STORE_DIR)
 
     try:
-        print_header("Starting Response Generation and Submission", 1)
+        logger.info("Starting response generation and submission")
         successful_submissions = 0
-        for i in range(num_responses):
-            print_header(f"Processing Submission {i + 1} of {num_responses}", 2)
-
-            print("Extracting form structure...")
-            form_structure = extract_form_structure(driver, form_url)
-            if not form_structure:
-                print(f"Could not extract form structure for submission {i + 1}. Skipping.")
-                time.sleep(5)
-                continue
-
-            answers = generate_responses(form_structure, target_audience, i)
-            if not answers:
-                print(f"Failed to generate answers for submission {i + 1}. Skipping.")
-                time.sleep(5)
-                continue
-
-            if fill_form(driver, form_url, form_structure, answers):
-                successful_submissions += 1
-                print(f"Submission {i + 1} completed successfully.")
-            else:
-                print(f"Submission {i + 1} failed.")
-                time.sleep(10)
+        with profiler or nullcontext():
+            for i in range(num_responses):
+                with log_context(submission=i + 1):
+                    if not breaker.allow(form_url):
+                        circuit = breaker.status(form_url)
+                        logger.error("The form keeps failing (%s); skipping the remaining %s submission(s).",
+                                     circuit["last_kind"], num_responses - i)
+                        break
+                    logger.info("Processing Submission %s of %s", i + 1, num_responses)
+
+                    logger.debug("Extracting form structure...")
+                    form_structure = extract_form_structure(driver, form_url)
+                    if not form_structure:
+                        logger.warning("Could not extract form structure for submission %s. Skipping.", i + 1)
+                        breaker.record_failure(form_url, classify_failure(driver, TIMEOUT if form_structure is None else PARSE_FAILURE))
+                        time.sleep(5)
+                        continue
+
+                    answers = generate_responses(form_structure, target_audience, i)
+                    if not answers:
+                        logger.warning("Failed to generate answers for submission %s. Skipping.", i + 1)
+                        time.sleep(5)
+                        continue
+
+                    if fill_form(driver, form_url, form_structure, answers):
+                        successful_submissions += 1
+                        breaker.record_success(form_url)
+                        logger.info("Submission %s completed successfully.", i + 1)
+                    else:
+                        logger.warning("Submission %s failed.", i + 1)
+                        breaker.record_failure(form_url, classify_failure(driver, FILL_FAILURE))
+                        time.sleep(10)
 
-            wait_time = 5
-            print(f"Waiting for {wait_time} seconds before next submission...")
-            time.sleep(wait_time)
+                    wait_time = 5
+                    logger.info("Waiting for %s seconds before next submission...", wait_time)
+                    time.sleep(wait_time)
 
-        print_header("Finished", 1)
-        print(f"Successfully submitted {successful_submissions} out of {num_responses} requested responses.")
+        logger.info("Finished")
+        logger.info("Successfully submitted %s out of %s requested responses.", successful_submissions, num_responses)
 
     except KeyboardInterrupt:
-         print_header("Process interrupted by user", 3)
+         logger.warning("Process interrupted by user")
     except Exception as e:
-         print_header("Unexpected error in main loop", 3)
-         print(f"\nAn unexpected error occurred in the main loop: {e}")
+         logger.error("An unexpected error occurred in the main loop: %s", e)
     finally:
         if driver:
             driver.quit()
-            print("WebDriver closed.")
+            logger.debug("WebDriver closed.")
+        if profile_dir:
+            profiles.release(profile_dir)
+        if profiler and profiler.artifacts():
+            logger.info("Profile written to %s", profiler.summary_path)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
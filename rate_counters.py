@@ -0,0 +1,152 @@
+"""
+Rate counter module for the Google Form Filler.
+Keeps per-key submission counts for rolling minute and hour windows and the
+current calendar day in memory, so quota checks never have to touch disk.
+New counts are handed to a sink in the background for persistence.
+"""
+
+import threading
+import time
+from array import array
+from log_config import get_logger
+
+logger = get_logger(__name__)
+
+# Window name -> (bucket span in seconds, number of buckets)
+WINDOWS = {
+    "minute": (1, 60),
+    "hour": (60, 60),
+    "day": (86400, 1)
+}
+
+
+def _local_offset(now):
+    """Seconds east of UTC at `now`, so day buckets follow the local calendar day"""
+    return time.localtime(now).tm_gmtoff
+
+
+class _Ring:
+    __slots__ = ("span", "counts", "epochs", "local")
+
+    def __init__(self, span, size, local=False):
+        self.span = span
+        self.counts = array('q', [0] * size)
+        self.epochs = array('q', [-1] * size)
+        self.local = local
+
+    def epoch(self, now):
+        if self.local:
+            now += _local_offset(now)
+        return int(now // self.span)
+
+    def add(self, now, amount):
+        epoch = self.epoch(now)
+        i = epoch % len(self.counts)
+        if self.epochs[i] != epoch:
+            self.epochs[i] = epoch
+            self.counts[i] = 0
+        self.counts[i] += amount
+        return epoch
+
+    def total(self, now):
+        oldest = self.epoch(now) - len(self.counts) + 1
+        return sum(count for count, epoch in zip(self.counts, self.epochs) if epoch >= oldest)
+
+    def expired(self, now):
+        return max(self.epochs) < self.epoch(now) - len(self.counts) + 1
+
+
+class WindowCounter:
+    __slots__ = ("rings", "last_update")
+
+    def __init__(self):
+        self.rings = {name: _Ring(span, size, local=(name == "day")) for name, (span, size) in WINDOWS.items()}
+        self.last_update = 0.0
+
+
+class RateCounters:
+    def __init__(self, sink=None, flush_interval=10.0):
+        """
+        sink: called from the flusher with {(key, minute_epoch): amount} of the
+        counts added since the last flush; may be None for purely in-memory use.
+        """
+        self.sink = sink
+        self.flush_interval = flush_interval
+        self._counters = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, key, amount=1, now=None):
+        """Count `amount` events for a key"""
+        now = time.time() if now is None else now
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None:
+                counter = self._counters[key] = WindowCounter()
+            for name, ring in counter.rings.items():
+                epoch = ring.add(now, amount)
+                if name == "hour":
+                    self._pending[(key, epoch)] = self._pending.get((key, epoch), 0) + amount
+            counter.last_update = now
+
+    def seed(self, key, window, amount, now=None):
+        """Load a persisted count into one window without scheduling it for flushing"""
+        now = time.time() if now is None else now
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None:
+                counter = self._counters[key] = WindowCounter()
+            counter.rings[window].add(now, amount)
+            counter.last_update = max(counter.last_update, now)
+
+    def total(self, key, window, now=None):
+        """Number of events for a key in the given window ("minute", "hour" or "day")"""
+        now = time.time() if now is None else now
+        with self._lock:
+            counter = self._counters.get(key)
+            return counter.rings[window].total(now) if counter else 0
+
+    def prune(self, now=None):
+        """Drop keys whose every window has expired. Returns the number of keys dropped."""
+        now = time.time() if now is None else now
+        with self._lock:
+            stale = [key for key, counter in self._counters.items()
+                     if all(ring.expired(now) for ring in counter.rings.values())]
+            for key in stale:
+                del self._counters[key]
+        return len(stale)
+
+    def flush(self):
+        """Hand the counts added since the last flush to the sink"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if pending and self.sink:
+            try:
+                self.sink(pending)
+            except Exception as e:
+                logger.error("Error flushing rate counters: %s", e)
+                # Put the counts back so they are retried on the next flush
+                with self._lock:
+                    for bucket, amount in pending.items():
+                        self._pending[bucket] = self._pending.get(bucket, 0) + amount
+
+    def start(self):
+        """Start the background flush/prune thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="rate-counter-flush", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background thread after a final flush"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+            self.prune()
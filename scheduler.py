@@ -0,0 +1,160 @@
+"""
+Scheduling module for the Google Form Filler.
+Shares the driver pool between jobs one submission at a time. Before each
+submission a job asks for a lease; waiting leases are granted in strict
+order of priority class and, within a class, by weighted fair queuing over
+tenants (users, or whoever submitted a batch job), so one big job cannot
+starve the small ones queued behind it:
+
+    with scheduler.lease(tenant="127.0.0.1", priority="interactive") as driver:
+        job.run_submission(driver, i)
+
+Queue wait time and per-tenant throughput are available from stats().
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from metrics import Histogram, Span
+from log_config import get_logger
+
+logger = get_logger(__name__)
+
+# Priority classes, highest first; a waiting lease of a higher class always goes first
+PRIORITY_CLASSES = ("interactive", "batch", "background")
+DEFAULT_PRIORITY = "batch"
+
+# Completed submissions are kept this long for the throughput figures
+THROUGHPUT_WINDOW = 3600
+
+
+class _Tenant:
+    __slots__ = ("finish", "waiting", "running", "completed", "wait", "recent")
+
+    def __init__(self):
+        self.finish = 0.0
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.wait = Histogram()
+        self.recent = deque()
+
+
+class FairScheduler:
+    def __init__(self, pool):
+        """Grant leases on the drivers of `pool`, at most pool.size at a time"""
+        self.pool = pool
+        self._free = pool.size
+        self._queue = []
+        self._virtual_time = {name: 0.0 for name in PRIORITY_CLASSES}
+        self._tenants = {}
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+
+    def _tenant(self, name):
+        tenant = self._tenants.get(name)
+        if tenant is None:
+            tenant = self._tenants[name] = _Tenant()
+        return tenant
+
+    def _enqueue(self, tenant_name, priority, weight):
+        """Queue a lease request and return its (rank, finish tag, sequence) entry"""
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority class '{priority}'; use one of {', '.join(PRIORITY_CLASSES)}")
+        if weight <= 0:
+            raise ValueError("Scheduling weight must be positive")
+        with self._cond:
+            tenant = self._tenant(tenant_name)
+            # A tenant that was idle starts at the current virtual time instead of catching up
+            start = max(self._virtual_time[priority], tenant.finish)
+            tenant.finish = start + 1.0 / weight
+            tenant.waiting += 1
+            entry = (PRIORITY_CLASSES.index(priority), tenant.finish, next(self._sequence))
+            heapq.heappush(self._queue, entry)
+            return entry, start
+
+    def _grant(self, entry, start, tenant_name, priority):
+        """Block until the entry is at the head of the queue and a driver slot is free"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._free > 0 and self._queue[0] == entry)
+            heapq.heappop(self._queue)
+            self._free -= 1
+            self._virtual_time[priority] = max(self._virtual_time[priority], start)
+            tenant = self._tenants[tenant_name]
+            tenant.waiting -= 1
+            tenant.running += 1
+            # Wake the waiter that is now at the head, if a slot is still free
+            self._cond.notify_all()
+
+    def _done(self, tenant_name, completed):
+        with self._cond:
+            self._free += 1
+            tenant = self._tenants[tenant_name]
+            tenant.running -= 1
+            if completed:
+                now = time.time()
+                tenant.completed += 1
+                tenant.recent.append(now)
+                while tenant.recent and tenant.recent[0] < now - THROUGHPUT_WINDOW:
+                    tenant.recent.popleft()
+            self._cond.notify_all()
+
+    @contextmanager
+    def lease(self, tenant="default", priority=DEFAULT_PRIORITY, weight=1.0):
+        """
+        Wait for this tenant's turn, then yield a pooled driver for one submission.
+        A driver that raised is replaced. Raises RuntimeError if no driver can be set up.
+        """
+        entry, start = self._enqueue(tenant, priority, weight)
+        wait_span = Span("queue_wait", priority=priority).start()
+        try:
+            self._grant(entry, start, tenant, priority)
+        except BaseException:
+            with self._cond:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._tenants[tenant].waiting -= 1
+                self._cond.notify_all()
+            raise
+        waited = wait_span.end()
+        with self._cond:
+            self._tenants[tenant].wait.observe(waited)
+
+        driver = self.pool.acquire()
+        if not driver:
+            self._done(tenant, completed=False)
+            raise RuntimeError("Failed to set up WebDriver.")
+        broken = False
+        try:
+            yield driver
+        except Exception:
+            broken = True
+            raise
+        finally:
+            self.pool.release(driver, broken)
+            self._done(tenant, completed=not broken)
+
+    def stats(self):
+        """Queue length and, per tenant, queued/running leases, wait percentiles and throughput"""
+        now = time.time()
+        with self._cond:
+            tenants = {}
+            for name, tenant in self._tenants.items():
+                while tenant.recent and tenant.recent[0] < now - THROUGHPUT_WINDOW:
+                    tenant.recent.popleft()
+                tenants[name] = {
+                    "waiting": tenant.waiting,
+                    "running": tenant.running,
+                    "completed": tenant.completed,
+                    "wait_p50": tenant.wait.percentile(50),
+                    "wait_p95": tenant.wait.percentile(95),
+                    "per_minute": sum(1 for t in tenant.recent if t >= now - 60),
+                    "per_hour": len(tenant.recent)
+                }
+            return {"queued": len(self._queue), "free_drivers": self._free, "tenants": tenants}
+
+    def close(self):
+        self.pool.close()
@@ -0,0 +1,157 @@
+"""
+Schema store module for the Google Form Filler.
+Keeps every version of each form's parsed structure and the artifacts
+derived from it per question: compiled locators and option resolution
+indexes. When a form is edited, the new structure is diffed against the
+previous version question by question and only the changed and added
+questions are recompiled; unchanged questions keep their artifacts, and
+journaled answers to them stay valid.
+
+Versions are appended to <root>/<form key>.versions.jsonl, one JSON line
+per distinct structure; compiled artifacts live in memory.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from config import SCHEMA_STORE_DIR
+from job_journal import schema_hash
+from option_index import compile_indexes
+from proto1 import question_locators
+from log_config import get_logger
+
+logger = get_logger(__name__)
+
+
+def form_key(form_url):
+    """File-system safe key of a form URL"""
+    return hashlib.sha256(form_url.encode("utf-8")).hexdigest()[:16]
+
+
+def question_hash(question):
+    """Stable hash of one parsed question"""
+    payload = json.dumps(question, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def diff_structures(old, new):
+    """
+    Compare two parsed structures question by question (matched by identifier).
+    Returns {"added", "removed", "changed", "unchanged"}, lists of identifiers.
+    """
+    old_hashes = {q["identifier"]: question_hash(q) for q in old}
+    diff = {"added": [], "removed": [], "changed": [], "unchanged": []}
+    for question in new:
+        identifier = question["identifier"]
+        if identifier not in old_hashes:
+            diff["added"].append(identifier)
+        elif old_hashes[identifier] == question_hash(question):
+            diff["unchanged"].append(identifier)
+        else:
+            diff["changed"].append(identifier)
+    new_identifiers = {q["identifier"] for q in new}
+    diff["removed"] = [identifier for identifier in old_hashes if identifier not in new_identifiers]
+    return diff
+
+
+def compile_question(question, q_hash=None):
+    """The derived artifacts of one question"""
+    return {
+        "hash": q_hash or question_hash(question),
+        "locators": question_locators(question["identifier"]),
+        "indexes": compile_indexes(question)
+    }
+
+
+class SchemaStore:
+    def __init__(self, root=SCHEMA_STORE_DIR):
+        """Versioned form structures with their compiled per-question artifacts"""
+        self.root = root
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._artifacts = {}
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, form_url):
+        return os.path.join(self.root, f"{form_key(form_url)}.versions.jsonl")
+
+    def versions(self, form_url):
+        """Every stored version of a form, oldest first"""
+        with self._lock:
+            return list(self._load(form_url))
+
+    def _load(self, form_url):
+        versions = self._versions.get(form_url)
+        if versions is None:
+            versions = []
+            if os.path.exists(self._path(form_url)):
+                with open(self._path(form_url), 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            versions.append(json.loads(line))
+                        except json.JSONDecodeError:
+                            continue
+            self._versions[form_url] = versions
+        return versions
+
+    def get(self, form_url, structure_hash):
+        """The stored version of a form with the given schema hash, or None"""
+        with self._lock:
+            for version in reversed(self._load(form_url)):
+                if version["schema_hash"] == structure_hash:
+                    return version
+        return None
+
+    def diff(self, form_url, old_hash, new_hash):
+        """Per-question diff between two stored versions of a form, or None if either is unknown"""
+        old, new = self.get(form_url, old_hash), self.get(form_url, new_hash)
+        if old is None or new is None:
+            return None
+        return diff_structures(old["structure"], new["structure"])
+
+    def update(self, form_url, structure):
+        """
+        Record a freshly parsed structure and return its version record plus the
+        artifacts of every question. A structure that differs from the latest
+        version is stored as a new version with its diff, and only its changed
+        and added questions are compiled.
+        """
+        structure_hash = schema_hash(structure)
+        with self._lock:
+            versions = self._load(form_url)
+            latest = versions[-1] if versions else None
+            if latest is None or latest["schema_hash"] != structure_hash:
+                diff = diff_structures(latest["structure"], structure) if latest else None
+                latest = {
+                    "version": len(versions) + 1,
+                    "schema_hash": structure_hash,
+                    "timestamp": time.time(),
+                    "diff": diff,
+                    "structure": structure
+                }
+                versions.append(latest)
+                with open(self._path(form_url), 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(latest, ensure_ascii=False) + "\n")
+                if diff:
+                    logger.info("Form changed (version %s): %s added, %s changed, %s removed, %s unchanged",
+                                latest["version"], len(diff["added"]), len(diff["changed"]),
+                                len(diff["removed"]), len(diff["unchanged"]))
+
+            cached = self._artifacts.get(form_url, {})
+            artifacts = {}
+            compiled = 0
+            for question in structure:
+                identifier = question["identifier"]
+                q_hash = question_hash(question)
+                previous = cached.get(identifier)
+                if previous is not None and previous["hash"] == q_hash:
+                    artifacts[identifier] = previous
+                else:
+                    artifacts[identifier] = compile_question(question, q_hash)
+                    compiled += 1
+            self._artifacts[form_url] = artifacts
+        if compiled:
+            logger.debug("Compiled artifacts for %s of %s question(s)", compiled, len(structure))
+        return latest, artifacts
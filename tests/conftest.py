@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def form_structure():
+    """A parsed form with one question of every type"""
+    return [
+        {"question": "Full name", "identifier": "Full name", "type": "text", "options": [], "required": True},
+        {"question": "Which device do you use most?", "identifier": "Which device do you use most?",
+         "type": "multiple_choice", "options": ["Laptop", "Phone", "Tablet", "Desktop computer"], "required": False},
+        {"question": "How likely are you to recommend us?", "identifier": "How likely are you to recommend us?",
+         "type": "linear_scale", "required": False,
+         "options": {"values": ["1", "2", "3", "4", "5"], "labels": {"start": "Not likely", "end": "Very likely"}}},
+        {"question": "Which features do you use?", "identifier": "Which features do you use?", "type": "checkbox",
+         "options": ["Reports", "Dashboards", "Alerts", "API access"], "required": False},
+        {"question": "Occupation", "identifier": "Occupation", "type": "dropdown",
+         "options": ["Choose", "Student", "Employed", "Self-employed", "Retired"], "required": False},
+        {"question": "Rate each aspect", "identifier": "Rate each aspect", "type": "grid", "required": False,
+         "options": {"rows": ["Speed", "Reliability"], "columns": ["Poor", "Fair", "Good"]}},
+        {"question": "Any other comments?", "identifier": "Any other comments?", "type": "text", "options": [],
+         "required": False}
+    ]
@@ -0,0 +1,183 @@
+import json
+
+import pytest
+
+import answer_plan
+from answer_plan import PLAN_VERSION, compile_plan, dry_run_plan, load_plans, save_plans
+from job_journal import schema_hash
+
+DEVICE = "Which device do you use most?"
+SCALE = "How likely are you to recommend us?"
+FEATURES = "Which features do you use?"
+GRID = "Rate each aspect"
+
+
+ANSWERS = {
+    "Full name": "Ada Lovelace",
+    DEVICE: "phone",
+    SCALE: "Very likely",
+    FEATURES: ["alerts", "api"],
+    "Occupation": "Student",
+    GRID: {"Speed": "Good", "reliability": "fair"}
+}
+
+
+def test_compiles_one_action_per_supported_question(form_structure):
+    plan = compile_plan(form_structure, ANSWERS)
+    assert plan["version"] == PLAN_VERSION
+    assert plan["schema_hash"] == schema_hash(form_structure)
+    assert plan["sections"] == 1
+    assert [(a["question"], a["op"]) for a in plan["actions"]] == [
+        ("Full name", "type"), (DEVICE, "click"), (SCALE, "click"),
+        (FEATURES, "steps"), ("Occupation", "steps"), (GRID, "steps")
+    ]
+    assert all(action["section"] == 0 for action in plan["actions"])
+
+
+def test_actions_carry_resolved_answers_and_targets(form_structure):
+    text, choice, scale = compile_plan(form_structure, ANSWERS)["actions"][:3]
+    assert text["value"] == text["answer"] == "Ada Lovelace"
+    assert choice["answer"] == "Phone"
+    assert "@data-value='Phone'" in choice["targets"][0]
+    assert choice["fallback"]["pick"] == "first"
+    # The end label of the scale maps to its last value
+    assert scale["value"] == 5
+    assert "@data-value='5'" in scale["targets"][0]
+    assert scale["fallback"]["pick"] == "middle"
+
+
+def _action(plan, question):
+    return next(action for action in plan["actions"] if action["question"] == question)
+
+
+def test_checkbox_checks_each_resolved_option(form_structure):
+    action = _action(compile_plan(form_structure, ANSWERS), FEATURES)
+    assert action["answer"] == ["Alerts", "API access"]
+    assert [step["op"] for step in action["steps"]] == ["check", "check"]
+    assert "@data-answer-value='Alerts'" in action["steps"][0]["targets"][0]
+    assert "@aria-label='API access'" in action["steps"][1]["targets"][0]
+    assert action["fallback"]["pick"] == "first"
+
+
+def test_dropdown_opens_the_list_then_picks_the_option(form_structure):
+    action = _action(compile_plan(form_structure, ANSWERS), "Occupation")
+    open_list, pick = action["steps"]
+    assert "@role='listbox'" in open_list["targets"][0]
+    assert pick["op"] == "click"
+    assert "@role='option'][@data-value='Student'" in pick["targets"][0]
+
+
+def test_grid_checks_one_cell_per_row(form_structure):
+    action = _action(compile_plan(form_structure, ANSWERS), GRID)
+    assert action["answer"] == {"Speed": "Good", "Reliability": "Fair"}
+    speed, reliability = action["steps"]
+    assert "@aria-label='Speed'" in speed["targets"][0] and "@data-value='Good'" in speed["targets"][0]
+    assert "normalize-space(th)='Reliability'" in reliability["targets"][1]
+    assert "@role='radio'" in reliability["targets"][1]
+
+
+def test_date_and_time_answers_are_typed_as_iso_values():
+    form_structure = [
+        {"question": "Start date", "identifier": "Start date", "type": "date", "options": [], "required": True},
+        {"question": "Start time", "identifier": "Start time", "type": "time", "options": [], "required": True}
+    ]
+    plan = compile_plan(form_structure, {"Start date": "March 5, 2024", "Start time": "2:30 PM"})
+    date, time = plan["actions"]
+    assert (date["op"], date["value"]) == ("type", "2024-03-05")
+    assert "@type='date'" in date["targets"][0]
+    assert (time["op"], time["value"]) == ("type", "14:30")
+    assert "@type='time'" in time["targets"][0]
+    # Answers in no known format are typed as given
+    plan = compile_plan(form_structure, {"Start date": "next Monday"})
+    assert plan["actions"][0]["value"] == "next Monday"
+
+
+def test_skips_missing_and_unsupported_questions(form_structure):
+    form_structure.append({"question": "Upload your CV", "identifier": "Upload your CV", "type": "file_upload",
+                           "options": [], "required": False})
+    plan = compile_plan(form_structure, dict(ANSWERS, **{"Upload your CV": "cv.pdf"}))
+    assert {s["question"]: s["reason"] for s in plan["skipped"]} == {
+        "Any other comments?": "missing",
+        "Upload your CV": "unsupported"
+    }
+
+
+def test_reports_unresolved_answers(form_structure):
+    plan = compile_plan(form_structure, {DEVICE: "spaceship"})
+    assert plan["unresolved"] == [[DEVICE, "spaceship"]]
+
+
+def test_plans_round_trip_through_jsonl(form_structure, tmp_path):
+    plan = compile_plan(form_structure, ANSWERS)
+    path = tmp_path / "plans.jsonl"
+    save_plans(path, [plan, plan])
+    assert load_plans(path) == [json.loads(json.dumps(plan))] * 2
+
+
+def test_sections_come_from_the_structure(form_structure):
+    for question in form_structure[3:]:
+        question["section"] = 1
+    plan = compile_plan(form_structure, ANSWERS)
+    assert plan["sections"] == 2
+    assert [s["section"] for s in plan["skipped"] if s["question"] == "Any other comments?"] == [1]
+
+
+class ReadBackDriver:
+    """Answers the read-back script with the given values per question; nothing else is driven"""
+
+    def __init__(self, values):
+        self.values = values
+        self.scripts = 0
+
+    def execute_script(self, script, identifiers):
+        self.scripts += 1
+        return [self.values.get(identifier, {"found": False}) for identifier in identifiers]
+
+
+@pytest.fixture
+def offline_page(monkeypatch):
+    """Replay plans without a browser: every action succeeds instantly"""
+    monkeypatch.setattr(answer_plan, "load_form", lambda driver, form_url: None)
+    monkeypatch.setattr(answer_plan, "wait_for_questions", lambda driver: None)
+    monkeypatch.setattr(answer_plan, "go_to_next_section", lambda driver: True)
+    monkeypatch.setattr(answer_plan, "capture_page_metrics", lambda driver, label: None)
+    monkeypatch.setattr(answer_plan, "run_action", lambda driver, action: "filled")
+    monkeypatch.setattr(answer_plan, "ACTION_SETTLE_TIME", 0)
+    monkeypatch.setattr(answer_plan.time, "sleep", lambda seconds: None)
+
+
+def test_dry_run_reads_every_field_back(form_structure, offline_page):
+    plan = compile_plan(form_structure, ANSWERS)
+    driver = ReadBackDriver({
+        "Full name": {"found": True, "text": "Ada Lovelace"},
+        DEVICE: {"found": True, "radios": ["Tablet"]},
+        SCALE: {"found": True, "radios": ["5"]},
+        FEATURES: {"found": True, "checkboxes": ["Alerts", "API access"]},
+        "Occupation": {"found": True, "dropdown": "Student"}
+    })
+    report = dry_run_plan(driver, "https://example.com/form", plan)
+    assert report["error"] is None
+    assert driver.scripts == 1
+    assert (report["verified"], report["mismatched"]) == (4, 1)
+    entries = {entry["identifier"]: entry for entry in report["questions"]}
+    assert entries["Full name"]["matched"] is True
+    assert entries[DEVICE]["matched"] is False
+    assert entries[DEVICE]["expected"] == "Phone"
+    # Scale answers are compared by the point they map to
+    assert entries[SCALE]["expected"] == 5
+    assert entries[SCALE]["matched"] is True
+    # Grids are filled, but not read back
+    assert entries[GRID]["matched"] is None
+    assert entries["Any other comments?"]["status"] == "missing"
+    assert entries["Any other comments?"]["matched"] is None
+
+
+def test_dry_run_reads_each_section_back(form_structure, offline_page):
+    for question in form_structure[3:]:
+        question["section"] = 1
+    plan = compile_plan(form_structure, ANSWERS)
+    driver = ReadBackDriver({"Full name": {"found": True, "text": "Ada Lovelace"}})
+    report = dry_run_plan(driver, "https://example.com/form", plan)
+    assert report["error"] is None
+    assert driver.scripts == 2
+    assert len(report["questions"]) == len(form_structure)
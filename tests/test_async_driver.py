@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+import async_driver
+from async_driver import SUBMISSION_RESULT_JS, extract_form_structure_async, submit_form_async
+
+FORM_URL = "https://docs.google.com/forms/d/e/test/viewform"
+
+
+class ConnectionClosed(Exception):
+    """Stands in for websockets.ConnectionClosed, which is not a CDPError"""
+
+
+class OfflinePage:
+    """A one-section form page; `failure` is raised while it is parsed"""
+
+    def __init__(self, failure=None):
+        self.failure = failure
+
+    async def evaluate(self, expression):
+        return False
+
+
+@pytest.fixture
+def offline_parse(monkeypatch):
+    async def load_form(page, form_url):
+        pass
+
+    async def parse_page(page):
+        if page.failure:
+            raise page.failure
+        return [{"question": "Full name", "identifier": "Full name", "type": "text", "options": [],
+                 "required": True}]
+
+    monkeypatch.setattr(async_driver, "load_form_async", load_form)
+    monkeypatch.setattr(async_driver, "parse_form_page_async", parse_page)
+
+
+def test_extract_failures_stay_with_their_page(offline_parse):
+    async def extract_all():
+        pages = [OfflinePage(ConnectionClosed("no close frame")), OfflinePage(ValueError("bad markup")),
+                 OfflinePage()]
+        return await asyncio.gather(*(extract_form_structure_async(page, "https://example.com/form")
+                                      for page in pages))
+
+    lost, unparsable, structure = asyncio.run(extract_all())
+    assert lost is None and unparsable is None
+    assert [(q["question"], q["section"]) for q in structure] == [("Full name", 0)]
+
+
+class SubmitPage:
+    """A form page whose submit click leads to `outcome` without ever loading a new document"""
+
+    def __init__(self, outcome, network_settles=True):
+        self.outcome = dict({"confirmed": False, "errors": [], "url": FORM_URL}, **outcome)
+        self.network_settles = network_settles
+
+    def expect_load(self):
+        pass
+
+    async def wait_for(self, expression, timeout):
+        return True
+
+    async def wait_for_load(self):
+        raise asyncio.TimeoutError
+
+    async def wait_for_network_idle(self):
+        if not self.network_settles:
+            raise asyncio.TimeoutError
+
+    async def evaluate(self, expression):
+        if expression == "location.href":
+            return FORM_URL
+        return self.outcome if expression == SUBMISSION_RESULT_JS else True
+
+
+@pytest.mark.parametrize("outcome, network_settles, expected", [
+    ({"confirmed": True}, False, True),
+    ({"errors": ["This is a required question"]}, False, False),
+    ({"url": "https://docs.google.com/forms/d/e/test/formResponse"}, False, True),
+    ({}, False, None),
+    ({}, True, True)
+])
+def test_submit_reports_what_the_page_shows(outcome, network_settles, expected):
+    assert asyncio.run(submit_form_async(SubmitPage(outcome, network_settles))) is expected
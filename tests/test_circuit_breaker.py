@@ -0,0 +1,42 @@
+import pytest
+
+from circuit_breaker import (
+    CLOSED, OPEN, HALF_OPEN, TIMEOUT, FILL_FAILURE, CLOSED_FORM, CircuitBreaker
+)
+
+FORM = "https://docs.google.com/forms/d/e/test/viewform"
+THRESHOLDS = {TIMEOUT: 3, FILL_FAILURE: 5, CLOSED_FORM: 1}
+
+
+@pytest.fixture
+def breaker(tmp_path):
+    return CircuitBreaker(str(tmp_path / "breaker.db"), thresholds=THRESHOLDS, cooldown=60)
+
+
+def test_opens_after_the_threshold_of_one_kind(breaker):
+    assert [breaker.record_failure(FORM, TIMEOUT) for _ in range(3)] == [CLOSED, CLOSED, OPEN]
+    assert not breaker.allow(FORM)
+    assert breaker.status(FORM)["failures"] == 3
+
+
+def test_failures_of_mixed_kinds_are_counted_per_kind(breaker):
+    # A fill failure between the timeouts starts their count again
+    for kind in (TIMEOUT, TIMEOUT, FILL_FAILURE, TIMEOUT, TIMEOUT):
+        assert breaker.record_failure(FORM, kind) == CLOSED
+    circuit = breaker.status(FORM)
+    assert (circuit["failures"], circuit["last_kind"]) == (2, TIMEOUT)
+    assert breaker.record_failure(FORM, TIMEOUT) == OPEN
+
+
+def test_success_closes_and_failed_probe_reopens(breaker, monkeypatch):
+    assert breaker.record_failure(FORM, CLOSED_FORM) == OPEN
+    assert breaker.status(FORM)["retry_at"] is not None
+    # Once the cooldown has passed, one probe gets through
+    monkeypatch.setattr(breaker, "cooldown", 0)
+    assert breaker.allow(FORM)
+    assert breaker.status(FORM)["state"] == HALF_OPEN
+    assert breaker.record_failure(FORM, TIMEOUT) == OPEN
+    assert breaker.allow(FORM)
+    breaker.record_success(FORM)
+    assert breaker.status(FORM)["state"] == CLOSED
+    assert breaker.status(FORM)["failures"] == 0
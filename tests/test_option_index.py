@@ -0,0 +1,61 @@
+from option_index import OptionIndex, compile_indexes, resolve_answers
+
+DEVICE = "Which device do you use most?"
+FEATURES = "Which features do you use?"
+GRID = "Rate each aspect"
+
+
+def test_resolves_choice_answers_to_options(form_structure):
+    answers = {
+        "Full name": "Ada",
+        DEVICE: "laptop",
+        FEATURES: ["reports", "api"],
+        "Occupation": "self employed",
+        GRID: {"speed": "good", "reliability": "fair"}
+    }
+    resolved, unresolved = resolve_answers(form_structure, answers)
+    assert resolved == {
+        "Full name": "Ada",
+        DEVICE: "Laptop",
+        FEATURES: ["Reports", "API access"],
+        "Occupation": "Self-employed",
+        GRID: {"Speed": "Good", "Reliability": "Fair"}
+    }
+    assert unresolved == []
+
+
+def test_keeps_unmatched_answers_and_reports_them(form_structure):
+    answers = {DEVICE: "spaceship", FEATURES: ["alerts", "teleporter"]}
+    resolved, unresolved = resolve_answers(form_structure, answers)
+    assert resolved[DEVICE] == "spaceship"
+    assert resolved[FEATURES] == ["Alerts"]
+    assert unresolved == [(DEVICE, "spaceship"), (FEATURES, "teleporter")]
+
+
+def test_does_not_modify_the_given_answers(form_structure):
+    answers = {DEVICE: "phone"}
+    resolve_answers(form_structure, answers)
+    assert answers == {DEVICE: "phone"}
+
+
+def test_precompiled_indexes_give_the_same_result(form_structure):
+    answers = {DEVICE: "desktop", GRID: {"reliability": "poor"}}
+    artifacts = {q["identifier"]: {"indexes": compile_indexes(q)} for q in form_structure}
+    assert resolve_answers(form_structure, answers, artifacts) == resolve_answers(form_structure, answers)
+
+
+def test_matches_whole_words_only():
+    # "no" is a substring of "none", but not one of its words
+    assert OptionIndex(["Yes", "No"]).resolve("None")[0] is None
+    assert OptionIndex(["Yes", "No"]).resolve("no") == ("No", 1.0)
+
+
+def test_negated_and_intensified_options_are_different_options():
+    index = OptionIndex(["Satisfied", "Very dissatisfied", "Neutral"])
+    # "satisfied" is a substring of "dissatisfied", but the meaning is the opposite
+    assert index.resolve("dissatisfied")[0] == "Very dissatisfied"
+    assert index.resolve("not satisfied")[0] != "Satisfied"
+    index = OptionIndex(["Very satisfied", "Satisfied", "Dissatisfied", "Very dissatisfied"])
+    assert index.resolve("not satisfied")[0] == "Dissatisfied"
+    assert index.resolve("satisfied")[0] == "Satisfied"
+    assert index.resolve("very dissatisfied")[0] == "Very dissatisfied"
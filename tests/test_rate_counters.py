@@ -0,0 +1,69 @@
+from rate_counters import RateCounters
+
+NOW = 1_700_000_000.0
+
+
+def test_windows_roll_over():
+    counters = RateCounters()
+    counters.add("user:a", now=NOW)
+    counters.add("user:a", 2, now=NOW + 30)
+    assert counters.total("user:a", "minute", now=NOW + 30) == 3
+    assert counters.total("user:a", "minute", now=NOW + 65) == 2
+    assert counters.total("user:a", "minute", now=NOW + 95) == 0
+    assert counters.total("user:a", "hour", now=NOW + 95) == 3
+    assert counters.total("user:a", "hour", now=NOW + 3700) == 0
+    assert counters.total("user:b", "hour", now=NOW) == 0
+
+
+def test_seeded_counts_are_counted_but_not_flushed():
+    flushed = []
+    counters = RateCounters(sink=flushed.append)
+    counters.seed("form:x", "day", 5, now=NOW)
+    counters.add("form:x", now=NOW)
+    assert counters.total("form:x", "day", now=NOW) == 6
+    counters.flush()
+    assert flushed == [{("form:x", int(NOW // 60)): 1}]
+
+
+def test_flush_hands_over_pending_counts_once():
+    flushed = []
+    counters = RateCounters(sink=flushed.append)
+    counters.add("user:a", now=NOW)
+    counters.add("user:a", now=NOW + 1)
+    counters.add("user:b", now=NOW + 61)
+    counters.flush()
+    counters.flush()
+    assert flushed == [{("user:a", int(NOW // 60)): 2, ("user:b", int((NOW + 61) // 60)): 1}]
+
+
+def test_failed_flush_is_retried():
+    calls = []
+
+    def sink(pending):
+        calls.append(dict(pending))
+        if len(calls) == 1:
+            raise OSError("disk full")
+
+    counters = RateCounters(sink=sink)
+    counters.add("user:a", now=NOW)
+    counters.flush()
+    counters.add("user:a", now=NOW)
+    counters.flush()
+    assert calls[1] == {("user:a", int(NOW // 60)): 2}
+
+
+def test_prune_drops_expired_keys():
+    counters = RateCounters()
+    counters.add("user:old", now=NOW)
+    counters.add("user:new", now=NOW + 2 * 86400)
+    assert counters.prune(now=NOW + 2 * 86400) == 1
+    assert counters.total("user:new", "day", now=NOW + 2 * 86400) == 1
+
+
+def test_background_thread_flushes_on_stop():
+    flushed = []
+    counters = RateCounters(sink=flushed.append, flush_interval=60)
+    counters.start()
+    counters.add("user:a", now=NOW)
+    counters.stop()
+    assert flushed == [{("user:a", int(NOW // 60)): 1}]
@@ -0,0 +1,105 @@
+import threading
+import time
+
+import pytest
+
+from scheduler import FairScheduler
+
+
+class FakePool:
+    def __init__(self, size=1, fail=False):
+        self.size = size
+        self.fail = fail
+        self.released = []
+
+    def acquire(self):
+        return None if self.fail else object()
+
+    def release(self, driver, broken=False):
+        self.released.append(broken)
+
+    def close(self):
+        pass
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def run_queued(scheduler, requests):
+    """
+    Queue (tenant, priority) lease requests one by one behind a held lease,
+    then let them run. Returns the tenants in the order they got their lease.
+    """
+    order = []
+
+    def submit(tenant, priority):
+        with scheduler.lease(tenant, priority):
+            order.append(tenant)
+
+    threads = []
+    with scheduler.lease("blocker"):
+        for n, (tenant, priority) in enumerate(requests, 1):
+            thread = threading.Thread(target=submit, args=(tenant, priority))
+            thread.start()
+            threads.append(thread)
+            wait_until(lambda: scheduler.stats()["queued"] == n)
+    for thread in threads:
+        thread.join(5)
+    return order
+
+
+def test_small_tenant_is_not_starved_by_a_big_one():
+    scheduler = FairScheduler(FakePool())
+    order = run_queued(scheduler, [("big", "batch")] * 3 + [("small", "batch")])
+    assert order == ["big", "small", "big", "big"]
+
+
+def test_higher_priority_class_goes_first():
+    scheduler = FairScheduler(FakePool())
+    order = run_queued(scheduler, [("a", "background"), ("b", "batch"), ("c", "interactive")])
+    assert order == ["c", "b", "a"]
+
+
+def test_stats_count_completed_leases():
+    scheduler = FairScheduler(FakePool(size=2))
+    for _ in range(3):
+        with scheduler.lease("tenant"):
+            pass
+    stats = scheduler.stats()
+    assert stats["queued"] == 0
+    assert stats["free_drivers"] == 2
+    assert stats["tenants"]["tenant"]["completed"] == 3
+    assert stats["tenants"]["tenant"]["per_minute"] == 3
+
+
+def test_driver_that_raised_is_released_as_broken():
+    pool = FakePool()
+    scheduler = FairScheduler(pool)
+    with pytest.raises(ValueError):
+        with scheduler.lease("tenant"):
+            raise ValueError("boom")
+    assert pool.released == [True]
+    assert scheduler.stats()["tenants"]["tenant"]["completed"] == 0
+    assert scheduler.stats()["free_drivers"] == 1
+
+
+def test_failed_driver_setup_frees_the_slot():
+    scheduler = FairScheduler(FakePool(fail=True))
+    with pytest.raises(RuntimeError):
+        with scheduler.lease("tenant"):
+            pass
+    assert scheduler.stats()["free_drivers"] == 1
+
+
+def test_rejects_unknown_priority_and_bad_weight():
+    scheduler = FairScheduler(FakePool())
+    with pytest.raises(ValueError):
+        with scheduler.lease("tenant", priority="urgent"):
+            pass
+    with pytest.raises(ValueError):
+        with scheduler.lease("tenant", weight=0):
+            pass
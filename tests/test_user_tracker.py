@@ -0,0 +1,155 @@
+import hashlib
+import json
+import threading
+from datetime import datetime
+
+import pytest
+
+import user_tracker
+from config import MAX_RESPONSES_PER_USER
+from user_tracker import QuotaExceededError, UserTracker, iter_json_items
+
+IP, AGENT, FORM = "10.0.0.1", "pytest-agent", "https://docs.google.com/forms/d/e/test/viewform"
+
+
+@pytest.fixture
+def legacy_files(tmp_path, monkeypatch):
+    """Point the tracker's legacy JSON files at (not yet existing) temp files"""
+    usage_log, user_db = tmp_path / "usage_log.json", tmp_path / "user_database.json"
+    monkeypatch.setattr(user_tracker, "USAGE_LOG_PATH", str(usage_log))
+    monkeypatch.setattr(user_tracker, "USER_DB_PATH", str(user_db))
+    return usage_log, user_db
+
+
+@pytest.fixture
+def tracker(tmp_path, legacy_files):
+    tracker = UserTracker(str(tmp_path / "usage.db"))
+    yield tracker
+    tracker.close()
+
+
+def test_iter_json_items_streams_arrays_and_objects(tmp_path):
+    items = [{"text": "a, b ] }" * 20, "n": n, "nested": [1, {"x": "y"}]} for n in range(50)]
+    array_path, object_path = tmp_path / "array.json", tmp_path / "object.json"
+    array_path.write_text(json.dumps(items, indent=2), encoding="utf-8")
+    object_path.write_text(json.dumps({str(n): item for n, item in enumerate(items)}), encoding="utf-8")
+    # A small chunk size makes items straddle the read buffer
+    assert list(iter_json_items(array_path, chunk_size=16)) == items
+    assert list(iter_json_items(object_path, chunk_size=16)) == [(str(n), item) for n, item in enumerate(items)]
+
+
+def test_iter_json_items_handles_empty_containers(tmp_path):
+    path = tmp_path / "empty.json"
+    path.write_text("[ ]", encoding="utf-8")
+    assert list(iter_json_items(path)) == []
+
+
+def test_json_migration_round_trip(tmp_path, legacy_files):
+    usage_log, user_db = legacy_files
+    now = datetime.now()
+    today = now.strftime("%Y-%m-%d")
+    user_key = f"{IP}_{AGENT[:20]}"
+    usage_log.write_text(json.dumps([
+        {"timestamp": now.strftime("%Y-%m-%d %H:%M:%S"), "ip": IP, "user_agent": AGENT,
+         "form_url": FORM, "requested": 3, "successful": 2},
+        {"timestamp": now.timestamp(), "user_id_hash": "hashed-user", "form_url_hash": "hashed-form",
+         "responses_requested": 1, "responses_successful": 1}
+    ]), encoding="utf-8")
+    user_db.write_text(json.dumps({
+        user_key: {"daily_submissions": {today: 2}, "last_activity": today}
+    }), encoding="utf-8")
+
+    db_path = str(tmp_path / "usage.db")
+    tracker = UserTracker(db_path)
+    try:
+        conn = tracker._connect()
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("SELECT user_key, form_url, requested, successful FROM usage ORDER BY id").fetchall() == [
+            (user_key, FORM, 3, 2), ("hashed-user", "hashed-form", 1, 1)
+        ]
+        assert conn.execute("SELECT count FROM user_daily WHERE user_key = ? AND day = ?",
+                            (user_key, today)).fetchone() == (2,)
+        assert conn.execute("SELECT last_activity FROM users WHERE user_key = ?", (user_key,)).fetchone() == (today,)
+        assert tracker.get_remaining_submissions(IP, AGENT) == MAX_RESPONSES_PER_USER - 2
+    finally:
+        tracker.close()
+
+    # The migration runs once; reopening the database does not import the files again
+    tracker = UserTracker(db_path)
+    try:
+        assert tracker._connect().execute("SELECT COUNT(*) FROM usage").fetchone() == (2,)
+    finally:
+        tracker.close()
+
+
+def test_hashed_legacy_entries_map_to_one_user(tmp_path, legacy_files):
+    usage_log, user_db = legacy_files
+    full_hash = "e95f6917f32bf4cafb02396be66ee41a"
+    form_hash = hashlib.md5(FORM.encode()).hexdigest()[:8]
+    now = datetime.now().timestamp()
+    # The usage log of this format has truncated hashes; the user database has the full ones
+    usage_log.write_text(json.dumps([
+        {"timestamp": now - 60, "user_id_hash": full_hash[:8], "form_url_hash": form_hash,
+         "responses_requested": 3, "responses_successful": 2},
+        {"timestamp": now, "user_id_hash": full_hash[:8], "form_url_hash": form_hash,
+         "responses_requested": 1, "responses_successful": 1}
+    ]), encoding="utf-8")
+    user_db.write_text(json.dumps({full_hash: {"first_seen": now - 60, "usage": [
+        {"timestamp": now - 60, "form_url": FORM, "responses_requested": 3, "responses_successful": 2},
+        {"timestamp": now, "form_url": FORM, "responses_requested": 1, "responses_successful": 1}
+    ]}}), encoding="utf-8")
+
+    tracker = UserTracker(str(tmp_path / "usage.db"))
+    try:
+        conn = tracker._connect()
+        assert conn.execute("SELECT user_key FROM users").fetchall() == [(full_hash,)]
+        assert conn.execute("SELECT DISTINCT user_key, form_url FROM usage").fetchall() == [(full_hash, FORM)]
+        assert tracker.get_form_submissions_today(FORM) == 3
+    finally:
+        tracker.close()
+
+
+def test_concurrent_reservations_never_exceed_the_quota(tracker):
+    granted, refused = [], []
+    barrier = threading.Barrier(8)
+
+    def reserve():
+        barrier.wait()
+        try:
+            granted.append(tracker.reserve_quota(IP, AGENT, FORM, 3)[1])
+        except QuotaExceededError:
+            refused.append(True)
+
+    threads = [threading.Thread(target=reserve) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(granted) == MAX_RESPONSES_PER_USER
+    assert len(granted) + len(refused) == 8
+    assert tracker.get_remaining_submissions(IP, AGENT) == 0
+
+
+def test_consume_and_release_reservation(tracker):
+    reservation_id, granted = tracker.reserve_quota(IP, AGENT, FORM, 4)
+    assert granted == 4
+    assert tracker.get_remaining_submissions(IP, AGENT) == MAX_RESPONSES_PER_USER - 4
+
+    assert tracker.consume_reservation(reservation_id, True, stages={"fill": 1.5})
+    assert tracker.consume_reservation(reservation_id, False, failure_reason="fill_failed")
+    # One success is used, two units are still held
+    assert tracker.get_remaining_submissions(IP, AGENT) == MAX_RESPONSES_PER_USER - 3
+    assert tracker.get_form_submissions_today(FORM) == 1
+
+    tracker.release_reservation(reservation_id)
+    assert tracker.get_remaining_submissions(IP, AGENT) == MAX_RESPONSES_PER_USER - 1
+    assert not tracker.consume_reservation(reservation_id, True)
+    rows = tracker._connect().execute("SELECT successful, failure_reason FROM usage ORDER BY id").fetchall()
+    assert rows == [(1, None), (0, "fill_failed")]
+
+
+def test_reservations_count_against_later_ones(tracker):
+    tracker.reserve_quota(IP, AGENT, FORM, MAX_RESPONSES_PER_USER - 1)
+    assert tracker.reserve_quota(IP, AGENT, FORM, 5)[1] == 1
+    with pytest.raises(QuotaExceededError):
+        tracker.reserve_quota(IP, AGENT, FORM, 1)
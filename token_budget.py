@@ -0,0 +1,223 @@
+"""
+Token budget module for the Google Form Filler.
+Bounds what one job may spend on Gemini calls. Before a job generates
+anything its per-response cost is estimated from the parsed form (the real
+prompt plus an output allowance per question) and scaled by a calibration
+factor learnt from earlier jobs; jobs that cannot afford any response are
+rejected and the rest are downsized to what the budget covers. While the job
+runs, the usage reported by the model is charged to the budget and the job
+stops before a generation it can no longer afford.
+
+Estimates and actuals are kept per job in SQLite so the calibration keeps
+improving:
+
+    with use_budget(budget):
+        answers = generate_responses(...)
+"""
+
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from config import JOB_TOKEN_BUDGET, TOKEN_DB_PATH, CHARS_PER_TOKEN
+from log_config import get_logger
+
+logger = get_logger(__name__)
+
+# Output tokens allowed per answered question, on top of its identifier
+OUTPUT_TOKENS = {
+    "text": 40, "multiple_choice": 12, "dropdown": 12, "checkbox": 20,
+    "linear_scale": 6, "date": 8, "time": 6
+}
+GRID_ROW_TOKENS = 12
+DEFAULT_OUTPUT_TOKENS = 20
+RESPONSE_OVERHEAD_TOKENS = 20  # Braces, code fences and the like
+
+# Calibration uses this many of the latest jobs with recorded usage,
+# and the factor stays within these bounds
+CALIBRATION_JOBS = 50
+CALIBRATION_BOUNDS = (0.5, 4.0)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS token_usage (
+    job_id TEXT PRIMARY KEY,
+    form_url TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    questions INTEGER NOT NULL,
+    responses INTEGER NOT NULL,
+    budget INTEGER NOT NULL,
+    raw_estimate INTEGER NOT NULL,
+    estimate INTEGER NOT NULL,
+    calls INTEGER NOT NULL DEFAULT 0,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    output_tokens INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS token_usage_form ON token_usage (form_url, timestamp);
+"""
+
+_active_budget = ContextVar("token_budget", default=None)
+
+
+class TokenBudgetExceededError(Exception):
+    """Raised when a job cannot afford a single response within its token budget"""
+
+
+def estimate_output_tokens(form_structure):
+    """Tokens the model is expected to write when answering every question once"""
+    tokens = RESPONSE_OVERHEAD_TOKENS
+    for question in form_structure:
+        tokens += len(question.get("identifier", "")) // CHARS_PER_TOKEN + 2
+        if question["type"] in ("grid", "checkbox_grid"):
+            rows = question["options"].get("rows", []) if isinstance(question["options"], dict) else []
+            tokens += GRID_ROW_TOKENS * max(len(rows), 1)
+        else:
+            tokens += OUTPUT_TOKENS.get(question["type"], DEFAULT_OUTPUT_TOKENS)
+    return tokens
+
+
+def estimate_response_tokens(prompt, form_structure):
+    """Uncalibrated token cost of one generation: the prompt plus the expected answer"""
+    return len(prompt) // CHARS_PER_TOKEN + estimate_output_tokens(form_structure)
+
+
+class TokenBudget:
+    def __init__(self, limit, per_response, used=0, calls=0):
+        """
+        A job's token allowance. per_response is the calibrated estimate of one
+        generation; once calls have been charged their average is used instead.
+        """
+        self.limit = limit
+        self.per_response = per_response
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.used = used
+        self.calls = calls
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self):
+        return max(self.limit - self.used, 0)
+
+    @property
+    def next_cost(self):
+        """Expected cost of the next generation"""
+        if self.calls:
+            return max(self.per_response, self.used // self.calls)
+        return self.per_response
+
+    def affordable(self):
+        """How many more generations the remaining budget covers"""
+        return self.remaining // self.next_cost if self.next_cost else 0
+
+    def can_afford(self):
+        return self.affordable() > 0
+
+    def charge(self, prompt_tokens, output_tokens):
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.output_tokens += output_tokens
+            self.used += prompt_tokens + output_tokens
+            self.calls += 1
+
+
+@contextmanager
+def use_budget(budget):
+    """Charge the Gemini calls made in this context to `budget`"""
+    token = _active_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _active_budget.reset(token)
+
+
+def record_llm_usage(prompt, response):
+    """
+    Charge a model response to the active budget, if any. Uses the response's
+    usage_metadata, or a character-based estimate when the model reports none.
+    """
+    budget = _active_budget.get()
+    if budget is None:
+        return
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", None)
+    output_tokens = getattr(usage, "candidates_token_count", None)
+    if prompt_tokens is None:
+        prompt_tokens = len(prompt) // CHARS_PER_TOKEN
+    if output_tokens is None:
+        try:
+            output_tokens = len(response.text) // CHARS_PER_TOKEN
+        except Exception:
+            output_tokens = 0
+    budget.charge(prompt_tokens, output_tokens)
+
+
+class TokenLedger:
+    def __init__(self, db_path=TOKEN_DB_PATH):
+        """Per-job token estimates and actual usage, used to calibrate new estimates"""
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """A short-lived connection that commits on success"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def calibration(self):
+        """Ratio of actual to estimated tokens per call over the latest jobs"""
+        with self._connect() as conn:
+            actual, estimated = conn.execute(
+                "SELECT SUM(prompt_tokens + output_tokens), SUM(raw_estimate * calls) FROM "
+                "(SELECT * FROM token_usage WHERE calls > 0 ORDER BY timestamp DESC LIMIT ?)",
+                (CALIBRATION_JOBS,)
+            ).fetchone()
+        if not actual or not estimated:
+            return 1.0
+        low, high = CALIBRATION_BOUNDS
+        return min(max(actual / estimated, low), high)
+
+    def form_estimate(self, form_url):
+        """The calibrated per-response estimate of the latest job on a form, or None"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT raw_estimate FROM token_usage WHERE form_url = ? ORDER BY timestamp DESC LIMIT 1",
+                (form_url,)
+            ).fetchone()
+        return round(row[0] * self.calibration()) if row else None
+
+    def open_budget(self, job_id, form_url, form_structure, prompt, responses, limit=JOB_TOKEN_BUDGET):
+        """
+        Estimate a job from its parsed form and a sample prompt and return its
+        TokenBudget. A resumed job keeps the usage it already recorded.
+        """
+        raw_estimate = estimate_response_tokens(prompt, form_structure)
+        estimate = max(round(raw_estimate * self.calibration()), 1)
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT calls, prompt_tokens, output_tokens FROM token_usage WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            calls, prompt_tokens, output_tokens = row or (0, 0, 0)
+            conn.execute(
+                "INSERT OR REPLACE INTO token_usage (job_id, form_url, timestamp, questions, responses, budget, "
+                "raw_estimate, estimate, calls, prompt_tokens, output_tokens) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, form_url, time.time(), len(form_structure), responses, limit,
+                 raw_estimate, estimate, calls, prompt_tokens, output_tokens)
+            )
+        budget = TokenBudget(limit, estimate, used=prompt_tokens + output_tokens, calls=calls)
+        budget.prompt_tokens, budget.output_tokens = prompt_tokens, output_tokens
+        return budget
+
+    def record(self, job_id, budget):
+        """Store a job's actual usage so far"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE token_usage SET calls = ?, prompt_tokens = ?, output_tokens = ? WHERE job_id = ?",
+                (budget.calls, budget.prompt_tokens, budget.output_tokens, job_id)
+            )
@@ -1,119 +1,513 @@
 """
 User tracking module for the Google Form Filler.
 Tracks usage limits per user/IP address.
+
+Usage is stored in SQLite (WAL mode): an append-only usage table plus
+indexed (user, day) and (form, day) counters, so recording and checking
+usage cost the same regardless of how much history has accumulated.
+Quota checks are answered from in-memory rate counters that are seeded from
+the database at startup and flushed back to it in the background.
 """
 
+import hashlib
 import json
 import os
+import sqlite3
+import threading
 import time
+import uuid
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from config import USER_DB_PATH, USAGE_LOG_PATH, MAX_RESPONSES_PER_USER, MAX_RESPONSES_PER_FORM
+from config import (
+    TRACKER_DB_PATH, USER_DB_PATH, USAGE_LOG_PATH,
+    MAX_RESPONSES_PER_USER, MAX_RESPONSES_PER_FORM,
+    RESERVATION_TTL, RATE_FLUSH_INTERVAL, TRACKER_RETENTION_DAYS
+)
+from rate_counters import RateCounters
+from log_config import get_logger
+from analytics import ANALYTICS_SCHEMA, record_usage_rollups, get_summary, get_form_summaries
+
+logger = get_logger(__name__)
+
+# How often the background flusher also prunes old rows
+PRUNE_INTERVAL = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    day TEXT NOT NULL,
+    user_key TEXT NOT NULL,
+    form_url TEXT NOT NULL,
+    requested INTEGER NOT NULL,
+    successful INTEGER NOT NULL,
+    failure_reason TEXT,
+    stages TEXT
+);
+CREATE TABLE IF NOT EXISTS user_daily (
+    user_key TEXT NOT NULL,
+    day TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (user_key, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS form_daily (
+    form_url TEXT NOT NULL,
+    day TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (form_url, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS users (
+    user_key TEXT PRIMARY KEY,
+    first_seen REAL NOT NULL,
+    last_activity TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS reservations (
+    id TEXT PRIMARY KEY,
+    user_key TEXT NOT NULL,
+    form_url TEXT NOT NULL,
+    day TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    expires REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS reservations_user ON reservations (user_key, day);
+CREATE INDEX IF NOT EXISTS reservations_form ON reservations (form_url, day);
+CREATE TABLE IF NOT EXISTS rate_buckets (
+    key TEXT NOT NULL,
+    minute INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (key, minute)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+) WITHOUT ROWID;
+"""
+
+def iter_json_items(path, chunk_size=64 * 1024):
+    """
+    Stream the items of a top-level JSON array (yielding values) or object
+    (yielding (key, value) pairs) without loading the whole file.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ""
+        pos = 0
+        eof = False
+
+        def fill():
+            nonlocal buffer, pos, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+        def skip(chars):
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in chars:
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    return
+                fill()
+
+        def decode():
+            nonlocal pos
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buffer, pos)
+                    # A number cut off by the chunk boundary may continue in the next chunk
+                    if eof or (end < len(buffer) and buffer[end] in ",]}: \t\r\n"):
+                        pos = end
+                        return value
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                fill()
+
+        skip(" \t\r\n")
+        if pos >= len(buffer):
+            return
+        container = buffer[pos]
+        if container not in "[{":
+            raise ValueError(f"{path} does not contain a JSON array or object")
+        pos += 1
+        closing = "]" if container == "[" else "}"
+
+        while True:
+            skip(" \t\r\n,")
+            if pos >= len(buffer) or buffer[pos] == closing:
+                return
+            if container == "[":
+                yield decode()
+            else:
+                key = decode()
+                skip(" \t\r\n:")
+                yield key, decode()
+
+
+class QuotaExceededError(Exception):
+    """Raised when a job cannot reserve any of the submissions it asked for"""
+
+
+def _day_of(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d")
+
+
+def _parse_timestamp(value):
+    """Accept both float timestamps and the 'YYYY-MM-DD HH:MM:SS' strings the app used to write"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.strptime(value, "%Y-%m-%d %H:%M:%S").timestamp()
+
 
 class UserTracker:
-    def __init__(self):
-        """Initialize the user tracker with database paths"""
-        self.user_db_path = USER_DB_PATH if 'USER_DB_PATH' in globals() else "user_database.json"
-        self.usage_log_path = USAGE_LOG_PATH if 'USAGE_LOG_PATH' in globals() else "usage_log.json"
-        self._load_data()
-    
-    def _load_data(self):
-        """Load user data from JSON files or initialize if not exists"""
-        # Load user database
-        if os.path.exists(self.user_db_path):
-            try:
-                with open(self.user_db_path, 'r') as f:
-                    self.user_data = json.load(f)
-            except json.JSONDecodeError:
-                self.user_data = {}
-        else:
-            self.user_data = {}
-        
-        # Load usage logs
-        if os.path.exists(self.usage_log_path):
-            try:
-                with open(self.usage_log_path, 'r') as f:
-                    self.usage_logs = json.load(f)
-            except json.JSONDecodeError:
-                self.usage_logs = []
-        else:
-            self.usage_logs = []
-    
-    def _save_data(self):
-        """Save user data to JSON files"""
-        # Make sure directory exists
-        os.makedirs(os.path.dirname(self.user_db_path), exist_ok=True)
-        os.makedirs(os.path.dirname(self.usage_log_path), exist_ok=True)
-        
-        # Save user database
-        with open(self.user_db_path, 'w') as f:
-            json.dump(self.user_data, f, indent=2)
-        
-        # Save usage logs
-        with open(self.usage_log_path, 'w') as f:
-            json.dump(self.usage_logs, f, indent=2)
-    
+    def __init__(self, db_path=TRACKER_DB_PATH):
+        """Initialize the user tracker and migrate the old JSON files on first use"""
+        self.db_path = db_path
+        self.user_db_path = USER_DB_PATH
+        self.usage_log_path = USAGE_LOG_PATH
+        self._local = threading.local()
+
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.executescript(ANALYTICS_SCHEMA)
+        self._upgrade_schema()
+        self._migrate_json()
+
+        # Reservations made through this tracker: id -> [user_key, form_url, amount, expires, day]
+        self._reservations = {}
+        self._reservations_lock = threading.Lock()
+        self._last_prune = 0.0
+        self.counters = RateCounters(sink=self._flush_rate_buckets, flush_interval=RATE_FLUSH_INTERVAL)
+        self._seed_counters()
+        self.counters.start()
+
+    def close(self):
+        """Flush the rate counters and stop the background flusher"""
+        self.counters.stop()
+
+    def _connect(self):
+        """Get this thread's database connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Run a write transaction. BEGIN IMMEDIATE takes SQLite's write lock up
+        front, which serializes quota checks across threads and processes.
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _upgrade_schema(self):
+        """Add the columns that databases created by older versions lack"""
+        conn = self._connect()
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(usage)")}
+        for column in ("failure_reason", "stages"):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE usage ADD COLUMN {column} TEXT")
+
+    def _migrate_json(self):
+        """
+        One-time streaming import of usage_log.json and user_database.json.
+        Runs in a single transaction so an interrupted migration is simply redone.
+        """
+        conn = self._connect()
+        if conn.execute("SELECT value FROM meta WHERE key = 'json_migrated'").fetchone():
+            return
+
+        migrated = 0
+        with self._transaction() as conn:
+            # Another process may have finished the migration while we waited for the lock
+            if conn.execute("SELECT value FROM meta WHERE key = 'json_migrated'").fetchone():
+                return
+
+            if os.path.exists(self.usage_log_path):
+                user_keys, form_urls = self._legacy_hash_lookup()
+                # The usage log has every recorded event, so the daily counters are rebuilt from it
+                for entry in iter_json_items(self.usage_log_path):
+                    if "user_id_hash" in entry:
+                        user_key = user_keys.get(entry["user_id_hash"], entry["user_id_hash"])
+                        form_hash = entry.get("form_url_hash", "")
+                        form_url = form_urls.get(form_hash, form_hash)
+                        requested = entry.get("responses_requested", 0)
+                        successful = entry.get("responses_successful", 0)
+                    else:
+                        user_key = self.get_user_key(entry.get("ip", ""), entry.get("user_agent", ""))
+                        form_url = entry.get("form_url", "")
+                        requested = entry.get("requested", 0)
+                        successful = entry.get("successful", 0)
+                    self._insert_usage(conn, _parse_timestamp(entry["timestamp"]), user_key,
+                                       form_url, requested, successful)
+                    migrated += 1
+
+            if os.path.exists(self.user_db_path):
+                # The user database only adds first-seen/last-activity information
+                for user_key, data in iter_json_items(self.user_db_path):
+                    if "first_seen" in data:
+                        first_seen = float(data["first_seen"])
+                        last_activity = _day_of(max([u["timestamp"] for u in data.get("usage", [])] or [first_seen]))
+                    else:
+                        days = sorted(data.get("daily_submissions", {})) or [data.get("last_activity", self.get_today_date())]
+                        first_seen = datetime.strptime(days[0], "%Y-%m-%d").timestamp()
+                        last_activity = data.get("last_activity", days[-1])
+                    conn.execute(
+                        "INSERT INTO users (user_key, first_seen, last_activity) VALUES (?, ?, ?) "
+                        "ON CONFLICT(user_key) DO UPDATE SET first_seen = MIN(first_seen, excluded.first_seen), "
+                        "last_activity = MAX(last_activity, excluded.last_activity)",
+                        (user_key, first_seen, last_activity)
+                    )
+
+            conn.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', ?)", (str(time.time()),))
+
+        if migrated:
+            logger.info("Migrated %s usage records from %s to %s", migrated, self.usage_log_path, self.db_path)
+
+    def _legacy_hash_lookup(self):
+        """
+        Map the 8-character hashes of the hashed usage log format to the keys
+        live records use: the full user hash that keys user_database.json, and
+        the form URL (from the usage entries of user_database.json). Returns
+        (user_keys, form_urls); hashes not found there are kept as they are.
+        """
+        user_keys, form_urls = {}, {}
+        if not os.path.exists(self.user_db_path):
+            return user_keys, form_urls
+        for user_key, data in iter_json_items(self.user_db_path):
+            if "first_seen" not in data:
+                continue
+            user_keys.setdefault(user_key[:8], user_key)
+            for usage in data.get("usage", []):
+                if usage.get("form_url"):
+                    form_urls.setdefault(hashlib.md5(usage["form_url"].encode()).hexdigest()[:8], usage["form_url"])
+        return user_keys, form_urls
+
+    def _insert_usage(self, conn, timestamp, user_key, form_url, requested, successful,
+                      failure_reason=None, stages=None):
+        """Append a usage row and bump the daily counters and rollups (caller holds a transaction)"""
+        day = _day_of(timestamp)
+        conn.execute(
+            "INSERT INTO usage (timestamp, day, user_key, form_url, requested, successful, failure_reason, stages) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (timestamp, day, user_key, form_url, requested, successful,
+             failure_reason, json.dumps(stages) if stages else None)
+        )
+        record_usage_rollups(conn, {
+            "timestamp": timestamp,
+            "user_key": user_key,
+            "form_url": form_url,
+            "requested": requested,
+            "successful": successful,
+            "failure_reason": failure_reason,
+            "stages": stages
+        })
+        conn.execute(
+            "INSERT INTO user_daily (user_key, day, count) VALUES (?, ?, ?) "
+            "ON CONFLICT(user_key, day) DO UPDATE SET count = count + excluded.count",
+            (user_key, day, successful)
+        )
+        conn.execute(
+            "INSERT INTO form_daily (form_url, day, count) VALUES (?, ?, ?) "
+            "ON CONFLICT(form_url, day) DO UPDATE SET count = count + excluded.count",
+            (form_url, day, successful)
+        )
+        conn.execute(
+            "INSERT INTO users (user_key, first_seen, last_activity) VALUES (?, ?, ?) "
+            "ON CONFLICT(user_key) DO UPDATE SET last_activity = MAX(last_activity, excluded.last_activity)",
+            (user_key, timestamp, day)
+        )
+
+    def _seed_counters(self):
+        """Load today's daily counters and the last hour of rate buckets into memory"""
+        conn = self._connect()
+        today = self.get_today_date()
+        for user_key, count in conn.execute("SELECT user_key, count FROM user_daily WHERE day = ?", (today,)):
+            self.counters.seed(f"user:{user_key}", "day", count)
+        for form_url, count in conn.execute("SELECT form_url, count FROM form_daily WHERE day = ?", (today,)):
+            self.counters.seed(f"form:{form_url}", "day", count)
+        now = time.time()
+        for key, minute, count in conn.execute(
+            "SELECT key, minute, count FROM rate_buckets WHERE minute > ?", (int(now // 60) - 60,)
+        ):
+            self.counters.seed(key, "hour", count, now=minute * 60)
+            if minute == int(now // 60):
+                self.counters.seed(key, "minute", count, now=now)
+
+    def _count_success(self, user_key, form_url, successful):
+        if successful:
+            self.counters.add(f"user:{user_key}", successful)
+            self.counters.add(f"form:{form_url}", successful)
+
+    def _flush_rate_buckets(self, pending):
+        """Persist per-minute counts from the rate counters and prune old history"""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT INTO rate_buckets (key, minute, count) VALUES (?, ?, ?) "
+                "ON CONFLICT(key, minute) DO UPDATE SET count = count + excluded.count",
+                [(key, minute, count) for (key, minute), count in pending.items()]
+            )
+            if now - self._last_prune >= PRUNE_INTERVAL:
+                cutoff = (datetime.now() - timedelta(days=TRACKER_RETENTION_DAYS)).strftime("%Y-%m-%d")
+                conn.execute("DELETE FROM rate_buckets WHERE minute <= ?", (int(now // 60) - 24 * 60,))
+                conn.execute("DELETE FROM user_daily WHERE day < ?", (cutoff,))
+                conn.execute("DELETE FROM form_daily WHERE day < ?", (cutoff,))
+                conn.execute("DELETE FROM reservations WHERE expires <= ?", (now,))
+                self._last_prune = now
+        with self._reservations_lock:
+            for reservation_id in [r for r, held in self._reservations.items() if held[3] <= now]:
+                del self._reservations[reservation_id]
+
     def get_user_key(self, ip, user_agent):
         """Create a unique key for the user based on IP and user agent"""
         return f"{ip}_{user_agent[:20]}"
-    
+
     def get_today_date(self):
         """Get today's date in YYYY-MM-DD format"""
         return datetime.now().strftime("%Y-%m-%d")
-    
+
+    def _reserved(self, conn, column, value, day):
+        """Units held by unexpired reservations for a user or form"""
+        row = conn.execute(
+            f"SELECT COALESCE(SUM(amount), 0) FROM reservations WHERE {column} = ? AND day = ? AND expires > ?",
+            (value, day, time.time())
+        ).fetchone()
+        return row[0]
+
+    def _daily_count(self, conn, table, column, value, day):
+        row = conn.execute(f"SELECT count FROM {table} WHERE {column} = ? AND day = ?", (value, day)).fetchone()
+        return row[0] if row else 0
+
+    def _held(self, user_key):
+        """Units held by this tracker's unexpired reservations for a user"""
+        now = time.time()
+        today = self.get_today_date()
+        with self._reservations_lock:
+            return sum(amount for key, _, amount, expires, day in self._reservations.values()
+                       if key == user_key and expires > now and day == today)
+
     def get_remaining_submissions(self, ip, user_agent):
-        """Get the number of remaining submissions for a user today"""
+        """
+        Get the number of remaining submissions for a user today, net of reserved quota.
+        Answered from memory; reserve_quota() does the authoritative check.
+        """
+        user_key = self.get_user_key(ip, user_agent)
+        used_today = self.counters.total(f"user:{user_key}", "day")
+        return max(0, MAX_RESPONSES_PER_USER - used_today - self._held(user_key))
+
+    def get_form_submissions_today(self, form_url):
+        """Get the number of successful submissions to a form today"""
+        return self.counters.total(f"form:{form_url}", "day")
+
+    def get_recent_submissions(self, ip, user_agent, window="hour"):
+        """Get a user's successful submissions in the last minute or hour"""
+        return self.counters.total(f"user:{self.get_user_key(ip, user_agent)}", window)
+
+    def reserve_quota(self, ip, user_agent, form_url, requested):
+        """
+        Atomically reserve up to `requested` submissions against both the
+        per-user and the per-form daily limits.
+        Returns (reservation_id, granted); raises QuotaExceededError if nothing is left.
+        """
         user_key = self.get_user_key(ip, user_agent)
         today = self.get_today_date()
-        
-        # Initialize user if not exists
-        if user_key not in self.user_data:
-            self.user_data[user_key] = {
-                "last_activity": today,
-                "daily_submissions": {}
-            }
-        
-        # Reset counter if it's a new day
-        if today not in self.user_data[user_key]["daily_submissions"]:
-            self.user_data[user_key]["daily_submissions"][today] = 0
-        
-        # Calculate remaining submissions
-        used_today = self.user_data[user_key]["daily_submissions"][today]
-        max_responses = MAX_RESPONSES_PER_USER if 'MAX_RESPONSES_PER_USER' in globals() else 15
-        remaining = max_responses - used_today
-        
-        return max(0, remaining)
-    
-    def record_usage(self, ip, user_agent, form_url, requested, successful):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM reservations WHERE expires <= ?", (time.time(),))
+            user_left = (MAX_RESPONSES_PER_USER
+                         - self._daily_count(conn, "user_daily", "user_key", user_key, today)
+                         - self._reserved(conn, "user_key", user_key, today))
+            form_left = (MAX_RESPONSES_PER_FORM
+                         - self._daily_count(conn, "form_daily", "form_url", form_url, today)
+                         - self._reserved(conn, "form_url", form_url, today))
+            granted = max(0, min(requested, user_left, form_left))
+            if granted == 0:
+                reason = "daily user limit" if user_left <= 0 else "daily limit for this form"
+                raise QuotaExceededError(f"No submissions left: the {reason} has been reached.")
+
+            reservation_id = uuid.uuid4().hex
+            expires = time.time() + RESERVATION_TTL
+            conn.execute(
+                "INSERT INTO reservations (id, user_key, form_url, day, amount, expires) VALUES (?, ?, ?, ?, ?, ?)",
+                (reservation_id, user_key, form_url, today, granted, expires)
+            )
+        with self._reservations_lock:
+            self._reservations[reservation_id] = [user_key, form_url, granted, expires, today]
+        return reservation_id, granted
+
+    def consume_reservation(self, reservation_id, successful, failure_reason=None, stages=None):
+        """
+        Charge one submission attempt to a reservation and record its usage.
+        failure_reason and stages ({stage: seconds}) feed the usage analytics.
+        Returns False if the reservation no longer exists (expired or released).
+        """
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT user_key, form_url, amount FROM reservations WHERE id = ?", (reservation_id,)
+            ).fetchone()
+            if row is None:
+                with self._reservations_lock:
+                    self._reservations.pop(reservation_id, None)
+                return False
+            user_key, form_url, amount = row
+            expires = time.time() + RESERVATION_TTL
+            if amount <= 1:
+                conn.execute("DELETE FROM reservations WHERE id = ?", (reservation_id,))
+            else:
+                conn.execute(
+                    "UPDATE reservations SET amount = amount - 1, expires = ? WHERE id = ?",
+                    (expires, reservation_id)
+                )
+            self._insert_usage(conn, time.time(), user_key, form_url, 1, 1 if successful else 0,
+                               failure_reason, stages)
+
+        with self._reservations_lock:
+            held = self._reservations.get(reservation_id)
+            if held and amount <= 1:
+                del self._reservations[reservation_id]
+            elif held:
+                held[2], held[3] = amount - 1, expires
+        self._count_success(user_key, form_url, 1 if successful else 0)
+        return True
+
+    def release_reservation(self, reservation_id):
+        """Give back whatever is left of a reservation"""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM reservations WHERE id = ?", (reservation_id,))
+        with self._reservations_lock:
+            self._reservations.pop(reservation_id, None)
+
+    def record_usage(self, ip, user_agent, form_url, requested, successful, failure_reason=None, stages=None):
         """Record form submission usage"""
         user_key = self.get_user_key(ip, user_agent)
-        today = self.get_today_date()
-        
-        # Update user data
-        if user_key not in self.user_data:
-            self.user_data[user_key] = {
-                "last_activity": today,
-                "daily_submissions": {}
-            }
-        
-        if today not in self.user_data[user_key]["daily_submissions"]:
-            self.user_data[user_key]["daily_submissions"][today] = 0
-        
-        # Increment submission count
-        self.user_data[user_key]["daily_submissions"][today] += successful
-        self.user_data[user_key]["last_activity"] = today
-        
-        # Add to usage log
-        log_entry = {
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "ip": ip,
-            "user_agent": user_agent,
-            "form_url": form_url,
-            "requested": requested,
-            "successful": successful
-        }
-        self.usage_logs.append(log_entry)
-        
-        # Save data
-        self._save_data()
-        
+        with self._transaction() as conn:
+            self._insert_usage(conn, time.time(), user_key, form_url, requested, successful,
+                               failure_reason, stages)
+        self._count_success(user_key, form_url, successful)
+
         return self.get_remaining_submissions(ip, user_agent)
+
+    def get_usage_summary(self, day=None, form_url=None):
+        """Read the analytics rollups for a day, overall or for one form"""
+        day = day or self.get_today_date()
+        conn = self._connect()
+        if form_url:
+            return get_summary(conn, day, "form", form_url)
+        summary = get_summary(conn, day)
+        summary["forms"] = get_form_summaries(conn, day)
+        return summary